@@ -1,11 +1,19 @@
 import streamlit as st
 import os
-from datetime import datetime
+from datetime import date, datetime
 import json
-from utils.pdf_processor import extract_text_from_pdf
-from utils.ai_extractor import extract_lease_data
-from utils.export_generator import generate_yardi_excel, generate_reference_document
-from utils.history_manager import save_extraction, load_extraction, list_extractions, delete_extraction, clear_all_history, get_extraction_count
+from utils.pdf_processor import extract_pages_from_pdf
+from utils.text_preprocessor import preprocess_lease_text, locate_sources
+from utils.ai_extractor import extract_lease_data, extract_changed_fields
+from utils.export_generator import REFERENCE_SHARD_SIZE, REFERENCE_SHARD_THRESHOLD, generate_cached_export, generate_projection_excel_bytes, reference_extension
+from utils.yardi_profiles import DEFAULT_PROFILE, list_profiles
+from utils.yardi_importer import import_yardi_workbook
+from utils.history_manager import save_extraction, save_extractions, load_extraction, update_extractions, get_field_history, list_extractions_page, search_extractions, delete_extraction, clear_all_history, get_extraction_count, get_storage_stats
+from utils.similarity_index import REUSE_SIMILARITY_THRESHOLD, find_closest_document
+from utils.consistency_checker import RULE_MESSAGES, recheck_inconsistent_leases, store_consistency_issues, suspect_fields
+from utils.incremental_export import DELTA_FORMATS, export_yardi_delta, get_watermark, reset_watermark
+from utils.portfolio_snapshot import load_snapshot, portfolio_summary, rent_roll, expirations_by_quarter
+from utils.metrics_store import load_extraction_metrics, summarize_metrics, find_outliers
 
 # Page configuration
 st.set_page_config(
@@ -87,14 +95,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def show_field_with_source(label, value, source, help_text=None):
-    """Display a field with its source citation"""
-    st.markdown(f'<div class="source-label">📍 Source from lease:</div>', unsafe_allow_html=True)
+def show_field_with_source(label, value, source, help_text=None, location=None):
+    """Display a field with its source citation and, when it was located, its page"""
+    page = f" (page {location['page']})" if location else ""
+    st.markdown(f'<div class="source-label">📍 Source from lease{page}:</div>', unsafe_allow_html=True)
     if source and source != "Not found in document":
         st.markdown(f'<div class="source-citation">"{source}"</div>', unsafe_allow_html=True)
     else:
         st.markdown(f'<div class="source-citation" style="color: #dc3545;">⚠️ Not found in document - please verify</div>', unsafe_allow_html=True)
 
+def widget_changed(initial, value):
+    """Whether a form widget's value differs from the value it was initialised with"""
+    if isinstance(initial, str) and isinstance(value, str):
+        # Text areas normalise line breaks and trailing whitespace
+        return " ".join(initial.split()) != " ".join(value.split())
+    if initial is None and isinstance(value, date):
+        # An empty date input may start on today's date
+        return value != date.today()
+    return initial != value
+
 def main():
     # Header
     st.markdown('<div class="main-header">🏢 Lease Abstraction Tool for Yardi</div>', unsafe_allow_html=True)
@@ -190,6 +209,9 @@ def process_documents(uploaded_files):
     status_text = st.empty()
     
     all_extracted_data = []
+    extracted_texts = {}
+    documents = {}
+    batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
     
     for idx, uploaded_file in enumerate(uploaded_files):
         # Update progress
@@ -205,17 +227,31 @@ def process_documents(uploaded_files):
             
             # Extract text from PDF
             status_text.text(f"Extracting text from {uploaded_file.name}...")
-            extracted_text = extract_text_from_pdf(file_path)
+            pages = extract_pages_from_pdf(file_path)
+            
+            # Strip repeated headers/footers and layout noise to save prompt tokens; the
+            # offset map lets cited sources be located in the original pages
+            extracted_text, offset_map = preprocess_lease_text(pages) if pages else (None, [])
             
             if not extracted_text or len(extracted_text.strip()) < 100:
                 st.warning(f"⚠️ Could not extract sufficient text from {uploaded_file.name}. The document may be scanned or image-based.")
                 continue
             
+            # Reuse the closest prior extraction for near-identical renewals
+            match = find_closest_document(extracted_text, min_similarity=REUSE_SIMILARITY_THRESHOLD)
+            prior_extraction = load_extraction(match['id']) if match else None
+            
             # Extract lease data using AI
             status_text.text(f"Analyzing lease data from {uploaded_file.name}...")
-            lease_data = extract_lease_data(extracted_text, uploaded_file.name)
+            if prior_extraction:
+                st.info(f"♻️ {uploaded_file.name} is {match['similarity']:.0%} similar to {prior_extraction['filename']} - extracting changed fields only")
+                lease_data = extract_changed_fields(extracted_text, prior_extraction['data'], uploaded_file.name, batch_id)
+            else:
+                lease_data = extract_lease_data(extracted_text, uploaded_file.name, batch_id)
             
             if lease_data:
+                extracted_texts[uploaded_file.name] = extracted_text
+                documents[uploaded_file.name] = (pages, extracted_text, offset_map)
                 all_extracted_data.append({
                     'filename': uploaded_file.name,
                     'data': lease_data,
@@ -235,12 +271,28 @@ def process_documents(uploaded_files):
         st.session_state.processing_complete = True
         st.session_state.uploaded_files = uploaded_files
         
-        # Auto-save to history
+        # Cross-check fields across the batch and re-ask the model only for contradicting ones
+        status_text.text("Checking extracted fields for consistency...")
+        try:
+            recheck = recheck_inconsistent_leases(all_extracted_data, extracted_texts, batch_id)
+            if recheck['flagged']:
+                st.info(f"🔁 Re-extracted inconsistent fields in {recheck['rechecked']} of {recheck['flagged']} flagged leases; "
+                        f"{recheck['inconsistent']} still need manual review")
+        except Exception as e:
+            st.warning(f"Could not run consistency checks: {str(e)}")
+        
+        # Record the page of every cited source, once the rechecked citations are final
         for doc in all_extracted_data:
-            try:
-                save_extraction(doc['filename'], doc['data'])
-            except Exception as e:
-                st.warning(f"Could not save {doc['filename']} to history: {str(e)}")
+            doc['data']['source_locations'] = locate_sources(doc['data'], *documents[doc['filename']])
+        
+        # Auto-save the whole batch to history in one transaction
+        try:
+            extraction_ids = save_extractions([(doc['filename'], doc['data']) for doc in all_extracted_data],
+                                              texts=[extracted_texts[doc['filename']] for doc in all_extracted_data])
+            for extraction_id, doc in zip(extraction_ids, all_extracted_data):
+                doc['id'] = extraction_id
+        except Exception as e:
+            st.warning(f"Could not save the batch to history: {str(e)}")
         
         progress_bar.progress(1.0)
         status_text.text("✅ All documents processed successfully!")
@@ -266,9 +318,54 @@ def review_and_edit_tab():
         return
     
     lease_data = doc_data['data']
+    source_locations = lease_data.get('source_locations') or {}
     
     st.info(f"📅 Extracted on: {doc_data['extracted_at']}")
     
+    # Contradictions between fields, re-evaluated against the current values
+    issues = suspect_fields([doc_data])[0]
+    if issues['rules']:
+        st.warning("⚠️ **Check these fields:** " + "; ".join(RULE_MESSAGES[rule] for rule in issues['rules']))
+    
+    # Values the widgets start from; on save only fields whose widget value
+    # differs are written, so an untouched save changes nothing
+    def date_value(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+        except (TypeError, ValueError):
+            return None
+    
+    lease_type_options = ["Fixed Term", "Month-to-Month", "Other"]
+    late_fee_type_options = ["percentage", "flat_amount", "none"]
+    initial = {
+        'tenant_name': lease_data.get('tenant_name', ''),
+        'tenant_email': lease_data.get('tenant_email', ''),
+        'tenant_phone': lease_data.get('tenant_phone', ''),
+        'property_address': lease_data.get('property_address', ''),
+        'unit_number': lease_data.get('unit_number', ''),
+        'property_type': lease_data.get('property_type', ''),
+        'square_footage': float(lease_data.get('square_footage', 0)),
+        'lease_number': lease_data.get('lease_number', ''),
+        'lease_start_date': date_value(lease_data.get('lease_start_date')),
+        'lease_end_date': date_value(lease_data.get('lease_end_date')),
+        'lease_term_months': int(lease_data.get('lease_term_months', 0)),
+        'lease_type': lease_type_options[0 if lease_data.get('lease_type', '').lower() == 'fixed term' else 1],
+        'monthly_rent': float(lease_data.get('monthly_rent', 0)),
+        'security_deposit': float(lease_data.get('security_deposit', 0)),
+        'pet_deposit': float(lease_data.get('pet_deposit', 0)),
+        'payment_due_date': int(lease_data.get('payment_due_date', 1)),
+        'late_fee_type': late_fee_type_options[0 if lease_data.get('late_fee_type', '').lower() == 'percentage' else
+                                               (1 if lease_data.get('late_fee_type', '').lower() == 'flat_amount' else 2)],
+        'late_fee_percentage': float(lease_data.get('late_fee_percentage', 0)),
+        'late_fee_flat_amount': float(lease_data.get('late_fee_flat_amount', 0)),
+        'late_fee_grace_period': int(lease_data.get('late_fee_grace_period', 0)),
+        'parking_spaces': int(lease_data.get('parking_spaces', 0)),
+        'pet_allowed': lease_data.get('pet_allowed', False),
+        'pet_type': lease_data.get('pet_type', ''),
+        'utilities_included': lease_data.get('utilities_included', ''),
+        'renewal_options': lease_data.get('renewal_options', ''),
+    }
+    
     # Create editable form
     with st.form(key=f"edit_form_{selected_doc}"):
         st.markdown("### 👤 Tenant Information")
@@ -277,18 +374,18 @@ def review_and_edit_tab():
         
         with col1:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            tenant_name = st.text_input("Tenant Name", value=lease_data.get('tenant_name', ''))
-            show_field_with_source("Tenant Name", lease_data.get('tenant_name', ''), lease_data.get('tenant_name_source', ''))
+            tenant_name = st.text_input("Tenant Name", value=initial['tenant_name'])
+            show_field_with_source("Tenant Name", lease_data.get('tenant_name', ''), lease_data.get('tenant_name_source', ''), location=source_locations.get('tenant_name'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            tenant_email = st.text_input("Tenant Email", value=lease_data.get('tenant_email', ''))
-            show_field_with_source("Tenant Email", lease_data.get('tenant_email', ''), lease_data.get('tenant_email_source', ''))
+            tenant_email = st.text_input("Tenant Email", value=initial['tenant_email'])
+            show_field_with_source("Tenant Email", lease_data.get('tenant_email', ''), lease_data.get('tenant_email_source', ''), location=source_locations.get('tenant_email'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            tenant_phone = st.text_input("Tenant Phone", value=lease_data.get('tenant_phone', ''))
-            show_field_with_source("Tenant Phone", lease_data.get('tenant_phone', ''), lease_data.get('tenant_phone_source', ''))
+            tenant_phone = st.text_input("Tenant Phone", value=initial['tenant_phone'])
+            show_field_with_source("Tenant Phone", lease_data.get('tenant_phone', ''), lease_data.get('tenant_phone_source', ''), location=source_locations.get('tenant_phone'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col2:
@@ -299,24 +396,24 @@ def review_and_edit_tab():
         
         with col1:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            property_address = st.text_input("Property Address", value=lease_data.get('property_address', ''))
-            show_field_with_source("Property Address", lease_data.get('property_address', ''), lease_data.get('property_address_source', ''))
+            property_address = st.text_input("Property Address", value=initial['property_address'])
+            show_field_with_source("Property Address", lease_data.get('property_address', ''), lease_data.get('property_address_source', ''), location=source_locations.get('property_address'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            unit_number = st.text_input("Unit Number", value=lease_data.get('unit_number', ''))
-            show_field_with_source("Unit Number", lease_data.get('unit_number', ''), lease_data.get('unit_number_source', ''))
+            unit_number = st.text_input("Unit Number", value=initial['unit_number'])
+            show_field_with_source("Unit Number", lease_data.get('unit_number', ''), lease_data.get('unit_number_source', ''), location=source_locations.get('unit_number'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col2:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            property_type = st.text_input("Property Type", value=lease_data.get('property_type', ''))
-            show_field_with_source("Property Type", lease_data.get('property_type', ''), lease_data.get('property_type_source', ''))
+            property_type = st.text_input("Property Type", value=initial['property_type'])
+            show_field_with_source("Property Type", lease_data.get('property_type', ''), lease_data.get('property_type_source', ''), location=source_locations.get('property_type'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            square_footage = st.number_input("Square Footage", value=float(lease_data.get('square_footage', 0)), min_value=0.0)
-            show_field_with_source("Square Footage", lease_data.get('square_footage', ''), lease_data.get('square_footage_source', ''))
+            square_footage = st.number_input("Square Footage", value=initial['square_footage'], min_value=0.0)
+            show_field_with_source("Square Footage", lease_data.get('square_footage', ''), lease_data.get('square_footage_source', ''), location=source_locations.get('square_footage'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         st.markdown("### 📅 Lease Terms")
@@ -326,47 +423,31 @@ def review_and_edit_tab():
         
         with col1:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            lease_number = st.text_input("Lease Number", value=lease_data.get('lease_number', ''))
-            show_field_with_source("Lease Number", lease_data.get('lease_number', ''), lease_data.get('lease_number_source', ''))
+            lease_number = st.text_input("Lease Number", value=initial['lease_number'])
+            show_field_with_source("Lease Number", lease_data.get('lease_number', ''), lease_data.get('lease_number_source', ''), location=source_locations.get('lease_number'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            # Parse date if it exists
-            start_date_value = None
-            if lease_data.get('lease_start_date'):
-                try:
-                    from datetime import datetime as dt
-                    start_date_value = dt.strptime(lease_data.get('lease_start_date'), '%Y-%m-%d').date()
-                except:
-                    pass
-            lease_start_date = st.date_input("Lease Start Date", value=start_date_value)
-            show_field_with_source("Lease Start Date", lease_data.get('lease_start_date', ''), lease_data.get('lease_start_date_source', ''))
+            lease_start_date = st.date_input("Lease Start Date", value=initial['lease_start_date'])
+            show_field_with_source("Lease Start Date", lease_data.get('lease_start_date', ''), lease_data.get('lease_start_date_source', ''), location=source_locations.get('lease_start_date'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col2:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            # Parse date if it exists
-            end_date_value = None
-            if lease_data.get('lease_end_date'):
-                try:
-                    from datetime import datetime as dt
-                    end_date_value = dt.strptime(lease_data.get('lease_end_date'), '%Y-%m-%d').date()
-                except:
-                    pass
-            lease_end_date = st.date_input("Lease End Date", value=end_date_value)
-            show_field_with_source("Lease End Date", lease_data.get('lease_end_date', ''), lease_data.get('lease_end_date_source', ''))
+            lease_end_date = st.date_input("Lease End Date", value=initial['lease_end_date'])
+            show_field_with_source("Lease End Date", lease_data.get('lease_end_date', ''), lease_data.get('lease_end_date_source', ''), location=source_locations.get('lease_end_date'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            lease_term_months = st.number_input("Lease Term (months)", value=int(lease_data.get('lease_term_months', 0)), min_value=0)
-            show_field_with_source("Lease Term", lease_data.get('lease_term_months', ''), lease_data.get('lease_term_months_source', ''))
+            lease_term_months = st.number_input("Lease Term (months)", value=initial['lease_term_months'], min_value=0)
+            show_field_with_source("Lease Term", lease_data.get('lease_term_months', ''), lease_data.get('lease_term_months_source', ''), location=source_locations.get('lease_term_months'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col3:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            lease_type = st.selectbox("Lease Type", ["Fixed Term", "Month-to-Month", "Other"], 
-                                     index=0 if lease_data.get('lease_type', '').lower() == 'fixed term' else 1)
-            show_field_with_source("Lease Type", lease_data.get('lease_type', ''), lease_data.get('lease_type_source', ''))
+            lease_type = st.selectbox("Lease Type", lease_type_options,
+                                     index=lease_type_options.index(initial['lease_type']))
+            show_field_with_source("Lease Type", lease_data.get('lease_type', ''), lease_data.get('lease_type_source', ''), location=source_locations.get('lease_type'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         st.markdown("### 💰 Financial Terms")
@@ -374,43 +455,43 @@ def review_and_edit_tab():
         
         with col1:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            monthly_rent = st.number_input("Monthly Rent ($)", value=float(lease_data.get('monthly_rent', 0)), min_value=0.0, step=50.0)
-            show_field_with_source("Monthly Rent", lease_data.get('monthly_rent', ''), lease_data.get('monthly_rent_source', ''))
+            monthly_rent = st.number_input("Monthly Rent ($)", value=initial['monthly_rent'], min_value=0.0, step=50.0)
+            show_field_with_source("Monthly Rent", lease_data.get('monthly_rent', ''), lease_data.get('monthly_rent_source', ''), location=source_locations.get('monthly_rent'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            security_deposit = st.number_input("Security Deposit ($)", value=float(lease_data.get('security_deposit', 0)), min_value=0.0, step=50.0)
-            show_field_with_source("Security Deposit", lease_data.get('security_deposit', ''), lease_data.get('security_deposit_source', ''))
+            security_deposit = st.number_input("Security Deposit ($)", value=initial['security_deposit'], min_value=0.0, step=50.0)
+            show_field_with_source("Security Deposit", lease_data.get('security_deposit', ''), lease_data.get('security_deposit_source', ''), location=source_locations.get('security_deposit'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col2:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            pet_deposit = st.number_input("Pet Deposit ($)", value=float(lease_data.get('pet_deposit', 0)), min_value=0.0, step=50.0)
-            show_field_with_source("Pet Deposit", lease_data.get('pet_deposit', ''), lease_data.get('pet_deposit_source', ''))
+            pet_deposit = st.number_input("Pet Deposit ($)", value=initial['pet_deposit'], min_value=0.0, step=50.0)
+            show_field_with_source("Pet Deposit", lease_data.get('pet_deposit', ''), lease_data.get('pet_deposit_source', ''), location=source_locations.get('pet_deposit'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            payment_due_date = st.number_input("Payment Due Date (day of month)", value=int(lease_data.get('payment_due_date', 1)), min_value=1, max_value=31)
-            show_field_with_source("Payment Due Date", lease_data.get('payment_due_date', ''), lease_data.get('payment_due_date_source', ''))
+            payment_due_date = st.number_input("Payment Due Date (day of month)", value=initial['payment_due_date'], min_value=1, max_value=31)
+            show_field_with_source("Payment Due Date", lease_data.get('payment_due_date', ''), lease_data.get('payment_due_date_source', ''), location=source_locations.get('payment_due_date'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col3:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            late_fee_type = st.selectbox("Late Fee Type", ["percentage", "flat_amount", "none"], 
-                                        index=0 if lease_data.get('late_fee_type', '').lower() == 'percentage' else (1 if lease_data.get('late_fee_type', '').lower() == 'flat_amount' else 2))
-            show_field_with_source("Late Fee Type", lease_data.get('late_fee_type', ''), lease_data.get('late_fee_type_source', ''))
+            late_fee_type = st.selectbox("Late Fee Type", late_fee_type_options,
+                                        index=late_fee_type_options.index(initial['late_fee_type']))
+            show_field_with_source("Late Fee Type", lease_data.get('late_fee_type', ''), lease_data.get('late_fee_type_source', ''), location=source_locations.get('late_fee_type'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             if late_fee_type == "percentage":
                 st.markdown('<div class="field-container">', unsafe_allow_html=True)
-                late_fee_percentage = st.number_input("Late Fee Percentage (%)", value=float(lease_data.get('late_fee_percentage', 0)), min_value=0.0, max_value=100.0, step=1.0)
-                show_field_with_source("Late Fee %", lease_data.get('late_fee_percentage', ''), lease_data.get('late_fee_percentage_source', ''))
+                late_fee_percentage = st.number_input("Late Fee Percentage (%)", value=initial['late_fee_percentage'], min_value=0.0, max_value=100.0, step=1.0)
+                show_field_with_source("Late Fee %", lease_data.get('late_fee_percentage', ''), lease_data.get('late_fee_percentage_source', ''), location=source_locations.get('late_fee_percentage'))
                 st.markdown('</div>', unsafe_allow_html=True)
                 late_fee_flat_amount = 0
             elif late_fee_type == "flat_amount":
                 st.markdown('<div class="field-container">', unsafe_allow_html=True)
-                late_fee_flat_amount = st.number_input("Late Fee Amount ($)", value=float(lease_data.get('late_fee_flat_amount', 0)), min_value=0.0, step=10.0)
-                show_field_with_source("Late Fee $", lease_data.get('late_fee_flat_amount', ''), lease_data.get('late_fee_flat_amount_source', ''))
+                late_fee_flat_amount = st.number_input("Late Fee Amount ($)", value=initial['late_fee_flat_amount'], min_value=0.0, step=10.0)
+                show_field_with_source("Late Fee $", lease_data.get('late_fee_flat_amount', ''), lease_data.get('late_fee_flat_amount_source', ''), location=source_locations.get('late_fee_flat_amount'))
                 st.markdown('</div>', unsafe_allow_html=True)
                 late_fee_percentage = 0
             else:
@@ -418,8 +499,8 @@ def review_and_edit_tab():
                 late_fee_flat_amount = 0
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            late_fee_grace_period = st.number_input("Late Fee Grace Period (days)", value=int(lease_data.get('late_fee_grace_period', 0)), min_value=0)
-            show_field_with_source("Grace Period", lease_data.get('late_fee_grace_period', ''), lease_data.get('late_fee_grace_period_source', ''))
+            late_fee_grace_period = st.number_input("Late Fee Grace Period (days)", value=initial['late_fee_grace_period'], min_value=0)
+            show_field_with_source("Grace Period", lease_data.get('late_fee_grace_period', ''), lease_data.get('late_fee_grace_period_source', ''), location=source_locations.get('late_fee_grace_period'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         st.markdown("### 📝 Additional Terms")
@@ -427,104 +508,145 @@ def review_and_edit_tab():
         
         with col1:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            parking_spaces = st.number_input("Parking Spaces", value=int(lease_data.get('parking_spaces', 0)), min_value=0)
-            show_field_with_source("Parking", lease_data.get('parking_spaces', ''), lease_data.get('parking_spaces_source', ''))
+            parking_spaces = st.number_input("Parking Spaces", value=initial['parking_spaces'], min_value=0)
+            show_field_with_source("Parking", lease_data.get('parking_spaces', ''), lease_data.get('parking_spaces_source', ''), location=source_locations.get('parking_spaces'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            pet_allowed = st.checkbox("Pet Allowed", value=lease_data.get('pet_allowed', False))
-            show_field_with_source("Pet Policy", lease_data.get('pet_allowed', ''), lease_data.get('pet_allowed_source', ''))
+            pet_allowed = st.checkbox("Pet Allowed", value=initial['pet_allowed'])
+            show_field_with_source("Pet Policy", lease_data.get('pet_allowed', ''), lease_data.get('pet_allowed_source', ''), location=source_locations.get('pet_allowed'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            pet_type = st.text_input("Pet Type", value=lease_data.get('pet_type', ''))
-            show_field_with_source("Pet Type", lease_data.get('pet_type', ''), lease_data.get('pet_type_source', ''))
+            pet_type = st.text_input("Pet Type", value=initial['pet_type'])
+            show_field_with_source("Pet Type", lease_data.get('pet_type', ''), lease_data.get('pet_type_source', ''), location=source_locations.get('pet_type'))
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col2:
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            utilities_included = st.text_area("Utilities Included", value=lease_data.get('utilities_included', ''), height=100)
-            show_field_with_source("Utilities", lease_data.get('utilities_included', ''), lease_data.get('utilities_included_source', ''))
+            utilities_included = st.text_area("Utilities Included", value=initial['utilities_included'], height=100)
+            show_field_with_source("Utilities", lease_data.get('utilities_included', ''), lease_data.get('utilities_included_source', ''), location=source_locations.get('utilities_included'))
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="field-container">', unsafe_allow_html=True)
-            renewal_options = st.text_area("Renewal Options", value=lease_data.get('renewal_options', ''), height=100)
-            show_field_with_source("Renewal", lease_data.get('renewal_options', ''), lease_data.get('renewal_options_source', ''))
+            renewal_options = st.text_area("Renewal Options", value=initial['renewal_options'], height=100)
+            show_field_with_source("Renewal", lease_data.get('renewal_options', ''), lease_data.get('renewal_options_source', ''), location=source_locations.get('renewal_options'))
             st.markdown('</div>', unsafe_allow_html=True)
         
+        reviewer = st.text_input("Reviewed by", value=st.session_state.get('reviewer', ''),
+                                 help="Recorded with each changed field in the history audit trail")
+        
         # Submit button
         submitted = st.form_submit_button("💾 Save Changes", type="primary", use_container_width=True)
         
         if submitted:
-            # Update the data in session state
-            updated_data = {
+            edited = {
                 'tenant_name': tenant_name,
-                'tenant_name_source': lease_data.get('tenant_name_source', ''),
                 'tenant_email': tenant_email,
-                'tenant_email_source': lease_data.get('tenant_email_source', ''),
                 'tenant_phone': tenant_phone,
-                'tenant_phone_source': lease_data.get('tenant_phone_source', ''),
                 'property_address': property_address,
-                'property_address_source': lease_data.get('property_address_source', ''),
                 'unit_number': unit_number,
-                'unit_number_source': lease_data.get('unit_number_source', ''),
                 'property_type': property_type,
-                'property_type_source': lease_data.get('property_type_source', ''),
                 'square_footage': square_footage,
-                'square_footage_source': lease_data.get('square_footage_source', ''),
                 'lease_number': lease_number,
-                'lease_number_source': lease_data.get('lease_number_source', ''),
-                'lease_start_date': str(lease_start_date) if lease_start_date else '',
-                'lease_start_date_source': lease_data.get('lease_start_date_source', ''),
-                'lease_end_date': str(lease_end_date) if lease_end_date else '',
-                'lease_end_date_source': lease_data.get('lease_end_date_source', ''),
+                'lease_start_date': lease_start_date,
+                'lease_end_date': lease_end_date,
                 'lease_term_months': lease_term_months,
-                'lease_term_months_source': lease_data.get('lease_term_months_source', ''),
                 'lease_type': lease_type,
-                'lease_type_source': lease_data.get('lease_type_source', ''),
                 'monthly_rent': monthly_rent,
-                'monthly_rent_source': lease_data.get('monthly_rent_source', ''),
                 'security_deposit': security_deposit,
-                'security_deposit_source': lease_data.get('security_deposit_source', ''),
                 'pet_deposit': pet_deposit,
-                'pet_deposit_source': lease_data.get('pet_deposit_source', ''),
                 'payment_due_date': payment_due_date,
-                'payment_due_date_source': lease_data.get('payment_due_date_source', ''),
                 'late_fee_type': late_fee_type,
-                'late_fee_type_source': lease_data.get('late_fee_type_source', ''),
                 'late_fee_percentage': late_fee_percentage,
-                'late_fee_percentage_source': lease_data.get('late_fee_percentage_source', ''),
                 'late_fee_flat_amount': late_fee_flat_amount,
-                'late_fee_flat_amount_source': lease_data.get('late_fee_flat_amount_source', ''),
                 'late_fee_grace_period': late_fee_grace_period,
-                'late_fee_grace_period_source': lease_data.get('late_fee_grace_period_source', ''),
                 'parking_spaces': parking_spaces,
-                'parking_spaces_source': lease_data.get('parking_spaces_source', ''),
                 'pet_allowed': pet_allowed,
-                'pet_allowed_source': lease_data.get('pet_allowed_source', ''),
                 'pet_type': pet_type,
-                'pet_type_source': lease_data.get('pet_type_source', ''),
                 'utilities_included': utilities_included,
-                'utilities_included_source': lease_data.get('utilities_included_source', ''),
                 'renewal_options': renewal_options,
-                'renewal_options_source': lease_data.get('renewal_options_source', ''),
-                'confidence_score': lease_data.get('confidence_score', 0.5)
             }
+            # Hidden late fee inputs are only zeroed when the fee type changed
+            if late_fee_type == initial['late_fee_type']:
+                shown = {'percentage': 'late_fee_percentage', 'flat_amount': 'late_fee_flat_amount'}.get(late_fee_type)
+                for field in ('late_fee_percentage', 'late_fee_flat_amount'):
+                    if field != shown:
+                        edited[field] = initial[field]
+            
+            changes = {
+                field: (str(value) if value else '') if field in ('lease_start_date', 'lease_end_date') else value
+                for field, value in edited.items() if widget_changed(initial[field], value)
+            }
+            updated_data = {**lease_data, **changes}
             
             # Update in session state
             for doc in st.session_state.extracted_data:
                 if doc['filename'] == selected_doc:
                     doc['data'] = updated_data
+                    doc['updated_at'] = datetime.now().isoformat()
                     break
+            store_consistency_issues([doc_data])
+            
+            # Store only the changed fields as a new version in history
+            st.session_state.reviewer = reviewer
+            try:
+                if doc_data.get('id'):
+                    update_extractions({doc_data['id']: changes}, source="review", author=reviewer)
+                else:
+                    doc_data['id'] = save_extraction(doc_data['filename'], updated_data)
+            except Exception as e:
+                st.warning(f"Could not save the changes to history: {str(e)}")
             
             st.success("✅ Changes saved successfully!")
             st.rerun()
 
+def incremental_sync_section():
+    """Delta export of history for a sync target (works without a processed batch)"""
+    st.markdown("### 🔄 Incremental Yardi Sync")
+    st.markdown("Only leases in history created or edited since the last export to a sync target")
+    
+    sync_cols = st.columns(3)
+    with sync_cols[0]:
+        sync_target = st.text_input("Sync target", value="nightly_yardi")
+    with sync_cols[1]:
+        delta_format = st.selectbox("Delta format", list(DELTA_FORMATS))
+    with sync_cols[2]:
+        delta_profile = st.selectbox("Delta layout", ["Default"] + list_profiles())
+    
+    sync_col1, sync_col2 = st.columns(2)
+    with sync_col1:
+        if st.button("📥 Export Changes", type="primary", use_container_width=True):
+            try:
+                delta_path = export_yardi_delta(sync_target, fmt=delta_format,
+                                                profile=None if delta_profile == "Default" else delta_profile)
+                if delta_path:
+                    with open(delta_path, 'rb') as f:
+                        st.download_button(
+                            label="⬇️ Download Delta",
+                            data=f.read(),
+                            file_name=os.path.basename(delta_path),
+                            use_container_width=True
+                        )
+                    st.success(f"✅ Delta saved to {delta_path}")
+                else:
+                    st.info(f"No leases changed since the last export to {sync_target}")
+            except Exception as e:
+                st.error(f"❌ Error generating delta: {str(e)}")
+    with sync_col2:
+        watermark = get_watermark(sync_target)
+        st.caption(f"Last export: {watermark['exported_at'] or 'never'} · changes up to {watermark['high_water_timestamp'] or 'none'}")
+        if st.button("↩️ Reset Sync Target", use_container_width=True):
+            reset_watermark(sync_target)
+            st.success(f"Next export to {sync_target} will include every lease")
+
 def export_tab():
     st.markdown('<div class="sub-header">Generate Exports</div>', unsafe_allow_html=True)
     
     if not st.session_state.extracted_data:
         st.info("👈 Please upload and process documents first")
+        st.divider()
+        incremental_sync_section()
         return
     
     st.markdown("""
@@ -533,6 +655,9 @@ def export_tab():
     2. **Reference Document** - Comprehensive structured view for manual data entry
     """)
     
+    archive_exports = st.checkbox("🗄️ Also archive a copy of each export to the exports/ folder", value=False)
+    archive_dir = "exports" if archive_exports else None
+    
     st.divider()
     
     col1, col2 = st.columns(2)
@@ -541,18 +666,20 @@ def export_tab():
         st.markdown("### 📊 Yardi Import Excel")
         st.markdown("Excel file formatted with Yardi-compatible columns for automatic import")
         
+        profiles = list_profiles()
+        yardi_profile = st.selectbox("Yardi import layout", profiles, index=profiles.index(DEFAULT_PROFILE))
+        
         if st.button("📥 Generate Yardi Excel", type="primary", use_container_width=True):
             try:
-                excel_path = generate_yardi_excel(st.session_state.extracted_data)
+                excel_bytes = generate_cached_export("yardi_excel", st.session_state.extracted_data, archive_dir, yardi_profile)
                 
-                with open(excel_path, 'rb') as f:
-                    st.download_button(
-                        label="⬇️ Download Yardi Import Excel",
-                        data=f,
-                        file_name=f"yardi_import_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
-                    )
+                st.download_button(
+                    label="⬇️ Download Yardi Import Excel",
+                    data=excel_bytes,
+                    file_name=f"yardi_import_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
                 
                 st.success("✅ Yardi Excel generated successfully!")
             except Exception as e:
@@ -562,18 +689,30 @@ def export_tab():
         st.markdown("### 📄 Reference Document")
         st.markdown("Detailed structured document with all extracted data for manual review")
         
+        reference_formats = {
+            "Excel workbook": ("reference_document", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+            "HTML report": ("reference_html", "html", "text/html"),
+            "Markdown report": ("reference_markdown", "md", "text/markdown"),
+        }
+        reference_format = st.selectbox("Reference format", list(reference_formats))
+        export_type, extension, mime = reference_formats[reference_format]
+        if export_type == "reference_document" and reference_extension(st.session_state.extracted_data) == "zip":
+            # Large batches come as a zip of smaller workbooks plus an index
+            extension, mime = "zip", "application/zip"
+            st.caption(f"More than {REFERENCE_SHARD_THRESHOLD} leases: the workbook is split into a zip of "
+                       f"{REFERENCE_SHARD_SIZE}-lease workbooks with an index.xlsx")
+        
         if st.button("📥 Generate Reference Document", type="primary", use_container_width=True):
             try:
-                ref_path = generate_reference_document(st.session_state.extracted_data)
+                ref_bytes = generate_cached_export(export_type, st.session_state.extracted_data, archive_dir)
                 
-                with open(ref_path, 'rb') as f:
-                    st.download_button(
-                        label="⬇️ Download Reference Document",
-                        data=f,
-                        file_name=f"lease_reference_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
-                    )
+                st.download_button(
+                    label="⬇️ Download Reference Document",
+                    data=ref_bytes,
+                    file_name=f"lease_reference_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+                    mime=mime,
+                    use_container_width=True
+                )
                 
                 st.success("✅ Reference document generated successfully!")
             except Exception as e:
@@ -581,6 +720,44 @@ def export_tab():
     
     st.divider()
     
+    st.markdown("### 📈 Rent & Expiration Projection")
+    st.markdown("Month-by-month rent roll, expirations and renewal option exposure")
+    
+    projection_cols = st.columns(4)
+    with projection_cols[0]:
+        projection_scope = st.selectbox("Leases", ["Current batch", "Entire history"])
+    with projection_cols[1]:
+        projection_years = st.slider("Years", min_value=1, max_value=10, value=5)
+    with projection_cols[2]:
+        annual_escalation = st.number_input("Annual escalation (%)", min_value=0.0, max_value=20.0, value=0.0, step=0.5)
+    with projection_cols[3]:
+        renewal_increase = st.number_input("Renewal increase (%)", min_value=0.0, max_value=50.0, value=0.0, step=0.5)
+    
+    if st.button("📥 Generate Projection", type="primary"):
+        try:
+            leases = load_snapshot() if projection_scope == "Entire history" else st.session_state.extracted_data
+            projection_bytes = generate_projection_excel_bytes(
+                leases, archive_dir, years=projection_years,
+                annual_escalation=annual_escalation / 100, renewal_increase=renewal_increase / 100
+            )
+            
+            st.download_button(
+                label="⬇️ Download Projection",
+                data=projection_bytes,
+                file_name=f"rent_projection_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+            
+            st.success("✅ Projection generated successfully!")
+        except Exception as e:
+            st.error(f"❌ Error generating projection: {str(e)}")
+    
+    st.divider()
+    
+    incremental_sync_section()
+    
+    st.divider()
+    
     # Preview extracted data
     with st.expander("👁️ Preview Extracted Data", expanded=False):
         for doc in st.session_state.extracted_data:
@@ -599,11 +776,124 @@ def history_tab():
     
     st.markdown(f"**Total saved extractions:** {count}")
     
+    # Older records are compressed (warm) or moved to archive segments (cold)
+    storage = get_storage_stats()
+    st.caption(" · ".join(f"{tier.title()}: {stats['records']} ({stats['bytes'] / 1024:,.0f} KB)"
+                          for tier, stats in storage.items()))
+    
+    # Portfolio figures come from the columnar snapshot, not the individual records
+    with st.expander("📈 Portfolio Analytics", expanded=False):
+        try:
+            snapshot = load_snapshot()
+            summary = portfolio_summary(frame=snapshot)
+            metric_cols = st.columns(4)
+            metric_cols[0].metric("Active Leases", f"{summary['active_leases']:,} / {summary['leases']:,}")
+            metric_cols[1].metric("Monthly Rent Roll", f"${summary['monthly_rent_roll']:,.0f}")
+            metric_cols[2].metric("Average Deposit", f"${summary['average_deposit']:,.0f}")
+            metric_cols[3].metric("Rent / Sq Ft / Year", f"${summary['rent_per_square_foot']:,.2f}")
+            
+            st.markdown("**Expirations by quarter**")
+            st.bar_chart(expirations_by_quarter(frame=snapshot)['leases'])
+            st.markdown("**Rent roll by property**")
+            st.dataframe(rent_roll(frame=snapshot).head(20), use_container_width=True)
+        except Exception as e:
+            st.warning(f"Portfolio analytics unavailable: {str(e)}")
+    
+    # Token, cost and latency of the extraction calls, from the metrics store
+    with st.expander("💰 Extraction Cost & Latency", expanded=False):
+        try:
+            call_metrics = load_extraction_metrics()
+            if call_metrics.empty:
+                st.info("No extraction calls recorded yet.")
+            else:
+                group_labels = {"Batch": "batch_id", "Model": "model", "Document size": "size_bucket"}
+                group_by = st.radio("Group by", list(group_labels), horizontal=True, key="metrics_group_by")
+                st.dataframe(summarize_metrics(group_labels[group_by], metrics=call_metrics),
+                             use_container_width=True)
+                
+                outlier_labels = {"Cost": "estimated_cost", "Latency": "total_latency"}
+                outlier_by = st.radio("Slowest / most expensive calls by", list(outlier_labels),
+                                      horizontal=True, key="metrics_outlier_by")
+                outliers = find_outliers(outlier_labels[outlier_by], metrics=call_metrics)
+                st.dataframe(outliers[['timestamp', 'filename', 'model', 'mode', 'document_chars',
+                                       'estimated_cost', 'total_latency', 'status']].head(20),
+                             use_container_width=True)
+        except Exception as e:
+            st.warning(f"Extraction metrics unavailable: {str(e)}")
+    
+    # Pull analyst corrections made in an exported Yardi file back into history
+    with st.expander("📤 Re-import Edited Yardi File", expanded=False):
+        edited_file = st.file_uploader("Edited Yardi workbook or ETL CSV", type=['xlsx', 'csv'], key="yardi_reimport")
+        profiles = list_profiles()
+        default_layout = "etl" if edited_file is not None and edited_file.name.lower().endswith('.csv') else DEFAULT_PROFILE
+        import_profile = st.selectbox("Layout the file was exported with", profiles,
+                                      index=profiles.index(default_layout) if default_layout in profiles else 0,
+                                      key="reimport_profile")
+        
+        if edited_file is not None and st.button("Apply Changes to History", type="primary"):
+            try:
+                summary = import_yardi_workbook(edited_file, profile=import_profile)
+                st.success(f"✅ Updated {len(summary['updated'])} of {summary['matched']} matched leases "
+                           f"({summary['rows']} rows read)")
+                if summary['unmatched']:
+                    st.warning(f"⚠️ {len(summary['unmatched'])} rows did not match a saved lease by SourceFile and LeaseNumber")
+                if summary['unparseable']:
+                    st.warning(f"⚠️ {len(summary['unparseable'])} cells could not be read and were left unchanged: " +
+                               "; ".join(f"row {row_number} {header} = {value!r}"
+                                         for row_number, header, value in summary['unparseable'][:10]))
+            except Exception as e:
+                st.error(f"❌ Error importing file: {str(e)}")
+    
     # Search box
-    search_term = st.text_input("🔍 Search by property, tenant, or filename", placeholder="Enter search term...")
+    search_term = st.text_input("🔍 Search all fields and source citations",
+                                placeholder="e.g. early termination, Hickory Hollow, pet deposit...")
     
-    # Get extractions
-    extractions = list_extractions(search_term)
+    with st.expander("Filters", expanded=False):
+        filter_cols = st.columns(4)
+        with filter_cols[0]:
+            min_rent = st.number_input("Min monthly rent", min_value=0.0, value=0.0, step=100.0)
+        with filter_cols[1]:
+            max_rent = st.number_input("Max monthly rent (0 = no limit)", min_value=0.0, value=0.0, step=100.0)
+        with filter_cols[2]:
+            ends_after = st.date_input("Lease ends after", value=None)
+        with filter_cols[3]:
+            ends_before = st.date_input("Lease ends before", value=None)
+    
+    ranges = {}
+    if min_rent or max_rent:
+        ranges['monthly_rent'] = (min_rent or None, max_rent or None)
+    if ends_after or ends_before:
+        ranges['lease_end_date'] = (ends_after.isoformat() if ends_after else None,
+                                    ends_before.isoformat() if ends_before else None)
+    
+    sort_options = {
+        "Newest first": ("timestamp", True),
+        "Oldest first": ("timestamp", False),
+        "Tenant (A-Z)": ("tenant_name", False),
+        "Property (A-Z)": ("property_address", False),
+        "Lease end (soonest)": ("lease_end_date", False),
+    }
+    sort_cols = st.columns(2)
+    with sort_cols[0]:
+        sort_label = st.selectbox("Sort by", list(sort_options), disabled=bool(search_term))
+    with sort_cols[1]:
+        page_size = st.selectbox("Per page", [10, 20, 50], index=1)
+    sort_key, descending = sort_options[sort_label]
+    
+    # Cursors of the pages visited so far; start over when the view changes
+    view = (search_term, str(ranges), sort_label, page_size)
+    if st.session_state.get('history_view') != view:
+        st.session_state.history_view = view
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    
+    # Get only the current page of extractions
+    if search_term or ranges:
+        # Ranked search results are capped rather than paged
+        extractions = search_extractions(search_term, ranges, limit=page_size * 5)
+        next_cursor = None
+    else:
+        extractions, next_cursor = list_extractions_page(cursors[-1], page_size, sort_key, descending)
     
     if not extractions:
         st.warning("⚠️ No extractions found matching your search.")
@@ -611,6 +901,18 @@ def history_tab():
     
     st.divider()
     
+    nav_cols = st.columns([1, 2, 1])
+    with nav_cols[0]:
+        if st.button("⬅️ Previous", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with nav_cols[1]:
+        st.caption(f"Page {len(cursors)} · showing {len(extractions)} of {count}")
+    with nav_cols[2]:
+        if st.button("Next ➡️", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+    
     # Display extractions
     for extraction in extractions:
         with st.container():
@@ -628,6 +930,8 @@ def history_tab():
                 with info_cols[2]:
                     st.markdown(f"**Lease Start:** {extraction.get('lease_start_date', 'N/A')}")
                 
+                if extraction.get('snippet'):
+                    st.caption(f"🔎 {extraction['snippet']}")
                 st.caption(f"🕒 Processed: {extraction['timestamp']}")
             
             with col2:
@@ -640,6 +944,7 @@ def history_tab():
                     full_extraction = load_extraction(extraction['id'])
                     if full_extraction:
                         st.session_state.extracted_data = [{
+                            'id': full_extraction['id'],
                             'filename': full_extraction['filename'],
                             'data': full_extraction['data'],
                             'extracted_at': full_extraction['timestamp']
@@ -686,6 +991,16 @@ def history_tab():
                             st.write(f"**Late Fee:** {data.get('late_fee_percentage', 0)}%")
                         elif data.get('late_fee_type') == 'flat_amount':
                             st.write(f"**Late Fee:** ${data.get('late_fee_flat_amount', 0):.2f}")
+                        
+                        changes = [change for change in get_field_history(extraction['id'])
+                                   if not change['field'].endswith('_source')]
+                        if changes:
+                            st.markdown(f"#### Change History (version {full_extraction.get('version', 1)})")
+                            for change in changes:
+                                who = "model" if change['from_model'] else (change['author'] or "unknown")
+                                st.caption(f"v{change['version']} · {change['changed_at'][:16].replace('T', ' ')} · "
+                                           f"{change['field']}: {change['old_value']!r} → {change['new_value']!r} "
+                                           f"({who}, {change['source'] or 'edit'})")
             
             st.divider()
     
@@ -0,0 +1,458 @@
+"""
+Headless Batch Runner
+Extracts lease data from folders of PDFs without the Streamlit UI, for cron jobs and bulk loads
+
+Usage:
+    python batch_process.py leases/ "archive/2024/*.pdf" --workers 8 --export yardi --export csv
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from utils.pdf_processor import extract_pages_from_pdf
+from utils.text_preprocessor import preprocess_lease_text, locate_sources
+from utils.ai_extractor import extract_lease_data, extract_changed_fields
+from utils.history_manager import HISTORY_DIR, save_extractions, load_extraction
+from utils.similarity_index import REUSE_SIMILARITY_THRESHOLD, find_closest_document
+from utils.consistency_checker import recheck_inconsistent_leases
+from utils.file_locks import atomic_write_json
+
+DEFAULT_STATE_FILE = os.path.join(HISTORY_DIR, "batch_state.json")
+
+DEFAULT_WORKERS = 4
+
+# Finished leases are saved to history (and the state file updated) in groups
+# of this size, so an interrupted run loses at most one group of work
+SAVE_BATCH_SIZE = 20
+
+# Seconds between progress lines when stderr is not a terminal (cron logs)
+LOG_INTERVAL = 30
+
+MIN_TEXT_LENGTH = 100
+
+EXPORT_FORMATS = ["yardi", "csv", "parquet", "reference", "projection"]
+
+def collect_pdf_paths(inputs: List[str]) -> List[str]:
+    """
+    Expand directories and glob patterns into a sorted list of PDF files
+
+    Args:
+        inputs: Directories (searched recursively), glob patterns or file paths
+
+    Returns:
+        Absolute paths of the PDF files, without duplicates
+    """
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, "**", "*"), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True) or [item]
+        paths.update(os.path.abspath(path) for path in matches
+                     if path.lower().endswith(".pdf") and os.path.isfile(path))
+    return sorted(paths)
+
+def load_state(state_file: str) -> Dict[str, Dict]:
+    """
+    Load the per-file results of earlier runs
+
+    Args:
+        state_file: Path of the state file
+
+    Returns:
+        Dictionary of absolute file path -> result entry (empty if there is no state yet)
+    """
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, 'r') as f:
+        return json.load(f).get("files", {})
+
+def save_state(state_file: str, files: Dict[str, Dict]) -> None:
+    atomic_write_json(state_file, {"updated_at": datetime.now().isoformat(), "files": files}, indent=2)
+
+def _file_signature(path: str) -> Dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+def is_done(entry: Optional[Dict], path: str) -> bool:
+    """A file is skipped on resume if it was saved and has not changed since"""
+    return bool(entry) and entry.get("status") == "done" and \
+        {"size": entry.get("size"), "mtime": entry.get("mtime")} == _file_signature(path)
+
+def read_lease_document(path: str) -> Tuple[List[str], str, List[int]]:
+    """
+    Extract and clean the text of one lease PDF, keeping the way back to its pages
+
+    Args:
+        path: Path of the PDF
+
+    Returns:
+        Tuple of (text of each page, preprocessed lease text, offset map from
+        the preprocessed text to the pages)
+
+    Raises:
+        ValueError: If no usable text could be extracted
+    """
+    pages = extract_pages_from_pdf(path)
+    # Strip repeated headers/footers and layout noise to save prompt tokens
+    text, offset_map = preprocess_lease_text(pages) if pages else (None, [])
+    if not text or len(text.strip()) < MIN_TEXT_LENGTH:
+        raise ValueError("could not extract sufficient text (scanned or image-based document?)")
+    return pages, text, offset_map
+
+def read_lease_text(path: str) -> str:
+    """
+    Extract and clean the text of one lease PDF
+
+    Args:
+        path: Path of the PDF
+
+    Returns:
+        Preprocessed lease text
+
+    Raises:
+        ValueError: If no usable text could be extracted
+    """
+    return read_lease_document(path)[1]
+
+def process_file(path: str, batch_id: str, reuse: bool = True, recheck: bool = True) -> Tuple[Dict, str, bool]:
+    """
+    Parse and extract one lease PDF (runs in a worker thread)
+
+    Args:
+        path: Path of the PDF
+        batch_id: Identifier of the run (for metrics)
+        reuse: Whether to reuse the closest prior extraction of a near-identical lease
+        recheck: Whether to re-extract fields that fail the consistency checks
+
+    Returns:
+        Tuple of (document with 'filename', 'data' and 'extracted_at', lease text,
+        whether a prior extraction was reused)
+
+    Raises:
+        ValueError: If no usable text or data could be extracted
+    """
+    filename = os.path.basename(path)
+    pages, text, offset_map = read_lease_document(path)
+
+    match = find_closest_document(text, min_similarity=REUSE_SIMILARITY_THRESHOLD) if reuse else None
+    prior_extraction = load_extraction(match['id']) if match else None
+    if prior_extraction:
+        lease_data = extract_changed_fields(text, prior_extraction['data'], filename, batch_id)
+    else:
+        lease_data = extract_lease_data(text, filename, batch_id)
+
+    if not lease_data:
+        raise ValueError("no lease data could be extracted")
+
+    doc = {'filename': filename, 'data': lease_data, 'extracted_at': datetime.now().isoformat()}
+    if recheck:
+        recheck_inconsistent_leases([doc], {filename: text}, batch_id)
+    # Record the page of every cited source, once the rechecked citations are final
+    doc['data']['source_locations'] = locate_sources(doc['data'], pages, text, offset_map)
+    return doc, text, prior_extraction is not None
+
+def format_progress(counts: Dict[str, int], total: int, started: float) -> str:
+    """
+    Build the throughput/ETA status line
+
+    Args:
+        counts: Running 'done', 'failed', 'reused' and 'skipped' counts
+        total: Number of files to process in this run
+        started: time.monotonic() at the start of the run
+
+    Returns:
+        One-line progress summary
+    """
+    finished = counts['done'] + counts['failed']
+    elapsed = time.monotonic() - started
+    rate = finished / elapsed if elapsed > 0 else 0.0
+    eta = (total - finished) / rate if rate > 0 else None
+    percent = finished / total * 100 if total else 100.0
+    return (f"[{finished}/{total} {percent:5.1f}%] {rate * 60:.1f} files/min, "
+            f"elapsed {_duration(elapsed)}, ETA {_duration(eta) if eta is not None else '--:--'} | "
+            f"ok {counts['done']}, failed {counts['failed']}, reused {counts['reused']}, skipped {counts['skipped']}")
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+def _flush(pending: List[Tuple[str, Dict, str]], state: Dict[str, Dict], state_file: str,
+           save: bool) -> None:
+    """Save finished leases to history and record them in the state file"""
+    if pending and save:
+        extraction_ids = save_extractions([(doc['filename'], doc['data']) for _, doc, _ in pending],
+                                          texts=[text for _, _, text in pending])
+        for extraction_id, (path, _, _) in zip(extraction_ids, pending):
+            state[path]["id"] = extraction_id
+    # Without history there is nothing to resume from, so those files are not skipped next time
+    for path, _, _ in pending:
+        state[path]["status"] = "done" if save else "extracted"
+    pending.clear()
+    save_state(state_file, state)
+
+def run_batch(paths: List[str], state: Dict[str, Dict], state_file: str, workers: int = DEFAULT_WORKERS,
+              save: bool = True, reuse: bool = True, recheck: bool = True) -> Dict[str, int]:
+    """
+    Process PDFs in parallel, saving results as they finish
+
+    Parsing and extraction run in worker threads (the work is dominated by
+    model calls); saving to history stays on the main thread so there is a
+    single writer.
+
+    Args:
+        paths: PDF files to process
+        state: Per-file results of earlier runs; updated in place
+        state_file: Path the state is written to after every saved group
+        workers: Number of files processed concurrently
+        save: Whether to save the extractions to history
+        reuse: Whether to reuse prior extractions of near-identical leases
+        recheck: Whether to re-extract fields that fail the consistency checks
+
+    Returns:
+        Counts of 'done', 'failed', 'reused' and 'skipped' files
+    """
+    batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    todo = [path for path in paths if not is_done(state.get(path), path)]
+    counts = {'done': 0, 'failed': 0, 'reused': 0, 'skipped': len(paths) - len(todo)}
+    interactive = sys.stderr.isatty()
+    started = last_log = time.monotonic()
+    pending = []
+
+    print(f"Processing {len(todo)} of {len(paths)} PDFs with {workers} workers "
+          f"({counts['skipped']} already done)", file=sys.stderr)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(process_file, path, batch_id, reuse, recheck): path for path in todo}
+        for future in as_completed(futures):
+            path = futures[future]
+            entry = dict(_file_signature(path), processed_at=datetime.now().isoformat())
+            try:
+                doc, text, reused = future.result()
+            except Exception as e:
+                state[path] = dict(entry, status="failed", error=str(e))
+                counts['failed'] += 1
+                print(("\r" if interactive else "") + f"FAILED {path}: {e}", file=sys.stderr)
+            else:
+                state[path] = dict(entry, status="saving", reused=reused,
+                                   consistency_issues=len(doc['data'].get('consistency_issues', [])))
+                pending.append((path, doc, text))
+                counts['done'] += 1
+                counts['reused'] += reused
+
+            if len(pending) >= SAVE_BATCH_SIZE:
+                _flush(pending, state, state_file, save)
+
+            now = time.monotonic()
+            if interactive:
+                print("\r" + format_progress(counts, len(todo), started), end="", file=sys.stderr, flush=True)
+            elif now - last_log >= LOG_INTERVAL:
+                print(format_progress(counts, len(todo), started), file=sys.stderr, flush=True)
+                last_log = now
+    except KeyboardInterrupt:
+        # Keep what already finished; unfinished files are picked up on resume
+        executor.shutdown(wait=False, cancel_futures=True)
+        _flush(pending, state, state_file, save)
+        print("\nInterrupted - finished files were saved, rerun to resume", file=sys.stderr)
+        raise
+    executor.shutdown()
+
+    _flush(pending, state, state_file, save)
+    print(("\n" if interactive else "") + format_progress(counts, len(todo), started), file=sys.stderr)
+    return counts
+
+def run_offline_batch(paths: List[str], state: Dict[str, Dict], state_file: str, job_name: str,
+                      workers: int = DEFAULT_WORKERS, poll_interval: float = 60,
+                      timeout: Optional[float] = None, client=None) -> Dict[str, int]:
+    """
+    Extract PDFs through an offline batch job at batch pricing
+
+    The PDFs are parsed in parallel and submitted as one batch job; results
+    are reconciled into history when the job finishes. The job is resumable
+    by name: rerunning with the same job name picks up the submitted job
+    instead of parsing and submitting again, so a cron run can stop waiting
+    (timeout) and leave the rest to the next run.
+
+    Args:
+        paths: PDF files to process
+        state: Per-file results of earlier runs; updated in place
+        state_file: Path the state is written to
+        job_name: Name of the batch job (see utils.batch_jobs)
+        workers: Number of PDFs parsed concurrently
+        poll_interval: Seconds between batch status checks
+        timeout: Stop waiting for the batch after this many seconds
+        client: OpenAI-compatible client (defaults to the extractor's client)
+
+    Returns:
+        Counts of 'done', 'failed', 'reused' and 'skipped' files
+    """
+    from utils.batch_jobs import TERMINAL_STATUSES, load_batch_manifest, run_batch_job
+
+    todo = [path for path in paths if not is_done(state.get(path), path)]
+    counts = {'done': 0, 'failed': 0, 'reused': 0, 'skipped': len(paths) - len(todo)}
+    started = time.monotonic()
+
+    leases, sources = [], []
+    if load_batch_manifest(job_name) is None:
+        # Only a new job needs the lease text; a submitted one already holds its requests
+        print(f"Parsing {len(todo)} of {len(paths)} PDFs with {workers} workers", file=sys.stderr)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            texts = {path: executor.submit(read_lease_text, path) for path in todo}
+            for path, future in texts.items():
+                try:
+                    leases.append((os.path.basename(path), future.result()))
+                    sources.append(path)
+                except Exception as e:
+                    state[path] = dict(_file_signature(path), status="failed", error=str(e),
+                                       processed_at=datetime.now().isoformat())
+                    counts['failed'] += 1
+                    print(f"FAILED {path}: {e}", file=sys.stderr)
+        save_state(state_file, state)
+        if not leases:
+            return counts
+
+    print(f"Waiting for batch job {job_name}", file=sys.stderr)
+    manifest = run_batch_job(job_name, leases, client, poll_interval, timeout, sources)
+
+    if manifest["status"] not in TERMINAL_STATUSES | {"reconciled"}:
+        print(f"Batch job {job_name} is still {manifest['status']} - rerun to resume", file=sys.stderr)
+    else:
+        pending = set(todo)
+        for custom_id, request in manifest["requests"].items():
+            path = request.get("source")
+            if path not in pending or not os.path.exists(path):
+                continue
+            entry = dict(_file_signature(path), processed_at=datetime.now().isoformat())
+            if custom_id in manifest["reconciled"]:
+                state[path] = dict(entry, status="done", id=manifest["reconciled"][custom_id])
+                counts['done'] += 1
+            else:
+                error = manifest["failed"].get(custom_id, f"batch job {manifest['status']}")
+                state[path] = dict(entry, status="failed", error=error)
+                counts['failed'] += 1
+                print(f"FAILED {path}: {error}", file=sys.stderr)
+        save_state(state_file, state)
+
+    print(format_progress(counts, len(todo), started), file=sys.stderr)
+    return counts
+
+def export_results(paths: List[str], state: Dict[str, Dict], formats: List[str], output_dir: str,
+                   profile: Optional[str] = None) -> List[str]:
+    """
+    Export every saved lease among the given files
+
+    Args:
+        paths: PDF files of this run (including ones finished by earlier runs)
+        state: Per-file results holding the history id of each saved lease
+        formats: Export formats (see EXPORT_FORMATS)
+        output_dir: Directory to write the exports to
+        profile: Yardi mapping profile (defaults to each exporter's default)
+
+    Returns:
+        Paths of the generated files
+    """
+    from utils.export_generator import generate_yardi_excel, generate_reference_document, generate_projection_excel
+    from utils.flat_export import generate_yardi_csv, generate_yardi_parquet
+
+    extracted_data = []
+    for path in paths:
+        extraction_id = state.get(path, {}).get("id")
+        extraction = load_extraction(extraction_id) if extraction_id else None
+        if extraction:
+            extracted_data.append(extraction)
+    if not extracted_data:
+        return []
+
+    profile_args = {"profile": profile} if profile else {}
+    exporters = {
+        "yardi": lambda: generate_yardi_excel(extracted_data, output_dir, **profile_args),
+        "csv": lambda: generate_yardi_csv(extracted_data, output_dir, **profile_args),
+        "parquet": lambda: generate_yardi_parquet(extracted_data, output_dir, **profile_args),
+        "reference": lambda: generate_reference_document(extracted_data, output_dir),
+        "projection": lambda: generate_projection_excel(extracted_data, output_dir),
+    }
+    return [exporters[fmt]() for fmt in dict.fromkeys(formats)]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Extract lease data from PDF folders without the web interface. "
+                    "Rerunning the same command resumes where the last run stopped."
+    )
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories (searched recursively) or glob patterns")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of PDFs processed concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE,
+                        help=f"Where per-file progress is kept for resuming (default: {DEFAULT_STATE_FILE})")
+    parser.add_argument("--restart", action="store_true", help="Ignore earlier progress and process every file again")
+    parser.add_argument("-e", "--export", action="append", choices=EXPORT_FORMATS, default=[],
+                        help="Export format to generate after processing (repeatable)")
+    parser.add_argument("-o", "--output-dir", default="exports", help="Directory for exports (default: exports)")
+    parser.add_argument("--profile", help="Yardi mapping profile for the yardi, csv, parquet and delta exports")
+    parser.add_argument("--delta", metavar="TARGET",
+                        help="Export every lease in history created or edited since the last export to this sync target")
+    parser.add_argument("--delta-format", choices=["csv", "xlsx", "parquet"], default="csv",
+                        help="File format of the delta export (default: csv)")
+    parser.add_argument("--append-to", metavar="FILE",
+                        help="Merge the delta rows into this .csv or .xlsx file instead of writing a delta file")
+    parser.add_argument("--no-save", action="store_true", help="Do not save extractions to history")
+    parser.add_argument("--no-reuse", action="store_true",
+                        help="Always run a full extraction, even for near-identical prior leases")
+    parser.add_argument("--no-recheck", action="store_true",
+                        help="Skip the targeted re-extraction of inconsistent fields")
+    parser.add_argument("--offline", metavar="JOB_NAME",
+                        help="Extract through the OpenAI Batch API as this job (half price, results within 24h); "
+                             "rerun with the same name to resume. Reuse and rechecks do not apply")
+    parser.add_argument("--poll-interval", type=float, default=60,
+                        help="Seconds between batch job status checks (default: 60)")
+    parser.add_argument("--poll-timeout", type=float,
+                        help="Stop waiting for the batch job after this many seconds and leave it to the next run")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.no_save and args.export:
+        print("--export needs saved extractions; drop --no-save", file=sys.stderr)
+        return 2
+    if args.no_save and args.offline:
+        print("--offline always saves to history; drop --no-save", file=sys.stderr)
+        return 2
+
+    paths = collect_pdf_paths(args.inputs)
+    if not paths:
+        print("No PDF files found", file=sys.stderr)
+        return 2
+
+    state = {} if args.restart else load_state(args.state_file)
+    try:
+        if args.offline:
+            counts = run_offline_batch(paths, state, args.state_file, args.offline, workers=max(args.workers, 1),
+                                       poll_interval=args.poll_interval, timeout=args.poll_timeout)
+        else:
+            counts = run_batch(paths, state, args.state_file, workers=max(args.workers, 1),
+                               save=not args.no_save, reuse=not args.no_reuse, recheck=not args.no_recheck)
+    except KeyboardInterrupt:
+        return 130
+
+    for output in export_results(paths, state, args.export, args.output_dir, args.profile):
+        print(f"Exported {output}")
+
+    if args.delta:
+        from utils.incremental_export import export_yardi_delta
+
+        output = export_yardi_delta(args.delta, args.output_dir, args.delta_format,
+                                    args.append_to, args.profile)
+        print(f"Exported {output}" if output else f"No changes since the last {args.delta} export")
+
+    return 1 if counts['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
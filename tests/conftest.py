@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The extractor creates its OpenAI client on import; tests never reach the API
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
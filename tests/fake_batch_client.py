@@ -0,0 +1,104 @@
+"""
+File-based stand-in for the OpenAI files and batches endpoints
+
+All state lives under a directory, so a new client on the same directory
+sees the files and batches of an earlier one, the way a restarted process
+sees the real endpoint.
+"""
+
+import os
+import json
+from types import SimpleNamespace
+from typing import Callable, Dict
+
+class FakeBatchClient:
+    """
+    Minimal client exposing files.create/content and batches.create/retrieve
+
+    Args:
+        root: Directory holding uploaded files, batches and results
+        responder: Called with (custom_id, request body) for every request;
+            returns the lease data the model would answer with, or raises to
+            produce an error result
+        polls_until_complete: Number of retrieve calls before a batch completes
+    """
+
+    def __init__(self, root: str, responder: Callable[[str, Dict], Dict], polls_until_complete: int = 2):
+        self.root = str(root)
+        self.responder = responder
+        self.polls_until_complete = polls_until_complete
+        os.makedirs(os.path.join(self.root, "files"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "batches"), exist_ok=True)
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _next_id(self, prefix: str, kind: str) -> str:
+        return f"{prefix}-{len(os.listdir(os.path.join(self.root, kind))) + 1:04d}"
+
+    def _write_file(self, content: str) -> str:
+        file_id = self._next_id("file", "files")
+        with open(os.path.join(self.root, "files", file_id), 'w') as f:
+            f.write(content)
+        return file_id
+
+    def _create_file(self, file, purpose: str):
+        return SimpleNamespace(id=self._write_file(file.read().decode('utf-8')), purpose=purpose)
+
+    def _file_content(self, file_id: str):
+        with open(os.path.join(self.root, "files", file_id), 'r') as f:
+            return SimpleNamespace(text=f.read())
+
+    def _batch_path(self, batch_id: str) -> str:
+        return os.path.join(self.root, "batches", f"{batch_id}.json")
+
+    def _save_batch(self, batch: Dict) -> SimpleNamespace:
+        with open(self._batch_path(batch["id"]), 'w') as f:
+            json.dump(batch, f)
+        return SimpleNamespace(**{key: value for key, value in batch.items() if key != "polls"})
+
+    def _create_batch(self, input_file_id: str, endpoint: str, completion_window: str, metadata=None):
+        return self._save_batch({
+            "id": self._next_id("batch", "batches"),
+            "status": "validating",
+            "input_file_id": input_file_id,
+            "endpoint": endpoint,
+            "output_file_id": None,
+            "error_file_id": None,
+            "polls": 0,
+        })
+
+    def _retrieve_batch(self, batch_id: str):
+        with open(self._batch_path(batch_id), 'r') as f:
+            batch = json.load(f)
+
+        batch["polls"] += 1
+        if batch["status"] != "completed":
+            if batch["polls"] >= self.polls_until_complete:
+                self._complete(batch)
+            else:
+                batch["status"] = "in_progress"
+        return self._save_batch(batch)
+
+    def _complete(self, batch: Dict) -> None:
+        outputs, errors = [], []
+        for line in self._file_content(batch["input_file_id"]).text.splitlines():
+            request = json.loads(line)
+            try:
+                lease_data = self.responder(request["custom_id"], request["body"])
+            except Exception as e:
+                errors.append({"custom_id": request["custom_id"], "response": None,
+                               "error": {"code": "server_error", "message": str(e)}})
+                continue
+            outputs.append({"custom_id": request["custom_id"], "error": None, "response": {
+                "status_code": 200,
+                "body": {
+                    "model": request["body"]["model"],
+                    "choices": [{"message": {"role": "assistant", "content": json.dumps(lease_data)}}],
+                    "usage": {"prompt_tokens": 1000, "completion_tokens": 200},
+                },
+            }})
+
+        batch["status"] = "completed"
+        batch["output_file_id"] = self._write_file("".join(json.dumps(line) + "\n" for line in outputs))
+        if errors:
+            batch["error_file_id"] = self._write_file("".join(json.dumps(line) + "\n" for line in errors))
@@ -0,0 +1,80 @@
+import pytest
+
+from fake_batch_client import FakeBatchClient
+from utils import batch_jobs
+from utils.batch_jobs import create_batch_job, poll_batch_job, reconcile_batch_job, run_batch_job, submit_batch_job
+from utils.history_manager import get_extraction_count, load_extraction
+from utils.metrics_store import load_extraction_metrics
+
+LEASES = [(f"lease_{idx}.pdf", f"Lease {idx}: tenant Tenant {idx} pays monthly rent of ${1000 + idx}.")
+          for idx in range(1, 6)]
+
+def respond(custom_id, body):
+    prompt = body["messages"][-1]["content"]
+    if "Lease 3:" in prompt:
+        raise RuntimeError("model overloaded")
+    idx = next(idx for idx in range(1, 6) if f"Lease {idx}:" in prompt)
+    return {"tenant_name": f"Tenant {idx}", "monthly_rent": 1000 + idx, "lease_number": f"L-{idx}"}
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # History, batch jobs and metrics all live under the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def test_submit_poll_reconcile_resume_without_duplicates(workdir, monkeypatch):
+    endpoint = workdir / "endpoint"
+    client = FakeBatchClient(endpoint, respond)
+
+    create_batch_job("onboarding", LEASES)
+    assert submit_batch_job("onboarding", client)["status"] == "validating"
+    manifest = poll_batch_job("onboarding", client, poll_interval=0)
+    assert manifest["status"] == "completed"
+
+    # Crash right after the second group commits, before the manifest records it
+    monkeypatch.setattr(batch_jobs, "RECONCILE_BATCH_SIZE", 2)
+    save_extractions = batch_jobs.save_extractions
+    calls = []
+
+    def crash_after_second_save(extractions, extraction_ids=None):
+        calls.append(len(extractions))
+        saved = save_extractions(extractions, extraction_ids)
+        if len(calls) == 2:
+            raise RuntimeError("process killed")
+        return saved
+
+    monkeypatch.setattr(batch_jobs, "save_extractions", crash_after_second_save)
+    with pytest.raises(RuntimeError):
+        reconcile_batch_job("onboarding", client)
+    monkeypatch.setattr(batch_jobs, "save_extractions", save_extractions)
+    assert get_extraction_count() == 4
+
+    # Restart: a new client on the same endpoint, resumed through the full runner
+    manifest = run_batch_job("onboarding", LEASES, FakeBatchClient(endpoint, respond), poll_interval=0)
+
+    assert manifest["status"] == "reconciled"
+    assert sorted(manifest["reconciled"]) == ["lease-000001", "lease-000002", "lease-000004", "lease-000005"]
+    assert list(manifest["failed"]) == ["lease-000003"]
+    assert manifest["saving"] == {}
+    assert get_extraction_count() == 4
+    tenants = sorted(load_extraction(extraction_id)["data"]["tenant_name"]
+                     for extraction_id in manifest["reconciled"].values())
+    assert tenants == ["Tenant 1", "Tenant 2", "Tenant 4", "Tenant 5"]
+
+    # Each saved result's cost is recorded once, however often reconciliation ran
+    assert sorted(load_extraction_metrics()["filename"]) == ["lease_1.pdf", "lease_2.pdf", "lease_4.pdf", "lease_5.pdf"]
+
+    # A finished job is a no-op
+    run_batch_job("onboarding", LEASES, FakeBatchClient(endpoint, respond), poll_interval=0)
+    assert get_extraction_count() == 4
+
+def test_poll_timeout_leaves_job_resumable(workdir):
+    client = FakeBatchClient(workdir / "endpoint", respond, polls_until_complete=3)
+
+    manifest = run_batch_job("nightly", LEASES[:2], client, poll_interval=0, timeout=0)
+    assert manifest["status"] == "in_progress"
+    assert get_extraction_count() == 0
+
+    manifest = run_batch_job("nightly", LEASES[:2], client, poll_interval=0)
+    assert manifest["status"] == "reconciled"
+    assert get_extraction_count() == 2
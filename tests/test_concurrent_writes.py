@@ -0,0 +1,70 @@
+"""
+Stress test: many processes saving to history (with the similarity index) and
+the export watermarks at the same time, as concurrent Streamlit sessions and
+batch workers do
+"""
+
+import multiprocessing
+from contextlib import closing
+
+from utils.history_manager import get_connection, get_extraction_count, iter_extractions
+from utils.incremental_export import load_watermarks, save_watermark
+
+PROCESSES = 8
+ROUNDS = 10
+BATCH_SIZE = 5
+WATERMARK_WRITES = 50
+
+def _lease_text(worker: int, round_number: int, idx: int) -> str:
+    return (f"Lease {worker}-{round_number}-{idx} between Landlord {worker} LLC and Tenant {round_number}-{idx}. "
+            f"Monthly rent is ${1000 + worker * 100 + idx} due on day {idx + 1} of each month. ") * 4
+
+def _writer(worker: int, barrier) -> None:
+    from utils.history_manager import save_extractions
+
+    # Start every phase together so the writers actually overlap
+    barrier.wait()
+    for round_number in range(ROUNDS):
+        leases = [(f"w{worker}_r{round_number}_{idx}.pdf",
+                   {"tenant_name": f"Tenant {round_number}-{idx}", "monthly_rent": 1000 + idx},
+                   _lease_text(worker, round_number, idx))
+                  for idx in range(BATCH_SIZE)]
+        save_extractions([(filename, data) for filename, data, _ in leases], texts=[text for _, _, text in leases])
+
+    # Back-to-back watermark updates of different targets contend on one file
+    barrier.wait()
+    for write in range(WATERMARK_WRITES):
+        save_watermark(f"worker_{worker}", {"exported_at": None, "high_water_timestamp": str(write),
+                                            "boundary_ids": []})
+
+def test_concurrent_writers_lose_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    # Fresh interpreters, so nothing is shared but the files on disk
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(PROCESSES)
+    workers = [context.Process(target=_writer, args=(worker, barrier)) for worker in range(PROCESSES)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=300)
+    assert [process.exitcode for process in workers] == [0] * PROCESSES
+
+    expected = PROCESSES * ROUNDS * BATCH_SIZE
+    assert get_extraction_count() == expected
+
+    records = list(iter_extractions())
+    extraction_ids = {record["id"] for record in records}
+    assert len(extraction_ids) == expected
+    assert {record["filename"] for record in records} == {
+        f"w{worker}_r{round_number}_{idx}.pdf"
+        for worker in range(PROCESSES) for round_number in range(ROUNDS) for idx in range(BATCH_SIZE)
+    }
+
+    with closing(get_connection()) as conn:
+        assert {row[0] for row in conn.execute("SELECT id FROM similarity_signatures")} == extraction_ids
+        assert {row[0] for row in conn.execute("SELECT DISTINCT id FROM similarity_bands")} == extraction_ids
+
+    watermarks = load_watermarks()
+    assert sorted(watermarks) == sorted(f"worker_{worker}" for worker in range(PROCESSES))
+    assert all(watermark["high_water_timestamp"] == str(WATERMARK_WRITES - 1) for watermark in watermarks.values())
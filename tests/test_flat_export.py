@@ -0,0 +1,21 @@
+import csv
+import io
+
+from utils.flat_export import to_decimal, to_integer, write_yardi_csv
+
+def test_non_finite_numbers_are_exported_as_empty():
+    assert to_integer(float('inf')) is None
+    assert to_integer('nan') is None
+    assert to_decimal(float('nan')) is None
+    assert to_decimal('-inf') is None
+    assert to_integer('12.7') == 12
+
+    output = io.StringIO()
+    rows = [{"filename": "lease.pdf", "data": {"square_footage": float('inf'), "monthly_rent": float('nan'), "security_deposit": 1500}}]
+    assert write_yardi_csv(rows, output) == 1
+
+    output.seek(0)
+    row = next(csv.DictReader(output))
+    assert row["SquareFootage"] == ""
+    assert row["MonthlyRent"] == ""
+    assert row["SecurityDeposit"] == "1500.00"
@@ -0,0 +1,14 @@
+from utils.history_manager import load_extraction, save_extractions, update_extractions
+
+def test_cached_record_is_replaced_by_a_save_under_the_same_id(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    extraction_id = save_extractions([("lease.pdf", {"monthly_rent": 1000})])[0]
+    assert load_extraction(extraction_id)["data"]["monthly_rent"] == 1000
+
+    # A retried save replaces the record without bumping its version
+    save_extractions([("lease.pdf", {"monthly_rent": 1200})], [extraction_id])
+    assert load_extraction(extraction_id)["data"]["monthly_rent"] == 1200
+
+    update_extractions({extraction_id: {"monthly_rent": 1300}})
+    assert load_extraction(extraction_id)["data"]["monthly_rent"] == 1300
@@ -0,0 +1,36 @@
+import csv
+
+import pytest
+
+from utils.history_manager import save_extractions, update_extractions
+from utils.incremental_export import export_yardi_delta, get_watermark
+
+def _lease_numbers(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return sorted(row["LeaseNumber"] for row in csv.DictReader(f))
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def test_delta_exports_only_changed_leases(workdir):
+    ids = save_extractions([(f"lease_{idx}.pdf", {"lease_number": f"L-{idx}", "monthly_rent": 1000 + idx})
+                            for idx in range(3)])
+
+    first = export_yardi_delta("nightly")
+    assert _lease_numbers(first) == ["L-0", "L-1", "L-2"]
+    assert set(get_watermark("nightly")["boundary_ids"]) == set(ids)
+
+    # Nothing changed since, including leases saved in the same second as the watermark
+    assert export_yardi_delta("nightly") is None
+
+    update_extractions({ids[1]: {"monthly_rent": 1500}})
+    save_extractions([("lease_3.pdf", {"lease_number": "L-3"})])[0]
+    second = export_yardi_delta("nightly")
+    assert _lease_numbers(second) == ["L-1", "L-3"]
+
+    watermark = get_watermark("nightly")
+    assert "records" not in watermark
+    assert ids[0] not in watermark["boundary_ids"]
+    assert export_yardi_delta("nightly") is None
@@ -0,0 +1,24 @@
+from utils.text_preprocessor import locate_sources, preprocess_lease_text
+
+PAGES = [
+    "ACME LEASE - Page 1\nThis lease is made between Landlord and Tenant.\nMonthly Rent: $1,500.00\n"
+    "Rent is due on the first day of each month.\nACME Property Management 2024",
+    "",
+    "ACME LEASE - Page 3\nParking is assigned by the landlord.\nMonthly Rent: $2,750.00\n"
+    "Pets are allowed with a deposit.\nACME Property Management 2024",
+]
+
+def test_running_headers_are_stripped_but_numeric_body_lines_kept():
+    text, _ = preprocess_lease_text(PAGES)
+
+    assert "ACME" not in text
+    assert "Monthly Rent: $1,500.00" in text
+    assert "Monthly Rent: $2,750.00" in text
+
+def test_source_pages_count_blank_pages():
+    text, offset_map = preprocess_lease_text(PAGES)
+    locations = locate_sources({"pet_allowed_source": "Pets are allowed with a deposit"}, PAGES, text, offset_map)
+
+    assert locations["pet_allowed"]["page"] == 3
+    original = "\n\n".join(PAGES)
+    assert original[locations["pet_allowed"]["start"]:locations["pet_allowed"]["end"]] == "Pets are allowed with a deposit"
@@ -2,17 +2,28 @@
 Lease Abstraction Tool - Utilities Package
 """
 
-from .pdf_processor import extract_text_from_pdf, validate_pdf, get_pdf_metadata
+from .pdf_processor import extract_text_from_pdf, extract_pages_from_pdf, validate_pdf, get_pdf_metadata
 from .ai_extractor import extract_lease_data, extract_batch_lease_data, get_confidence_level
-from .export_generator import generate_yardi_excel, generate_reference_document
+from .export_generator import (
+    generate_yardi_excel, generate_reference_document,
+    generate_yardi_excel_bytes, generate_reference_document_bytes
+)
+from .data_normalizer import normalize_lease_batch
+from .text_preprocessor import preprocess_lease_text, locate_sources
 
 __all__ = [
     'extract_text_from_pdf',
+    'extract_pages_from_pdf',
     'validate_pdf',
     'get_pdf_metadata',
     'extract_lease_data',
     'extract_batch_lease_data',
     'get_confidence_level',
     'generate_yardi_excel',
-    'generate_reference_document'
+    'generate_reference_document',
+    'generate_yardi_excel_bytes',
+    'generate_reference_document_bytes',
+    'normalize_lease_batch',
+    'preprocess_lease_text',
+    'locate_sources'
 ]
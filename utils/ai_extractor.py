@@ -5,12 +5,29 @@ Uses OpenAI GPT to extract structured data from lease documents
 
 import json
 import os
+import re
+import time
+from datetime import datetime
 from openai import OpenAI
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from .metrics_store import record_extraction_metrics
 
 # Initialize OpenAI client (API key is pre-configured in environment)
 client = OpenAI()
 
+EXTRACTION_MODEL = "gpt-4.1-mini"
+
+# Maximum characters of lease text sent with each prompt
+MAX_LEASE_CHARS = 20000
+
+# USD per 1M tokens, used for cost estimates in the metrics store
+MODEL_PRICING = {
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "gpt-4.1-nano": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+}
+
 EXTRACTION_PROMPT_TEMPLATE = """You are a professional lease document abstraction specialist with expertise in property management and Yardi systems.
 
 Your task is to extract key information from the following lease agreement text and return it as a structured JSON object. For EACH field, you must also provide the exact text snippet from the document where you found that information.
@@ -144,53 +161,239 @@ Lease Document Text:
 
 Return the extracted data as JSON:"""
 
-def extract_lease_data(lease_text: str, filename: str = "") -> Optional[Dict]:
+SYSTEM_PROMPT = "You are a professional lease abstraction specialist. For EVERY field you extract, you MUST include the source text from the document. Extract data accurately with source citations and return only valid JSON. Pay special attention to dates and financial terms. If you found a value, you MUST include where you found it in the corresponding _source field."
+
+# Field definitions parsed from the prompt so partial extractions use the same wording
+FIELD_DESCRIPTIONS = {
+    name: description
+    for name, description in re.findall(r'^- (\w+): (.+)$', EXTRACTION_PROMPT_TEMPLATE, re.MULTILINE)
+    if not name.endswith('_source')
+}
+
+PARTIAL_EXTRACTION_PROMPT_TEMPLATE = """You are a professional lease document abstraction specialist with expertise in property management and Yardi systems.
+
+The lease below is a renewal or near-duplicate of a lease that was already abstracted. Only the fields listed here may have changed. Extract ONLY these fields from the document, each with its "_source" field containing the exact text snippet (20-50 words of context) where you found it:
+
+{field_list}
+
+IMPORTANT RULES:
+1. Return ONLY valid JSON containing the listed fields and their _source fields
+2. If you cannot find a field, use null for the value and "Not found in document" for the source
+3. Format all dates as YYYY-MM-DD (convert from any format you find)
+4. Format all currency values as numbers without symbols (e.g., 1500.00 not $1,500)
+
+Lease Document Text:
+{lease_text}
+
+Return the extracted data as JSON:"""
+
+RECHECK_PROMPT_TEMPLATE = """You are a professional lease document abstraction specialist with expertise in property management and Yardi systems.
+
+The fields listed below were already extracted from this lease, but the values contradict each other:
+
+{issues}
+
+Re-read the document carefully and extract ONLY these fields again, each with its "_source" field containing the exact text snippet (20-50 words of context) where you found it:
+
+{field_list}
+
+IMPORTANT RULES:
+1. Return ONLY valid JSON containing the listed fields and their _source fields
+2. If you cannot find a field, use null for the value and "Not found in document" for the source
+3. Format all dates as YYYY-MM-DD (convert from any format you find)
+4. Format all currency values as numbers without symbols (e.g., 1500.00 not $1,500)
+5. If the document itself is inconsistent, report the values as written
+
+Lease Document Text:
+{lease_text}
+
+Return the extracted data as JSON:"""
+
+def parse_model_json(response_text: str) -> Dict:
+    """
+    Parse a JSON object from a model response
+
+    Sometimes the model wraps JSON in markdown code blocks, so those are
+    stripped before parsing. Raises json.JSONDecodeError on invalid JSON.
+    """
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text.replace("```json", "").replace("```", "").strip()
+    elif response_text.startswith("```"):
+        response_text = response_text.replace("```", "").strip()
+
+    return json.loads(response_text)
+
+def estimate_tokens(text: str, model: str = EXTRACTION_MODEL) -> int:
+    """
+    Estimate the number of tokens in a piece of text before sending it
+
+    Uses tiktoken when it is installed, otherwise the ~4 characters per token
+    rule of thumb for English text.
+    """
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return len(encoding.encode(text))
+    except ImportError:
+        return len(text) // 4
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Estimate the USD cost of a call from its token usage"""
+    pricing = MODEL_PRICING.get(model)
+    if not pricing:
+        return 0.0
+
+    uncached_tokens = prompt_tokens - cached_tokens
+    return (
+        uncached_tokens * pricing["input"] +
+        cached_tokens * pricing["cached_input"] +
+        completion_tokens * pricing["output"]
+    ) / 1_000_000
+
+def build_extraction_request(prompt: str) -> Dict:
+    """
+    Build the chat completion request body for an extraction prompt
+
+    Shared by interactive calls and offline batch files so both send the same request.
+    """
+    # Call OpenAI API with better parameters for accuracy
+    return {
+        "model": EXTRACTION_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": 0.05,  # Even lower temperature for more consistency
+        "max_tokens": 3000  # Increased for source citations
+    }
+
+def record_metrics(metrics: Dict) -> None:
+    """Write call metrics without letting a metrics store failure break the extraction"""
+    try:
+        record_extraction_metrics(metrics)
+    except OSError as e:
+        print(f"Error recording extraction metrics: {str(e)}")
+
+def run_extraction_call(prompt: str, filename: str = "", batch_id: Optional[str] = None,
+                        mode: str = "full", document_chars: int = 0):
+    """
+    Send an extraction prompt to the model and account for its tokens, cost and latency
+
+    The response is streamed so time-to-first-token can be measured; usage is
+    requested on the final chunk. Metrics are written to the metrics store,
+    with status "error" and the error message when the call fails.
+
+    Args:
+        prompt: Fully formatted user prompt
+        filename: Name of the source file (for reference)
+        batch_id: Identifier of the batch the call belongs to
+        mode: Extraction mode ("full", "partial" or "recheck")
+        document_chars: Length of the lease text before truncation
+
+    Returns:
+        Tuple of (response text, metrics dictionary)
+    """
+    metrics = {
+        "timestamp": datetime.now().isoformat(),
+        "batch_id": batch_id,
+        "filename": filename,
+        "model": EXTRACTION_MODEL,
+        "mode": mode,
+        "document_chars": document_chars,
+        "prompt_chars": len(prompt),
+        "estimated_prompt_tokens": estimate_tokens(SYSTEM_PROMPT + prompt),
+    }
+
+    started = time.perf_counter()
+    first_token_at = None
+    chunks = []
+    usage = None
+
+    try:
+        stream = client.chat.completions.create(
+            **build_extraction_request(prompt),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunks.append(chunk.choices[0].delta.content)
+            if chunk.usage:
+                usage = chunk.usage
+    except Exception as e:
+        # Failed calls are recorded too, so error rates show up next to cost and latency
+        metrics.update({
+            "status": "error",
+            "error": str(e),
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "cached_tokens": 0,
+            "estimated_cost": estimate_cost(EXTRACTION_MODEL, usage.prompt_tokens, usage.completion_tokens) if usage else 0.0,
+            "time_to_first_token": round(first_token_at - started, 4) if first_token_at else None,
+            "total_latency": round(time.perf_counter() - started, 4),
+        })
+        record_metrics(metrics)
+        raise
+
+    finished = time.perf_counter()
+
+    prompt_tokens = usage.prompt_tokens if usage else metrics["estimated_prompt_tokens"]
+    completion_tokens = usage.completion_tokens if usage else 0
+    details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    metrics.update({
+        "status": "ok",
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "estimated_cost": estimate_cost(EXTRACTION_MODEL, prompt_tokens, completion_tokens, cached_tokens),
+        "time_to_first_token": round(first_token_at - started, 4) if first_token_at else None,
+        "total_latency": round(finished - started, 4),
+    })
+
+    record_metrics(metrics)
+
+    return "".join(chunks).strip(), metrics
+
+def extract_lease_data(lease_text: str, filename: str = "", batch_id: Optional[str] = None) -> Optional[Dict]:
     """
     Extract structured lease data from raw text using AI with source citations
     
     Args:
         lease_text: Raw text extracted from lease PDF
         filename: Name of the source file (for reference)
+        batch_id: Identifier of the batch the call belongs to (for metrics)
         
     Returns:
         Dictionary containing extracted lease data with source citations, or None if extraction fails
     """
+    response_text = ""
     try:
         # Prepare the prompt
-        prompt = EXTRACTION_PROMPT_TEMPLATE.format(lease_text=lease_text[:20000])  # Increased limit
-        
-        # Call OpenAI API with better parameters for accuracy
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a professional lease abstraction specialist. For EVERY field you extract, you MUST include the source text from the document. Extract data accurately with source citations and return only valid JSON. Pay special attention to dates and financial terms. If you found a value, you MUST include where you found it in the corresponding _source field."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.05,  # Even lower temperature for more consistency
-            max_tokens=3000  # Increased for source citations
-        )
+        prompt = EXTRACTION_PROMPT_TEMPLATE.format(lease_text=lease_text[:MAX_LEASE_CHARS])
         
-        # Extract the response
-        response_text = response.choices[0].message.content.strip()
-        
-        # Try to parse as JSON
-        # Sometimes the model wraps JSON in markdown code blocks
-        if response_text.startswith("```json"):
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.replace("```", "").strip()
+        response_text, metrics = run_extraction_call(prompt, filename, batch_id, "full", len(lease_text))
         
         # Parse JSON
-        lease_data = json.loads(response_text)
+        lease_data = parse_model_json(response_text)
         
-        # Add source filename
+        # Add source filename and call accounting
         lease_data['source_filename'] = filename
+        lease_data['extraction_metrics'] = metrics
         
         # Validate and clean the data
         lease_data = validate_and_clean_data(lease_data)
@@ -205,6 +408,129 @@ def extract_lease_data(lease_text: str, filename: str = "") -> Optional[Dict]:
         print(f"Error extracting lease data: {str(e)}")
         return None
 
+def _normalize_passage(text: str) -> str:
+    """Lowercase and collapse whitespace so passages compare across PDF layouts"""
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+def find_changed_fields(lease_text: str, prior_data: Dict) -> List[str]:
+    """
+    Find fields whose cited passage no longer appears in a lease
+
+    Args:
+        lease_text: Raw text of the new lease
+        prior_data: Extracted data of the closest prior lease
+
+    Returns:
+        Names of fields that need to be extracted again
+    """
+    normalized_text = _normalize_passage(lease_text)
+    changed = []
+
+    for field in FIELD_DESCRIPTIONS:
+        if field == 'confidence_score':
+            continue
+        source = prior_data.get(f"{field}_source")
+        if not source or source == "Not found in document":
+            # Nothing to compare against, so the field has to be asked for again
+            changed.append(field)
+        elif _normalize_passage(source) not in normalized_text:
+            changed.append(field)
+
+    return changed
+
+def extract_changed_fields(lease_text: str, prior_data: Dict, filename: str = "",
+                           batch_id: Optional[str] = None) -> Optional[Dict]:
+    """
+    Extract only the fields of a near-duplicate lease whose source passages changed
+
+    Fields whose cited passage still appears verbatim in the new text are
+    carried over from the prior extraction, so the model is asked for a much
+    smaller JSON object than a full extraction.
+
+    Args:
+        lease_text: Raw text extracted from lease PDF
+        prior_data: Extracted data of the closest prior lease
+        filename: Name of the source file (for reference)
+        batch_id: Identifier of the batch the call belongs to (for metrics)
+
+    Returns:
+        Dictionary containing merged lease data with source citations, or None if extraction fails
+    """
+    changed_fields = find_changed_fields(lease_text, prior_data)
+
+    lease_data = dict(prior_data)
+    lease_data['source_filename'] = filename
+    # Metadata about the prior extraction does not describe this one
+    for key in ('extraction_metrics', 'consistency_issues', 'reused_fields', 'source_locations'):
+        lease_data.pop(key, None)
+    lease_data['reused_fields'] = [f for f in FIELD_DESCRIPTIONS if f not in changed_fields and f != 'confidence_score']
+
+    if not changed_fields:
+        return validate_and_clean_data(lease_data)
+
+    field_list = "\n".join(f"- {field}: {FIELD_DESCRIPTIONS[field]}" for field in changed_fields + ['confidence_score'])
+    prompt = PARTIAL_EXTRACTION_PROMPT_TEMPLATE.format(field_list=field_list, lease_text=lease_text[:MAX_LEASE_CHARS])
+    return _merge_partial_extraction(prompt, lease_text, lease_data, changed_fields, filename, batch_id, "partial")
+
+def reextract_fields(lease_text: str, lease_data: Dict, fields: List[str], issues: List[str],
+                     filename: str = "", batch_id: Optional[str] = None) -> Optional[Dict]:
+    """
+    Ask the model again for only the fields a consistency check flagged
+
+    The prompt names the contradictions that were found, so the model
+    re-reads the relevant passages instead of the whole lease being extracted
+    again.
+
+    Args:
+        lease_text: Raw text extracted from lease PDF
+        lease_data: Extracted data that failed the consistency check
+        fields: Suspect field names to extract again
+        issues: Descriptions of the violated rules
+        filename: Name of the source file (for reference)
+        batch_id: Identifier of the batch the call belongs to (for metrics)
+
+    Returns:
+        Dictionary containing the merged lease data, or None if extraction fails
+    """
+    fields = [field for field in fields if field in FIELD_DESCRIPTIONS]
+    if not fields:
+        return validate_and_clean_data(dict(lease_data))
+
+    field_list = "\n".join(f"- {field}: {FIELD_DESCRIPTIONS[field]}" for field in fields + ['confidence_score'])
+    prompt = RECHECK_PROMPT_TEMPLATE.format(
+        issues="\n".join(f"- {issue}" for issue in issues),
+        field_list=field_list,
+        lease_text=lease_text[:MAX_LEASE_CHARS]
+    )
+    lease_data = dict(lease_data)
+    lease_data.pop('extraction_metrics', None)
+    return _merge_partial_extraction(prompt, lease_text, lease_data, fields, filename, batch_id, "recheck")
+
+def _merge_partial_extraction(prompt: str, lease_text: str, lease_data: Dict, fields: List[str],
+                              filename: str, batch_id: Optional[str], mode: str) -> Optional[Dict]:
+    """Run a partial extraction prompt and merge the returned fields into lease_data"""
+    response_text = ""
+    try:
+        response_text, metrics = run_extraction_call(prompt, filename, batch_id, mode, len(lease_text))
+        changes = parse_model_json(response_text)
+        lease_data['extraction_metrics'] = metrics
+
+        for field in fields:
+            lease_data[field] = changes.get(field)
+            lease_data[f"{field}_source"] = changes.get(f"{field}_source", "Not found in document")
+        if changes.get('confidence_score') is not None:
+            lease_data['confidence_score'] = changes['confidence_score']
+
+        return validate_and_clean_data(lease_data)
+
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON response: {str(e)}")
+        print(f"Response text: {response_text}")
+        return None
+    except Exception as e:
+        print(f"Error extracting {mode} lease fields: {str(e)}")
+        return None
+
 def validate_and_clean_data(data: Dict) -> Dict:
     """
     Validate and clean extracted lease data
@@ -323,9 +649,11 @@ def extract_batch_lease_data(lease_texts: list, filenames: list = None) -> list:
     if filenames is None:
         filenames = [f"document_{i+1}" for i in range(len(lease_texts))]
     
+    batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
     results = []
     for text, filename in zip(lease_texts, filenames):
-        data = extract_lease_data(text, filename)
+        data = extract_lease_data(text, filename, batch_id)
         if data:
             results.append(data)
     
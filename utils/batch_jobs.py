@@ -0,0 +1,347 @@
+"""
+Offline Batch Extraction Module
+Bulk lease extraction through the OpenAI Batch API for portfolio onboarding
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from . import ai_extractor
+from .ai_extractor import (
+    EXTRACTION_MODEL, EXTRACTION_PROMPT_TEMPLATE, MAX_LEASE_CHARS,
+    build_extraction_request, estimate_cost, parse_model_json, record_metrics, validate_and_clean_data
+)
+from .history_manager import generate_extraction_id, save_extractions
+from .file_locks import atomic_write_json
+from .data_normalizer import normalize_lease_batch
+
+BATCH_JOBS_DIR = "batch_jobs"
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Batch API requests are billed at half the synchronous price
+BATCH_PRICE_DISCOUNT = 0.5
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Reconciled results are saved to history in groups of this size
+RECONCILE_BATCH_SIZE = 100
+
+def _job_dir(job_name: str) -> str:
+    return os.path.join(BATCH_JOBS_DIR, job_name)
+
+def _manifest_path(job_name: str) -> str:
+    return os.path.join(_job_dir(job_name), "manifest.json")
+
+def load_batch_manifest(job_name: str) -> Optional[Dict]:
+    """
+    Load the manifest of a batch job
+
+    Args:
+        job_name: Name of the batch job
+
+    Returns:
+        Manifest dictionary, or None if the job does not exist
+    """
+    path = _manifest_path(job_name)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_batch_manifest(manifest: Dict) -> None:
+    """Persist a batch job manifest (fsynced and renamed into place so a crash cannot truncate it)"""
+    atomic_write_json(_manifest_path(manifest["job_name"]), manifest, indent=2)
+
+def create_batch_job(job_name: str, leases: List[Tuple[str, str]],
+                     sources: Optional[List[str]] = None) -> Dict:
+    """
+    Write one JSONL extraction request per lease in the OpenAI batch format
+
+    If the job already exists its manifest is returned unchanged, so calling
+    this again after a restart is safe.
+
+    Args:
+        job_name: Name of the batch job (used as its directory name)
+        leases: List of (filename, lease text) pairs
+        sources: Optional path of each lease's PDF, kept in the manifest so
+            results can be matched back to files
+
+    Returns:
+        Batch job manifest
+    """
+    manifest = load_batch_manifest(job_name)
+    if manifest:
+        return manifest
+
+    os.makedirs(_job_dir(job_name), exist_ok=True)
+    requests_file = os.path.join(_job_dir(job_name), "requests.jsonl")
+
+    requests = {}
+    with open(requests_file, 'w') as f:
+        for idx, (filename, lease_text) in enumerate(leases, 1):
+            custom_id = f"lease-{idx:06d}"
+            prompt = EXTRACTION_PROMPT_TEMPLATE.format(lease_text=lease_text[:MAX_LEASE_CHARS])
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": build_extraction_request(prompt)
+            }) + "\n")
+            requests[custom_id] = {"filename": filename, "document_chars": len(lease_text)}
+            if sources:
+                requests[custom_id]["source"] = sources[idx - 1]
+
+    manifest = {
+        "job_name": job_name,
+        "created_at": datetime.now().isoformat(),
+        "status": "prepared",
+        "requests_file": requests_file,
+        "requests": requests,
+        "input_file_id": None,
+        "batch_id": None,
+        "output_file_id": None,
+        "error_file_id": None,
+        "reconciled": {},
+        "saving": {},
+        "failed": {}
+    }
+    save_batch_manifest(manifest)
+
+    return manifest
+
+def submit_batch_job(job_name: str, client=None) -> Dict:
+    """
+    Upload the request file and create the batch (skipped if already submitted)
+
+    Args:
+        job_name: Name of the batch job
+        client: OpenAI-compatible client (defaults to the extractor's client)
+
+    Returns:
+        Updated batch job manifest
+    """
+    client = client or ai_extractor.client
+    manifest = load_batch_manifest(job_name)
+
+    if manifest["batch_id"]:
+        return manifest
+
+    if not manifest["input_file_id"]:
+        with open(manifest["requests_file"], 'rb') as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        manifest["input_file_id"] = uploaded.id
+        save_batch_manifest(manifest)
+
+    batch = client.batches.create(
+        input_file_id=manifest["input_file_id"],
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+        metadata={"job_name": job_name}
+    )
+    manifest["batch_id"] = batch.id
+    manifest["status"] = batch.status
+    save_batch_manifest(manifest)
+
+    return manifest
+
+def poll_batch_job(job_name: str, client=None, poll_interval: float = 60,
+                   timeout: Optional[float] = None) -> Dict:
+    """
+    Poll a submitted batch until it reaches a terminal status
+
+    Args:
+        job_name: Name of the batch job
+        client: OpenAI-compatible client (defaults to the extractor's client)
+        poll_interval: Seconds to wait between status checks
+        timeout: Give up after this many seconds (None waits indefinitely)
+
+    Returns:
+        Updated batch job manifest
+    """
+    client = client or ai_extractor.client
+    manifest = load_batch_manifest(job_name)
+    started = time.monotonic()
+
+    while manifest["status"] not in TERMINAL_STATUSES:
+        batch = client.batches.retrieve(manifest["batch_id"])
+        manifest["status"] = batch.status
+        manifest["output_file_id"] = batch.output_file_id
+        manifest["error_file_id"] = batch.error_file_id
+        save_batch_manifest(manifest)
+
+        if manifest["status"] in TERMINAL_STATUSES:
+            break
+        if timeout is not None and time.monotonic() - started >= timeout:
+            break
+        time.sleep(poll_interval)
+
+    return manifest
+
+def _download_file(client, file_id: str, path: str) -> str:
+    """Download a batch result file once and keep a local copy for restarts"""
+    if not os.path.exists(path):
+        content = client.files.content(file_id).text
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return path
+
+def _save_reconciled(manifest: Dict, pending: List[Tuple[str, str, Dict]]) -> None:
+    """
+    Save a group of results to history and mark them reconciled
+
+    The raw model outputs are normalized together, columnwise, before the
+    remaining defaults are filled per record. The history IDs are checkpointed
+    in the manifest before the save, so a crash at any point never leaves a
+    saved record the manifest does not know. Metrics are recorded only once
+    the group is marked reconciled, so a resumed job does not count them twice.
+    """
+    if not pending:
+        return
+
+    metrics = [lease_data['extraction_metrics'] for _, _, lease_data in pending]
+    normalized, _ = normalize_lease_batch([lease_data for _, _, lease_data in pending])
+    pending[:] = [(custom_id, filename, validate_and_clean_data(lease_data))
+                  for (custom_id, filename, _), lease_data in zip(pending, normalized)]
+
+    saving = manifest["saving"]
+    for custom_id, _, _ in pending:
+        saving.setdefault(custom_id, generate_extraction_id())
+    save_batch_manifest(manifest)
+
+    save_extractions([(filename, lease_data) for _, filename, lease_data in pending],
+                     [saving[custom_id] for custom_id, _, _ in pending])
+
+    for custom_id, _, _ in pending:
+        manifest["failed"].pop(custom_id, None)
+        manifest["reconciled"][custom_id] = saving.pop(custom_id)
+    save_batch_manifest(manifest)
+    pending.clear()
+
+    for call_metrics in metrics:
+        record_metrics(call_metrics)
+
+def reconcile_batch_job(job_name: str, client=None) -> Dict:
+    """
+    Save completed batch results into history, matched back to leases by custom_id
+
+    Results already reconciled are skipped, so this can be re-run after a restart.
+
+    Args:
+        job_name: Name of the batch job
+        client: OpenAI-compatible client (defaults to the extractor's client)
+
+    Returns:
+        Updated batch job manifest
+    """
+    client = client or ai_extractor.client
+    manifest = load_batch_manifest(job_name)
+
+    result_files = []
+    if manifest["output_file_id"]:
+        result_files.append(_download_file(client, manifest["output_file_id"],
+                                           os.path.join(_job_dir(job_name), "output.jsonl")))
+    if manifest["error_file_id"]:
+        result_files.append(_download_file(client, manifest["error_file_id"],
+                                           os.path.join(_job_dir(job_name), "errors.jsonl")))
+
+    # IDs of a group whose save may not have committed before a crash; its
+    # results are saved again under the same IDs, replacing rather than duplicating
+    manifest.setdefault("saving", {})
+    pending = []
+
+    for path in result_files:
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                custom_id = result["custom_id"]
+                request = manifest["requests"].get(custom_id)
+                if request is None or custom_id in manifest["reconciled"]:
+                    continue
+
+                response = result.get("response") or {}
+                if result.get("error") or response.get("status_code") != 200:
+                    manifest["failed"][custom_id] = str(result.get("error") or response.get("body"))
+                    continue
+
+                body = response["body"]
+                try:
+                    lease_data = parse_model_json(body["choices"][0]["message"]["content"])
+                except (json.JSONDecodeError, KeyError, IndexError) as e:
+                    manifest["failed"][custom_id] = f"Invalid response: {str(e)}"
+                    continue
+
+                usage = body.get("usage", {})
+                prompt_tokens = usage.get("prompt_tokens", 0)
+                completion_tokens = usage.get("completion_tokens", 0)
+                cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+                metrics = {
+                    "timestamp": datetime.now().isoformat(),
+                    "batch_id": manifest["batch_id"],
+                    "filename": request["filename"],
+                    "model": body.get("model", EXTRACTION_MODEL),
+                    "mode": "batch",
+                    "status": "ok",
+                    "document_chars": request["document_chars"],
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "cached_tokens": cached_tokens,
+                    "estimated_cost": estimate_cost(EXTRACTION_MODEL, prompt_tokens, completion_tokens,
+                                                    cached_tokens) * BATCH_PRICE_DISCOUNT,
+                    "time_to_first_token": None,
+                    "total_latency": None,
+                }
+
+                lease_data['source_filename'] = request["filename"]
+                lease_data['extraction_metrics'] = metrics
+
+                pending.append((custom_id, request["filename"], lease_data))
+                if len(pending) >= RECONCILE_BATCH_SIZE:
+                    _save_reconciled(manifest, pending)
+
+    _save_reconciled(manifest, pending)
+
+    if manifest["status"] in TERMINAL_STATUSES:
+        manifest["status"] = "reconciled" if manifest["status"] == "completed" else manifest["status"]
+    save_batch_manifest(manifest)
+
+    return manifest
+
+def run_batch_job(job_name: str, leases: List[Tuple[str, str]], client=None,
+                  poll_interval: float = 60, timeout: Optional[float] = None,
+                  sources: Optional[List[str]] = None) -> Dict:
+    """
+    Prepare, submit, wait for and reconcile a batch extraction job
+
+    Every step checks the manifest first, so an interrupted job can be resumed
+    by calling this again with the same job name.
+
+    Args:
+        job_name: Name of the batch job
+        leases: List of (filename, lease text) pairs
+        client: OpenAI-compatible client (defaults to the extractor's client)
+        poll_interval: Seconds to wait between status checks
+        timeout: Stop polling after this many seconds (None waits indefinitely)
+        sources: Optional path of each lease's PDF (see create_batch_job)
+
+    Returns:
+        Final batch job manifest
+    """
+    manifest = create_batch_job(job_name, leases, sources)
+    if manifest["status"] == "reconciled":
+        return manifest
+
+    submit_batch_job(job_name, client)
+    manifest = poll_batch_job(job_name, client, poll_interval, timeout)
+
+    if manifest["status"] in TERMINAL_STATUSES:
+        manifest = reconcile_batch_job(job_name, client)
+
+    return manifest
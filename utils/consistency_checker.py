@@ -0,0 +1,207 @@
+"""
+Consistency Checker Module
+Evaluates cross-field consistency rules columnwise over a batch of extracted leases
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .portfolio_snapshot import build_snapshot_frame
+
+# Allowed difference between lease_term_months and the months between the dates
+TERM_TOLERANCE_MONTHS = 1
+
+# A deposit above this many months of rent is more likely a misread amount
+MAX_DEPOSIT_MONTHS = 6
+
+MAX_LATE_FEE_PERCENTAGE = 25
+
+def _amount(frame: pd.DataFrame, field: str) -> np.ndarray:
+    """Numeric column with missing values as 0 (validate_and_clean_data's default)"""
+    return frame[field].fillna(0).to_numpy(dtype=np.float64)
+
+def _months_between(frame: pd.DataFrame) -> np.ndarray:
+    """Whole months from start to the day after the end date, NaN where a date is missing"""
+    start = frame['lease_start_date']
+    end = frame['lease_end_date'] + pd.Timedelta(days=1)
+    months = (end.dt.year - start.dt.year) * 12 + (end.dt.month - start.dt.month) + (end.dt.day - start.dt.day) / 30
+    return months.to_numpy(dtype=np.float64)
+
+def _late_fee_type(frame: pd.DataFrame) -> pd.Series:
+    return frame['late_fee_type'].str.strip().str.lower()
+
+def _term_mismatch(frame):
+    term = _amount(frame, 'lease_term_months')
+    months = _months_between(frame)
+    with np.errstate(invalid='ignore'):
+        return (term > 0) & (np.abs(np.round(months) - term) > TERM_TOLERANCE_MONTHS)
+
+def _end_before_start(frame):
+    return (frame['lease_end_date'] <= frame['lease_start_date']).to_numpy()
+
+def _percentage_fee_missing(frame):
+    return ((_late_fee_type(frame) == 'percentage') & (_amount(frame, 'late_fee_percentage') <= 0)).to_numpy()
+
+def _flat_fee_missing(frame):
+    return ((_late_fee_type(frame) == 'flat_amount') & (_amount(frame, 'late_fee_flat_amount') <= 0)).to_numpy()
+
+def _fee_without_type(frame):
+    untyped = ~_late_fee_type(frame).isin(['percentage', 'flat_amount'])
+    return (untyped & ((_amount(frame, 'late_fee_percentage') > 0) |
+                       (_amount(frame, 'late_fee_flat_amount') > 0))).to_numpy()
+
+def _late_fee_percentage_range(frame):
+    return _amount(frame, 'late_fee_percentage') > MAX_LATE_FEE_PERCENTAGE
+
+def _deposit_to_rent(frame):
+    rent = _amount(frame, 'monthly_rent')
+    return (rent > 0) & (_amount(frame, 'security_deposit') > rent * MAX_DEPOSIT_MONTHS)
+
+def _rent_missing(frame):
+    dated = frame['lease_start_date'].notna() | frame['lease_end_date'].notna()
+    return dated.to_numpy() & (_amount(frame, 'monthly_rent') <= 0)
+
+def _pet_deposit_without_pets(frame):
+    pets_allowed = frame['pet_allowed'].fillna(False).to_numpy(dtype=bool)
+    return ~pets_allowed & (_amount(frame, 'pet_deposit') > 0)
+
+def _payment_due_range(frame):
+    due = frame['payment_due_date'].to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return (due < 1) | (due > 31)
+
+# (rule name, fields it casts doubt on, message, vectorized check returning a
+# boolean array that is True where a record violates the rule)
+CONSISTENCY_RULES: List[Tuple[str, List[str], str, Callable[[pd.DataFrame], np.ndarray]]] = [
+    ("term_mismatch", ['lease_start_date', 'lease_end_date', 'lease_term_months'],
+     "Lease term does not match the months between the start and end dates", _term_mismatch),
+    ("end_before_start", ['lease_start_date', 'lease_end_date'],
+     "Lease end date is not after the start date", _end_before_start),
+    ("percentage_fee_missing", ['late_fee_type', 'late_fee_percentage'],
+     "Late fee type is percentage but no percentage was found", _percentage_fee_missing),
+    ("flat_fee_missing", ['late_fee_type', 'late_fee_flat_amount'],
+     "Late fee type is flat amount but no amount was found", _flat_fee_missing),
+    ("fee_without_type", ['late_fee_type', 'late_fee_percentage', 'late_fee_flat_amount'],
+     "A late fee amount was found without a late fee type", _fee_without_type),
+    ("late_fee_percentage_range", ['late_fee_percentage'],
+     f"Late fee percentage is above {MAX_LATE_FEE_PERCENTAGE}%", _late_fee_percentage_range),
+    ("deposit_to_rent", ['security_deposit', 'monthly_rent'],
+     f"Security deposit is more than {MAX_DEPOSIT_MONTHS} months of rent", _deposit_to_rent),
+    ("rent_missing", ['monthly_rent'],
+     "Lease has dates but no monthly rent", _rent_missing),
+    ("pet_deposit_without_pets", ['pet_allowed', 'pet_deposit'],
+     "Pet deposit charged although pets are not allowed", _pet_deposit_without_pets),
+    ("payment_due_range", ['payment_due_date'],
+     "Payment due date is not a day of the month", _payment_due_range),
+]
+
+RULE_MESSAGES = {name: message for name, _, message, _ in CONSISTENCY_RULES}
+
+def check_consistency(extracted_data: List[Dict]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Evaluate every consistency rule over a batch of leases at once
+
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+            (documents with a 'data' key)
+
+    Returns:
+        Tuple of (violations, field flags). Violations is a boolean DataFrame
+        with one row per record and one column per rule; field flags has one
+        column per field and is True where any violated rule involves the field.
+    """
+    frame = build_snapshot_frame(extracted_data)
+    violations = pd.DataFrame(
+        {name: np.asarray(check(frame), dtype=bool) for name, _, _, check in CONSISTENCY_RULES},
+        index=frame.index
+    )
+
+    fields = list(dict.fromkeys(field for _, rule_fields, _, _ in CONSISTENCY_RULES for field in rule_fields))
+    flags = pd.DataFrame(False, index=frame.index, columns=fields)
+    for name, rule_fields, _, _ in CONSISTENCY_RULES:
+        flags.loc[violations[name], rule_fields] = True
+
+    return violations, flags
+
+def suspect_fields(extracted_data: List[Dict]) -> List[Dict[str, List[str]]]:
+    """
+    List the violated rules and suspect fields of each lease
+
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+
+    Returns:
+        One dictionary per lease with 'rules' and 'fields' (empty when consistent)
+    """
+    if not extracted_data:
+        return []
+    violations, flags = check_consistency(extracted_data)
+    rule_names = violations.columns.to_numpy()
+    field_names = flags.columns.to_numpy()
+    return [
+        {"rules": list(rule_names[rule_row]), "fields": list(field_names[field_row])}
+        for rule_row, field_row in zip(violations.to_numpy(), flags.to_numpy())
+    ]
+
+def store_consistency_issues(extracted_data: List[Dict]) -> int:
+    """
+    Record each lease's current violations in data['consistency_issues']
+
+    Leases that pass every rule have the key removed, so a warning never
+    outlives the values it was about (e.g. after a re-extraction or an edit).
+
+    Args:
+        extracted_data: Documents with 'data'; updated in place
+
+    Returns:
+        Number of leases that are still inconsistent
+    """
+    inconsistent = 0
+    for doc, suspects in zip(extracted_data, suspect_fields(extracted_data)):
+        if suspects["rules"]:
+            doc['data']['consistency_issues'] = [RULE_MESSAGES[rule] for rule in suspects["rules"]]
+            inconsistent += 1
+        else:
+            doc['data'].pop('consistency_issues', None)
+    return inconsistent
+
+def recheck_inconsistent_leases(extracted_data: List[Dict], lease_texts: Dict[str, str],
+                                batch_id: Optional[str] = None) -> Dict[str, int]:
+    """
+    Re-extract only the suspect fields of leases that fail a consistency rule
+
+    The whole batch is checked in one pass; each flagged lease gets one
+    targeted re-extraction of its suspect fields and is checked again.
+    Violations that remain are stored in data['consistency_issues'] for
+    manual review; the key is cleared on every other lease of the batch.
+
+    Args:
+        extracted_data: Documents with 'filename' and 'data'; updated in place
+        lease_texts: Filename -> lease text the data was extracted from
+        batch_id: Identifier of the batch (for metrics)
+
+    Returns:
+        Counts of 'flagged' leases, 'rechecked' leases and leases still 'inconsistent'
+    """
+    from .ai_extractor import reextract_fields
+
+    flagged = [(doc, suspects) for doc, suspects in zip(extracted_data, suspect_fields(extracted_data))
+               if suspects["rules"]]
+    rechecked = 0
+
+    for doc, suspects in flagged:
+        lease_text = lease_texts.get(doc['filename'])
+        if not lease_text:
+            continue
+        issues = [RULE_MESSAGES[rule] for rule in suspects["rules"]]
+        updated = reextract_fields(lease_text, doc['data'], suspects["fields"], issues, doc['filename'], batch_id)
+        if updated is not None:
+            doc['data'] = updated
+            rechecked += 1
+
+    return {
+        "flagged": len(flagged),
+        "rechecked": rechecked,
+        "inconsistent": store_consistency_issues(extracted_data),
+    }
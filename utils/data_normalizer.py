@@ -0,0 +1,180 @@
+"""
+Batch Normalization Module
+Normalizes extracted lease fields columnwise across many records at once
+"""
+
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+CURRENCY_FIELDS = [
+    'monthly_rent', 'security_deposit', 'pet_deposit', 'late_fee_flat_amount'
+]
+
+PERCENTAGE_FIELDS = ['late_fee_percentage']
+
+NUMERIC_FIELDS = [
+    'square_footage', 'lease_term_months', 'payment_due_date',
+    'late_fee_grace_period', 'parking_spaces'
+]
+
+DATE_FIELDS = ['lease_start_date', 'lease_end_date']
+
+BOOLEAN_FIELDS = ['pet_allowed']
+
+LIST_FIELDS = ['utilities_included']
+
+NUMERIC_DEFAULTS = {'payment_due_date': 1}
+
+TRUE_VALUES = {'true', 'yes', 'y', '1', 'allowed', 'permitted'}
+FALSE_VALUES = {'false', 'no', 'n', '0', 'not allowed', 'prohibited', 'none'}
+
+# Values that mean "nothing was extracted" rather than "could not parse"
+EMPTY_VALUES = {'', 'none', 'null', 'n/a', 'na', 'not found in document'}
+
+# Unit words and ordinal suffixes ("5th") removed from plain numeric values;
+# any other text makes the value unparseable
+NUMERIC_UNIT_PATTERN = (r'(?i)\b(?:sq\.?\s*ft|square\s+f(?:ee|oo)t|sf|months?|days?|(?:parking\s+)?spaces?)\b\.?'
+                        r'|(?<=\d)(?:st|nd|rd|th)\b|[,\s]')
+
+NORMALIZED_FIELDS = (CURRENCY_FIELDS + PERCENTAGE_FIELDS + NUMERIC_FIELDS + DATE_FIELDS +
+                     BOOLEAN_FIELDS + LIST_FIELDS + ['confidence_score'])
+
+def _empty_mask(raw: pd.Series) -> pd.Series:
+    """Return a mask of cells that hold no value at all"""
+    text = raw.astype(str).str.strip().str.lower()
+    return raw.isna() | text.isin(EMPTY_VALUES)
+
+def _parse_numbers(raw: pd.Series, strip_pattern: str) -> pd.Series:
+    """Strip decorations matching strip_pattern and coerce the column to float"""
+    is_number = raw.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+    text = raw.astype(str).str.strip()
+    negative = text.str.match(r'^\(.*\)$')
+    text = text.str.replace(strip_pattern, '', regex=True).str.strip('()')
+    parsed = pd.to_numeric(text, errors='coerce')
+    parsed = parsed.where(~negative, -parsed)
+    # Real numbers pass straight through without the string round trip
+    parsed[is_number] = raw[is_number].astype(float)
+    return parsed
+
+def parse_currency_column(raw: pd.Series) -> pd.Series:
+    """Parse values such as "$1,500.00", "1500" or "USD 75" into floats"""
+    return _parse_numbers(raw, r'(?i)usd|dollars?|[$,\s]')
+
+def parse_percentage_column(raw: pd.Series) -> pd.Series:
+    """Parse values such as "10%", "10 percent" or 10 into floats"""
+    return _parse_numbers(raw, r'(?i)percent|[%,\s]')
+
+def parse_numeric_column(raw: pd.Series) -> pd.Series:
+    """
+    Parse plain numeric values such as "4,274 sq ft", "12 months" or "5th" into floats
+
+    Only known unit words are stripped, so values in other units ("2 years")
+    or with other text ("Net 30 days after 5th") become NaN instead of a
+    wrong number.
+    """
+    return _parse_numbers(raw, NUMERIC_UNIT_PATTERN)
+
+def parse_date_column(raw: pd.Series) -> pd.Series:
+    """
+    Parse dates in any common format into YYYY-MM-DD strings
+
+    ISO dates (what the prompt asks for) are parsed in one vectorized pass;
+    only the remaining cells fall back to the slower mixed-format parser.
+
+    Args:
+        raw: Column of raw date values
+
+    Returns:
+        Column of YYYY-MM-DD strings, NaN where parsing failed
+    """
+    text = raw.astype(str).str.strip()
+    parsed = pd.to_datetime(text, format='%Y-%m-%d', errors='coerce')
+
+    remaining = parsed.isna() & raw.notna()
+    if remaining.any():
+        parsed[remaining] = pd.to_datetime(text[remaining], format='mixed', errors='coerce')
+
+    return parsed.dt.strftime('%Y-%m-%d')
+
+def parse_boolean_column(raw: pd.Series) -> pd.Series:
+    """Parse boolean-like values ("Yes", "true", 1, ...) into an object column of bools"""
+    text = raw.astype(str).str.strip().str.lower()
+    parsed = pd.Series(np.nan, index=raw.index, dtype=object)
+    parsed[text.isin(TRUE_VALUES)] = True
+    parsed[text.isin(FALSE_VALUES)] = False
+    is_bool = raw.map(lambda v: isinstance(v, (bool, np.bool_)))
+    parsed[is_bool] = raw[is_bool].astype(bool)
+    return parsed
+
+def parse_list_column(raw: pd.Series) -> pd.Series:
+    """Join list values into comma separated strings, leaving strings untouched"""
+    return raw.map(lambda v: ', '.join(str(item) for item in v) if isinstance(v, (list, tuple)) else v)
+
+def normalize_lease_batch(records: List[Dict]) -> Tuple[List[Dict], pd.DataFrame]:
+    """
+    Normalize a batch of raw model outputs columnwise
+
+    Args:
+        records: List of raw extracted data dictionaries (one per lease)
+
+    Returns:
+        Tuple of (normalized records, error mask). The error mask is a boolean
+        DataFrame with one row per record and one column per normalized field;
+        a cell is True when the raw value was present but could not be parsed.
+        Unparseable and missing cells fall back to the same defaults used by
+        validate_and_clean_data.
+    """
+    if not records:
+        return [], pd.DataFrame()
+
+    frame = pd.DataFrame.from_records(records)
+    errors = pd.DataFrame(index=frame.index)
+
+    def column(field):
+        if field in frame.columns:
+            return frame[field].astype(object)
+        return pd.Series(None, index=frame.index, dtype=object)
+
+    parsers = (
+        [(field, parse_currency_column) for field in CURRENCY_FIELDS] +
+        [(field, parse_percentage_column) for field in PERCENTAGE_FIELDS] +
+        [(field, parse_numeric_column) for field in NUMERIC_FIELDS]
+    )
+    for field, parser in parsers:
+        raw = column(field)
+        empty = _empty_mask(raw)
+        parsed = parser(raw.where(~empty))
+        errors[field] = parsed.isna() & ~empty
+        frame[field] = parsed.fillna(NUMERIC_DEFAULTS.get(field, 0)).astype(float)
+
+    for field in DATE_FIELDS:
+        raw = column(field)
+        empty = _empty_mask(raw)
+        parsed = parse_date_column(raw.where(~empty))
+        errors[field] = parsed.isna() & ~empty
+        frame[field] = parsed.fillna('')
+
+    for field in BOOLEAN_FIELDS:
+        raw = column(field)
+        empty = _empty_mask(raw)
+        parsed = parse_boolean_column(raw.where(~empty))
+        errors[field] = parsed.isna() & ~empty
+        frame[field] = parsed.where(parsed.notna(), False).astype(bool)
+
+    for field in LIST_FIELDS:
+        frame[field] = parse_list_column(column(field)).fillna('')
+
+    raw = column('confidence_score')
+    empty = _empty_mask(raw)
+    parsed = pd.to_numeric(raw.where(~empty), errors='coerce')
+    errors['confidence_score'] = parsed.isna() & ~empty
+    frame['confidence_score'] = parsed.fillna(0.5).clip(0.0, 1.0)
+
+    # Convert back to plain Python dicts so records stay JSON serializable;
+    # keys other records of the batch had are not added to a record
+    normalized = [
+        {key: value for key, value in clean.items() if key in record or key in NORMALIZED_FIELDS}
+        for clean, record in zip(frame.astype(object).where(frame.notna(), None).to_dict(orient='records'), records)
+    ]
+    return normalized, errors
@@ -3,21 +3,108 @@ Export Generation Module
 Generates Yardi-compatible Excel files and reference documents
 """
 
+import io
 import os
-from datetime import datetime
-from typing import List, Dict
+import json
+import hashlib
+import zipfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import BinaryIO, List, Dict, Optional, Tuple, Union
 import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
 
-def generate_yardi_excel(extracted_data: List[Dict], output_dir: str = "exports") -> str:
+from .yardi_profiles import DEFAULT_PROFILE, get_profile, iter_mapped_rows, map_batch
+from .report_renderer import write_reference_report
+from .rent_projection import expiration_schedule, project_rent_roll, summarize_projection
+
+# Bump whenever generated files change layout so cached exports are not reused
+EXPORT_GENERATOR_VERSION = "2.5"
+
+# Reference workbooks for batches above this many leases are built as a zip of
+# smaller shard workbooks in a process pool: one sheet per lease in a single
+# workbook builds serially and gets too big to open comfortably
+REFERENCE_SHARD_THRESHOLD = 100
+REFERENCE_SHARD_SIZE = 25
+
+# Number of generated exports kept in memory for repeat downloads
+EXPORT_CACHE_SIZE = 8
+
+_export_cache = OrderedDict()
+_export_cache_lock = threading.Lock()
+
+def map_to_yardi_row(doc: Dict, profile: str = DEFAULT_PROFILE) -> Dict:
+    """
+    Map one extracted document to a row of Yardi import columns
+    
+    Args:
+        doc: Dictionary with 'filename' and extracted 'data'
+        profile: Name of the Yardi mapping profile
+        
+    Returns:
+        Dictionary of Yardi column name to value, in column order
+    """
+    compiled = get_profile(profile)
+    return dict(zip(compiled.headers, map_batch(compiled, [doc])[0]))
+
+def _yardi_named_styles():
+    """Build the shared header and cell styles of the Yardi import sheet"""
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    
+    header_style = NamedStyle(name="yardi_header")
+    header_style.fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
+    header_style.font = Font(color="FFFFFF", bold=True, size=11)
+    header_style.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    header_style.border = border
+    
+    cell_style = NamedStyle(name="yardi_cell")
+    cell_style.alignment = Alignment(vertical="center")
+    cell_style.border = border
+    
+    return header_style, cell_style
+
+def export_filename(prefix: str, extension: str = "xlsx") -> str:
+    """Build a timestamped export filename such as yardi_import_20260101_120000.xlsx"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{prefix}_{timestamp}.{extension}"
+
+def archive_export(content: bytes, filename: str, archive_dir: str = "exports") -> str:
+    """
+    Save a copy of an in-memory export to disk
+    
+    Args:
+        content: Export file content
+        filename: Name of the archived file
+        archive_dir: Directory to save the archived file
+        
+    Returns:
+        Path to the archived file
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    filepath = os.path.join(archive_dir, filename)
+    with open(filepath, 'wb') as f:
+        f.write(content)
+    return filepath
+
+def generate_yardi_excel(extracted_data: List[Dict], output_dir: str = "exports",
+                         profile: str = DEFAULT_PROFILE) -> str:
     """
     Generate Yardi-compatible Excel file for automatic import
     
     Args:
         extracted_data: List of dictionaries containing extracted lease data
         output_dir: Directory to save the output file
+        profile: Name of the Yardi mapping profile
         
     Returns:
         Path to the generated Excel file
@@ -25,142 +112,426 @@ def generate_yardi_excel(extracted_data: List[Dict], output_dir: str = "exports"
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Prepare data for Yardi format
-    yardi_data = []
+    filepath = os.path.join(output_dir, export_filename("yardi_import"))
+    write_yardi_excel(extracted_data, filepath, profile)
     
-    for doc in extracted_data:
-        data = doc['data']
+    return filepath
+
+def generate_yardi_excel_bytes(extracted_data: List[Dict], archive_dir: Optional[str] = None,
+                               profile: str = DEFAULT_PROFILE) -> bytes:
+    """
+    Generate Yardi-compatible Excel file in memory
+    
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        archive_dir: If given, also archive a timestamped copy in this directory
+        profile: Name of the Yardi mapping profile
         
-        # Map extracted data to Yardi columns
-        yardi_row = {
-            'TenantName': data.get('tenant_name', ''),
-            'TenantEmail': data.get('tenant_email', ''),
-            'TenantPhone': data.get('tenant_phone', ''),
-            'PropertyAddress': data.get('property_address', ''),
-            'UnitNumber': data.get('unit_number', ''),
-            'PropertyType': data.get('property_type', ''),
-            'SquareFootage': data.get('square_footage', 0),
-            'LeaseNumber': data.get('lease_number', ''),
-            'LeaseStartDate': data.get('lease_start_date', ''),
-            'LeaseEndDate': data.get('lease_end_date', ''),
-            'LeaseTermMonths': data.get('lease_term_months', 0),
-            'LeaseType': data.get('lease_type', ''),
-            'MonthlyRent': data.get('monthly_rent', 0),
-            'SecurityDeposit': data.get('security_deposit', 0),
-            'PetDeposit': data.get('pet_deposit', 0),
-            'PaymentDueDate': data.get('payment_due_date', 1),
-            'LateFeeType': data.get('late_fee_type', ''),
-            'LateFeePercentage': data.get('late_fee_percentage', 0),
-            'LateFeeAmount': data.get('late_fee_flat_amount', 0),
-            'LateFeeGracePeriod': data.get('late_fee_grace_period', 0),
-            'ParkingSpaces': data.get('parking_spaces', 0),
-            'PetAllowed': 'Yes' if data.get('pet_allowed', False) else 'No',
-            'PetType': data.get('pet_type', ''),
-            'UtilitiesIncluded': data.get('utilities_included', ''),
-            'SourceFile': doc.get('filename', '')
-        }
-        
-        yardi_data.append(yardi_row)
-    
-    # Create DataFrame
-    df = pd.DataFrame(yardi_data)
-    
-    # Generate filename with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"yardi_import_{timestamp}.xlsx"
-    filepath = os.path.join(output_dir, filename)
+    Returns:
+        Excel file content, ready to serve for download
+    """
+    buffer = io.BytesIO()
+    write_yardi_excel(extracted_data, buffer, profile)
+    content = buffer.getvalue()
     
-    # Create Excel workbook with formatting
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Yardi Import"
+    if archive_dir:
+        archive_export(content, export_filename("yardi_import"), archive_dir)
     
-    # Define styles
-    header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=11)
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    return content
+
+def write_yardi_excel(extracted_data: List[Dict], target: Union[str, BinaryIO],
+                      profile: str = DEFAULT_PROFILE) -> None:
+    """
+    Write the Yardi import workbook to a file path or binary file object
     
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    Rows are streamed straight from the extracted records into a write-only
+    workbook with shared named styles, so memory stays flat for large batches.
     
-    # Write headers
-    for col_idx, column in enumerate(df.columns, 1):
-        cell = ws.cell(row=1, column=col_idx, value=column)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-        cell.border = border
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        target: File path or writable binary file object (e.g. BytesIO)
+        profile: Name of the Yardi mapping profile
+    """
+    compiled = get_profile(profile)
     
-    # Write data
-    for row_idx, row in enumerate(df.values, 2):
-        for col_idx, value in enumerate(row, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.border = border
-            cell.alignment = Alignment(vertical="center")
-    
-    # Adjust column widths
-    column_widths = {
-        'A': 25,  # TenantName
-        'B': 30,  # TenantEmail
-        'C': 15,  # TenantPhone
-        'D': 40,  # PropertyAddress
-        'E': 12,  # UnitNumber
-        'F': 15,  # PropertyType
-        'G': 15,  # SquareFootage
-        'H': 15,  # LeaseNumber
-        'I': 15,  # LeaseStartDate
-        'J': 15,  # LeaseEndDate
-        'K': 15,  # LeaseTermMonths
-        'L': 15,  # LeaseType
-        'M': 12,  # MonthlyRent
-        'N': 15,  # SecurityDeposit
-        'O': 12,  # PetDeposit
-        'P': 15,  # PaymentDueDate
-        'Q': 15,  # LateFeeAmount
-        'R': 18,  # LateFeeGracePeriod
-        'S': 15,  # ParkingSpaces
-        'T': 12,  # PetAllowed
-        'U': 15,  # PetType
-        'V': 25,  # EmergencyContactName
-        'W': 20,  # EmergencyContactPhone
-        'X': 30,  # UtilitiesIncluded
-        'Y': 30   # SourceFile
-    }
+    # Create write-only Excel workbook with shared styles
+    wb = Workbook(write_only=True)
+    header_style, cell_style = _yardi_named_styles()
+    wb.add_named_style(header_style)
+    wb.add_named_style(cell_style)
     
-    for col, width in column_widths.items():
-        ws.column_dimensions[col].width = width
+    ws = wb.create_sheet("Yardi Import")
     
-    # Freeze the header row
+    # Column widths and frozen header must be set before any row is written
+    for col_idx, width in enumerate(compiled.widths, 1):
+        if width:
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
     ws.freeze_panes = 'A2'
     
+    def styled_row(values, style_name):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style_name
+            row.append(cell)
+        return row
+    
+    # Write headers
+    ws.append(styled_row(compiled.headers, header_style.name))
+    
+    # Write data
+    for values in iter_mapped_rows(compiled, extracted_data):
+        ws.append(styled_row(values, cell_style.name))
+    
     # Save workbook
-    wb.save(filepath)
+    wb.save(target)
+
+def reference_extension(extracted_data: List[Dict], fmt: str = "xlsx") -> str:
+    """
+    File extension of the reference document generated for a batch
     
-    return filepath
+    Returns:
+        "zip" when an xlsx reference is sharded (more than
+        REFERENCE_SHARD_THRESHOLD leases), otherwise fmt
+    """
+    if fmt == "xlsx" and len(extracted_data) > REFERENCE_SHARD_THRESHOLD:
+        return "zip"
+    return fmt
 
-def generate_reference_document(extracted_data: List[Dict], output_dir: str = "exports") -> str:
+def generate_reference_document(extracted_data: List[Dict], output_dir: str = "exports",
+                                fmt: str = "xlsx") -> str:
     """
     Generate comprehensive reference document with all extracted data
     
     Args:
         extracted_data: List of dictionaries containing extracted lease data
         output_dir: Directory to save the output file
+        fmt: "xlsx" for the styled workbook, or "html"/"md" for a lightweight
+            single-file report with source citations
         
     Returns:
-        Path to the generated reference document
+        Path to the generated reference document (a zip of shard workbooks
+        for xlsx batches above REFERENCE_SHARD_THRESHOLD leases)
     """
+    if reference_extension(extracted_data, fmt) == "zip":
+        return generate_reference_document_sharded(extracted_data, output_dir, REFERENCE_SHARD_SIZE)
+    
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Generate filename with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"lease_reference_{timestamp}.xlsx"
-    filepath = os.path.join(output_dir, filename)
+    filepath = os.path.join(output_dir, export_filename("lease_reference", fmt))
+    if fmt == "xlsx":
+        write_reference_document(extracted_data, filepath)
+    else:
+        write_reference_report(extracted_data, filepath, fmt)
+    
+    return filepath
+
+def generate_reference_document_bytes(extracted_data: List[Dict], archive_dir: Optional[str] = None,
+                                      fmt: str = "xlsx") -> bytes:
+    """
+    Generate comprehensive reference document in memory
     
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        archive_dir: If given, also archive a timestamped copy in this directory
+        fmt: "xlsx", "html" or "md"
+        
+    Returns:
+        Reference document content, ready to serve for download (a zip of
+        shard workbooks when reference_extension() says so)
+    """
+    extension = reference_extension(extracted_data, fmt)
+    if extension == "zip":
+        buffer = io.BytesIO()
+        write_reference_document_sharded(extracted_data, buffer, REFERENCE_SHARD_SIZE)
+        content = buffer.getvalue()
+    elif fmt == "xlsx":
+        buffer = io.BytesIO()
+        write_reference_document(extracted_data, buffer)
+        content = buffer.getvalue()
+    else:
+        text_buffer = io.StringIO()
+        write_reference_report(extracted_data, text_buffer, fmt)
+        content = text_buffer.getvalue().encode('utf-8')
+    
+    if archive_dir:
+        archive_export(content, export_filename("lease_reference", extension), archive_dir)
+    
+    return content
+
+def write_projection_excel(leases: Union[pd.DataFrame, List[Dict]], target: Union[str, BinaryIO],
+                           start: Optional[date] = None, years: int = 5, annual_escalation: float = 0.0,
+                           renewal_increase: float = 0.0) -> None:
+    """
+    Write a rent and expiration projection workbook to a file path or binary file object
+    
+    The workbook has an annual summary, the monthly schedule and the list of
+    expiring leases, each streamed into a write-only sheet.
+    
+    Args:
+        leases: Portfolio snapshot frame, documents with 'data' or extracted lease data dictionaries
+        target: File path or writable binary file object (e.g. BytesIO)
+        start: Any day in the first projected month (defaults to today)
+        years: Number of years to project
+        annual_escalation: Assumed yearly rent increase (e.g. 0.03 for 3%)
+        renewal_increase: Assumed rent increase when a renewal option is exercised
+    """
+    schedule = project_rent_roll(leases, start, years, annual_escalation, renewal_increase)
+    sheets = [
+        ("Annual Summary", summarize_projection(schedule).reset_index()),
+        ("Monthly Projection", schedule.reset_index()),
+        ("Expirations", expiration_schedule(leases, start, years)),
+    ]
+    
+    wb = Workbook(write_only=True)
+    header_style, cell_style = _yardi_named_styles()
+    wb.add_named_style(header_style)
+    wb.add_named_style(cell_style)
+    
+    for title, frame in sheets:
+        ws = wb.create_sheet(title)
+        for col_idx in range(1, len(frame.columns) + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        ws.freeze_panes = 'A2'
+        
+        def styled_row(values, style_name):
+            row = []
+            for value in values:
+                if isinstance(value, float):
+                    value = round(value, 2)
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = style_name
+                row.append(cell)
+            return row
+        
+        ws.append(styled_row([column.replace('_', ' ').title() for column in frame.columns], header_style.name))
+        for values in frame.astype(object).where(frame.notna(), None).itertuples(index=False):
+            ws.append(styled_row(values, cell_style.name))
+    
+    wb.save(target)
+
+def generate_projection_excel(leases: Union[pd.DataFrame, List[Dict]], output_dir: str = "exports",
+                              start: Optional[date] = None, years: int = 5, annual_escalation: float = 0.0,
+                              renewal_increase: float = 0.0) -> str:
+    """
+    Generate a rent and expiration projection workbook
+    
+    Args:
+        leases: Portfolio snapshot frame, documents with 'data' or extracted lease data dictionaries
+        output_dir: Directory to save the output file
+        start: Any day in the first projected month (defaults to today)
+        years: Number of years to project
+        annual_escalation: Assumed yearly rent increase (e.g. 0.03 for 3%)
+        renewal_increase: Assumed rent increase when a renewal option is exercised
+        
+    Returns:
+        Path to the generated Excel file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    
+    filepath = os.path.join(output_dir, export_filename("rent_projection"))
+    write_projection_excel(leases, filepath, start, years, annual_escalation, renewal_increase)
+    
+    return filepath
+
+def generate_projection_excel_bytes(leases: Union[pd.DataFrame, List[Dict]], archive_dir: Optional[str] = None,
+                                    start: Optional[date] = None, years: int = 5,
+                                    annual_escalation: float = 0.0, renewal_increase: float = 0.0) -> bytes:
+    """
+    Generate a rent and expiration projection workbook in memory
+    
+    Args:
+        leases: Portfolio snapshot frame, documents with 'data' or extracted lease data dictionaries
+        archive_dir: If given, also archive a timestamped copy in this directory
+        start: Any day in the first projected month (defaults to today)
+        years: Number of years to project
+        annual_escalation: Assumed yearly rent increase (e.g. 0.03 for 3%)
+        renewal_increase: Assumed rent increase when a renewal option is exercised
+        
+    Returns:
+        Excel file content, ready to serve for download
+    """
+    buffer = io.BytesIO()
+    write_projection_excel(leases, buffer, start, years, annual_escalation, renewal_increase)
+    content = buffer.getvalue()
+    
+    if archive_dir:
+        archive_export(content, export_filename("rent_projection"), archive_dir)
+    
+    return content
+
+def hash_extracted_data(extracted_data: List[Dict]) -> str:
+    """
+    Compute a stable content hash of extracted records
+    
+    Keys are sorted so the hash only changes when the data itself changes.
+    """
+    canonical = json.dumps(extracted_data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def generate_cached_export(export_type: str, extracted_data: List[Dict],
+                           archive_dir: Optional[str] = None, profile: str = DEFAULT_PROFILE) -> bytes:
+    """
+    Generate an export in memory, reusing a previous result for unchanged data
+    
+    Results are memoized by export type, generator version and a content hash
+    of the records, with least-recently-used eviction. Editing a record changes
+    its hash, so only exports of the edited batch are regenerated.
+    
+    Args:
+        export_type: "yardi_excel", "reference_document", "reference_html"
+            or "reference_markdown"
+        extracted_data: List of dictionaries containing extracted lease data
+        archive_dir: If given, also archive a timestamped copy in this directory
+        profile: Name of the Yardi mapping profile (Yardi exports only)
+        
+    Returns:
+        Export file content
+    """
+    builders = {
+        "yardi_excel": (lambda data: generate_yardi_excel_bytes(data, profile=profile), "yardi_import", "xlsx"),
+        "reference_document": (generate_reference_document_bytes, "lease_reference", "xlsx"),
+        "reference_html": (lambda data: generate_reference_document_bytes(data, fmt="html"), "lease_reference", "html"),
+        "reference_markdown": (lambda data: generate_reference_document_bytes(data, fmt="md"), "lease_reference", "md"),
+    }
+    if export_type not in builders:
+        raise ValueError(f"Unknown export type: {export_type}")
+    
+    builder, prefix, extension = builders[export_type]
+    if export_type == "reference_document":
+        extension = reference_extension(extracted_data)
+    variant = profile if export_type == "yardi_excel" else None
+    key = (export_type, variant, EXPORT_GENERATOR_VERSION, hash_extracted_data(extracted_data))
+    
+    with _export_cache_lock:
+        content = _export_cache.get(key)
+        if content is not None:
+            _export_cache.move_to_end(key)
+    
+    if content is None:
+        content = builder(extracted_data)
+        with _export_cache_lock:
+            _export_cache[key] = content
+            _export_cache.move_to_end(key)
+            while len(_export_cache) > EXPORT_CACHE_SIZE:
+                _export_cache.popitem(last=False)
+    
+    if archive_dir:
+        archive_export(content, export_filename(prefix, extension), archive_dir)
+    
+    return content
+
+def clear_export_cache() -> None:
+    """Drop all memoized exports"""
+    with _export_cache_lock:
+        _export_cache.clear()
+
+def write_reference_document(extracted_data: List[Dict], target: Union[str, BinaryIO]) -> None:
+    """
+    Write the reference workbook to a file path or binary file object
+    
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        target: File path or writable binary file object (e.g. BytesIO)
+    """
+    wb = build_reference_workbook(extracted_data)
+    
+    # Save workbook
+    wb.save(target)
+
+def _build_reference_shard(shard) -> Tuple[str, bytes]:
+    """Build one shard workbook in a worker process and return (file name, content)"""
+    shard_name, docs, start_index = shard
+    wb = build_reference_workbook(docs, start_index=start_index, include_summary=False)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return shard_name, buffer.getvalue()
+
+def write_reference_document_sharded(extracted_data: List[Dict], target: Union[str, BinaryIO],
+                                     shard_size: int = 1, max_workers: Optional[int] = None) -> List[str]:
+    """
+    Write the reference document as a zip of small per-lease or per-N-lease workbooks
+    
+    Shards are built in parallel in a process pool. The zip also contains
+    index.xlsx, a summary of every lease with the shard file it is in.
+    
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        target: File path or writable binary file object for the zip archive
+        shard_size: Number of leases per shard workbook
+        max_workers: Number of worker processes (defaults to the CPU count)
+        
+    Returns:
+        Names of the shard files in the archive
+    """
+    shards = []
+    shard_files = []
+    for start in range(0, len(extracted_data), shard_size):
+        docs = extracted_data[start:start + shard_size]
+        first, last = start + 1, start + len(docs)
+        if first == last:
+            shard_name = f"lease_reference_{first:05d}.xlsx"
+        else:
+            shard_name = f"lease_reference_{first:05d}-{last:05d}.xlsx"
+        shards.append((shard_name, docs, first))
+        shard_files.extend([shard_name] * len(docs))
+    
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_STORED) as archive:
+        # xlsx files are already compressed, so they are stored as-is
+        if len(shards) > 1 and max_workers != 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                for shard_name, content in pool.map(_build_reference_shard, shards):
+                    archive.writestr(shard_name, content)
+        else:
+            for shard in shards:
+                shard_name, content = _build_reference_shard(shard)
+                archive.writestr(shard_name, content)
+        
+        # Lightweight index workbook
+        index_wb = Workbook()
+        index_wb.remove(index_wb.active)
+        create_summary_sheet(index_wb, extracted_data, shard_files)
+        buffer = io.BytesIO()
+        index_wb.save(buffer)
+        archive.writestr("index.xlsx", buffer.getvalue())
+    
+    return [shard[0] for shard in shards]
+
+def generate_reference_document_sharded(extracted_data: List[Dict], output_dir: str = "exports",
+                                        shard_size: int = 1, max_workers: Optional[int] = None) -> str:
+    """
+    Generate a zip of sharded reference workbooks for large batches
+    
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        output_dir: Directory to save the output file
+        shard_size: Number of leases per shard workbook
+        max_workers: Number of worker processes (defaults to the CPU count)
+        
+    Returns:
+        Path to the generated zip archive
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    
+    filepath = os.path.join(output_dir, export_filename("lease_reference", "zip"))
+    write_reference_document_sharded(extracted_data, filepath, shard_size, max_workers)
+    
+    return filepath
+
+def build_reference_workbook(extracted_data: List[Dict], start_index: int = 1,
+                             include_summary: bool = True) -> Workbook:
+    """
+    Build the reference workbook with one sheet per lease
+    
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        start_index: Number of the first lease (used in sheet names)
+        include_summary: Whether to add the summary sheet
+        
+    Returns:
+        Workbook ready to be saved
+    """
     # Create Excel workbook
     wb = Workbook()
     
@@ -185,7 +556,7 @@ def generate_reference_document(extracted_data: List[Dict], output_dir: str = "e
     )
     
     # Create a sheet for each document
-    for idx, doc in enumerate(extracted_data, 1):
+    for idx, doc in enumerate(extracted_data, start_index):
         data = doc['data']
         filename_short = doc['filename'][:25]  # Truncate for sheet name
         
@@ -287,12 +658,10 @@ def generate_reference_document(extracted_data: List[Dict], output_dir: str = "e
         ws.column_dimensions['B'].width = 50
     
     # Create summary sheet
-    create_summary_sheet(wb, extracted_data)
+    if include_summary:
+        create_summary_sheet(wb, extracted_data)
     
-    # Save workbook
-    wb.save(filepath)
-    
-    return filepath
+    return wb
 
 def add_section(ws, start_row, section_title, fields, section_fill, section_font, 
                 field_fill, field_font, value_font, border):
@@ -330,14 +699,17 @@ def add_section(ws, start_row, section_title, fields, section_fill, section_font
     start_row += 1  # Add spacing after section
     return start_row
 
-def create_summary_sheet(wb, extracted_data):
+def create_summary_sheet(wb, extracted_data, shard_files=None):
     """
     Create a summary sheet with overview of all leases
+    
+    When shard_files is given (one file name per lease), a File column shows
+    which sharded workbook holds each lease.
     """
     ws = wb.create_sheet(title="Summary", index=0)
     
     # Header
-    ws.merge_cells('A1:H1')
+    ws.merge_cells('A1:I1' if shard_files else 'A1:H1')
     cell = ws.cell(row=1, column=1, value="LEASE ABSTRACTION SUMMARY")
     cell.fill = PatternFill(start_color="203864", end_color="203864", fill_type="solid")
     cell.font = Font(color="FFFFFF", bold=True, size=14)
@@ -345,6 +717,8 @@ def create_summary_sheet(wb, extracted_data):
     
     # Column headers
     headers = ["#", "Tenant Name", "Property Address", "Unit", "Start Date", "End Date", "Monthly Rent", "Confidence"]
+    if shard_files:
+        headers.append("File")
     header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
     header_font = Font(color="FFFFFF", bold=True, size=11)
     
@@ -370,6 +744,9 @@ def create_summary_sheet(wb, extracted_data):
         confidence = data.get('confidence_score', 0.5)
         confidence_level = "High" if confidence >= 0.8 else "Medium" if confidence >= 0.5 else "Low"
         ws.cell(row=row, column=8, value=confidence_level)
+        
+        if shard_files:
+            ws.cell(row=row, column=9, value=shard_files[idx - 1])
     
     # Set column widths
     ws.column_dimensions['A'].width = 5
@@ -380,6 +757,8 @@ def create_summary_sheet(wb, extracted_data):
     ws.column_dimensions['F'].width = 15
     ws.column_dimensions['G'].width = 15
     ws.column_dimensions['H'].width = 12
+    if shard_files:
+        ws.column_dimensions['I'].width = 32
     
     # Freeze panes
     ws.freeze_panes = 'A4'
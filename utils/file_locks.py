@@ -0,0 +1,73 @@
+"""
+File Locking Module
+Inter-process locks and crash-safe writes for JSON side files shared between sessions
+"""
+
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process atomic writes only
+    fcntl = None
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Hold an exclusive inter-process lock for a file while the block runs
+
+    The lock is taken on a separate "<path>.lock" file, so the guarded file
+    itself can be replaced by rename while the lock is held. Keep the block
+    short: other writers wait on it.
+
+    Args:
+        path: Path of the file being guarded
+    """
+    if fcntl is None:
+        yield
+        return
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def atomic_write_json(path: str, data, **json_kwargs) -> None:
+    """
+    Write JSON so readers see either the old or the new file, never a partial one
+
+    The data goes to a temp file in the same directory, is fsynced, and is
+    renamed over the target; the directory is fsynced so the rename survives
+    a crash.
+
+    Args:
+        path: Target file path
+        data: JSON-serializable data
+        **json_kwargs: Extra arguments for json.dump (e.g. indent)
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, **json_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -0,0 +1,197 @@
+"""
+Flat-File Export Module
+Streams Yardi ETL CSV files and typed Parquet files from extracted lease data
+"""
+
+import os
+import csv
+import math
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Optional, TextIO, Union
+
+from .export_generator import export_filename
+from .yardi_profiles import get_profile, iter_mapped_rows
+
+# Flat files default to the ETL layout (1/0 flags, typed columns)
+FLAT_EXPORT_PROFILE = "etl"
+
+DEFAULT_ROW_GROUP_SIZE = 50000
+
+def to_date(value) -> Optional[date]:
+    """Convert a YYYY-MM-DD string (or date) to a date, None if empty or invalid"""
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def to_decimal(value) -> Optional[Decimal]:
+    """Convert a number to a Decimal rounded to cents, None if empty, invalid or not finite"""
+    if value is None or value == '':
+        return None
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    # NaN and infinity would otherwise be written out as "NaN" / fail the quantize
+    return number.quantize(Decimal('0.01')) if number.is_finite() else None
+
+def to_integer(value) -> Optional[int]:
+    """Convert a number to an int, None if empty, invalid or not finite"""
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    # int() raises OverflowError on infinity and ValueError on NaN
+    return int(number) if math.isfinite(number) else None
+
+def to_text(value) -> Optional[str]:
+    """Convert a value to a string, keeping None as null"""
+    return None if value is None else str(value)
+
+CONVERTERS = {
+    'date': to_date,
+    'decimal': to_decimal,
+    'integer': to_integer,
+    'string': to_text,
+}
+
+def write_yardi_csv(extracted_data: Iterable[Dict], target: Union[str, TextIO],
+                    include_header: bool = True, profile: str = FLAT_EXPORT_PROFILE) -> int:
+    """
+    Stream Yardi ETL rows to a CSV file row by row
+
+    Args:
+        extracted_data: Iterable of dictionaries containing extracted lease data
+        target: File path or writable text file object
+        include_header: Whether to write the header row
+        profile: Name of the Yardi mapping profile
+
+    Returns:
+        Number of data rows written
+    """
+    if isinstance(target, str):
+        with open(target, 'w', newline='', encoding='utf-8') as f:
+            return write_yardi_csv(extracted_data, f, include_header, profile)
+
+    compiled = get_profile(profile)
+    converters = [CONVERTERS[column_type] for column_type in compiled.types]
+
+    writer = csv.writer(target)
+    if include_header:
+        writer.writerow(compiled.headers)
+
+    count = 0
+    for values in iter_mapped_rows(compiled, extracted_data):
+        writer.writerow([convert(value) for convert, value in zip(converters, values)])
+        count += 1
+
+    return count
+
+def generate_yardi_csv(extracted_data: Iterable[Dict], output_dir: str = "exports",
+                       profile: str = FLAT_EXPORT_PROFILE) -> str:
+    """
+    Generate a Yardi ETL CSV file
+
+    Args:
+        extracted_data: Iterable of dictionaries containing extracted lease data
+        output_dir: Directory to save the output file
+        profile: Name of the Yardi mapping profile
+
+    Returns:
+        Path to the generated CSV file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = os.path.join(output_dir, export_filename("yardi_etl", "csv"))
+    write_yardi_csv(extracted_data, filepath, profile=profile)
+    return filepath
+
+def yardi_arrow_schema(profile: str = FLAT_EXPORT_PROFILE):
+    """Build the typed Arrow schema of a profile's Yardi columns"""
+    import pyarrow as pa
+
+    arrow_types = {
+        'date': pa.date32(),
+        'decimal': pa.decimal128(12, 2),
+        'integer': pa.int64(),
+        'string': pa.string(),
+    }
+    compiled = get_profile(profile)
+    return pa.schema([
+        (header, arrow_types[column_type])
+        for header, column_type in zip(compiled.headers, compiled.types)
+    ])
+
+def write_yardi_parquet(extracted_data: Iterable[Dict], target,
+                        row_group_size: int = DEFAULT_ROW_GROUP_SIZE, profile: str = FLAT_EXPORT_PROFILE) -> int:
+    """
+    Write Yardi rows to a Parquet file in row groups through Arrow
+
+    Only one row group of values is held in memory at a time.
+
+    Args:
+        extracted_data: Iterable of dictionaries containing extracted lease data
+        target: File path or writable binary file object
+        row_group_size: Number of rows per Parquet row group
+        profile: Name of the Yardi mapping profile
+
+    Returns:
+        Number of data rows written
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    compiled = get_profile(profile)
+    schema = yardi_arrow_schema(profile)
+    converters = [CONVERTERS[column_type] for column_type in compiled.types]
+
+    count = 0
+    with pq.ParquetWriter(target, schema) as writer:
+        columns = [[] for _ in converters]
+
+        def flush():
+            table = pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+            writer.write_table(table, row_group_size=row_group_size)
+            for values in columns:
+                values.clear()
+
+        for row in iter_mapped_rows(compiled, extracted_data):
+            for values, convert, value in zip(columns, converters, row):
+                values.append(convert(value))
+            count += 1
+            if count % row_group_size == 0:
+                flush()
+
+        if columns[0] or count == 0:
+            flush()
+
+    return count
+
+def generate_yardi_parquet(extracted_data: Iterable[Dict], output_dir: str = "exports",
+                           row_group_size: int = DEFAULT_ROW_GROUP_SIZE, profile: str = FLAT_EXPORT_PROFILE) -> str:
+    """
+    Generate a typed Yardi Parquet file for the data warehouse
+
+    Args:
+        extracted_data: Iterable of dictionaries containing extracted lease data
+        output_dir: Directory to save the output file
+        row_group_size: Number of rows per Parquet row group
+        profile: Name of the Yardi mapping profile
+
+    Returns:
+        Path to the generated Parquet file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = os.path.join(output_dir, export_filename("yardi_etl", "parquet"))
+    write_yardi_parquet(extracted_data, filepath, row_group_size, profile)
+    return filepath
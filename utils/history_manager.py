@@ -4,25 +4,560 @@ Handles storage and retrieval of previous lease extractions
 """
 
 import os
+import re
+import gzip
 import json
-from datetime import datetime
-from typing import List, Dict, Optional
+import time
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterator, Optional, Tuple
+
+from .file_locks import atomic_write_json, file_lock
 
 HISTORY_DIR = "history"
+DB_FILE = os.path.join(HISTORY_DIR, "history.db")
+
+# Legacy JSON index, migrated into the database on first use
 INDEX_FILE = os.path.join(HISTORY_DIR, "index.json")
 
+# Cold records are packed into append-only gzip segments here
+ARCHIVE_DIR = os.path.join(HISTORY_DIR, "archive")
+ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024
+
+RETENTION_FILE = os.path.join(HISTORY_DIR, "retention.json")
+
+# Records move hot (plain JSON) -> warm (gzip in the database) -> cold
+# (archive segment). Nothing is deleted unless delete_after_days is set.
+DEFAULT_RETENTION_POLICY = {
+    "warm_after_days": 30,      # compress records older than this
+    "max_hot_records": 1000,    # ...or beyond the newest N
+    "cold_after_days": 365,     # archive records older than this
+    "max_db_records": None,     # ...or beyond the newest N kept in the database
+    "max_db_mb": None,          # ...or oldest first while stored records exceed this size
+    "delete_after_days": None,  # purge records older than this entirely
+}
+
+# Seconds between automatic retention passes after saves
+RETENTION_INTERVAL = 3600
+
+# Seconds a connection waits for another process's write to finish
+BUSY_TIMEOUT = 30
+
+# Summary fields copied out of the extracted data into indexed columns
+SUMMARY_FIELDS = ['property_address', 'tenant_name', 'lease_number', 'lease_start_date', 'lease_end_date']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    filename TEXT NOT NULL DEFAULT '',
+    property_address TEXT NOT NULL DEFAULT '',
+    tenant_name TEXT NOT NULL DEFAULT '',
+    lease_number TEXT NOT NULL DEFAULT '',
+    lease_start_date TEXT NOT NULL DEFAULT '',
+    lease_end_date TEXT NOT NULL DEFAULT '',
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_timestamp ON extractions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_extractions_filename ON extractions (filename, lease_number);
+CREATE INDEX IF NOT EXISTS idx_extractions_property ON extractions (property_address);
+CREATE INDEX IF NOT EXISTS idx_extractions_tenant ON extractions (tenant_name);
+CREATE INDEX IF NOT EXISTS idx_extractions_dates ON extractions (lease_start_date, lease_end_date);
+"""
+
+# Bumped whenever the schema gains tables or indexes that need a backfill
+SCHEMA_VERSION = 6
+
+# When a record was last created or edited, as a sortable ISO string ('timestamp'
+# is "YYYY-MM-DD HH:MM:SS", 'updated_at' isoformat); indexed for delta exports
+CHANGED_AT = "replace(COALESCE(updated_at, timestamp), ' ', 'T')"
+
+# Full-text index over every extracted value and every _source citation;
+# rowids are shared with the extractions table
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS extractions_fts USING fts5 (
+    field_values, source_text, tokenize = 'porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS extractions_fts_delete AFTER DELETE ON extractions BEGIN
+    DELETE FROM extractions_fts WHERE rowid = old.rowid;
+END;
+"""
+
+# Numeric fields copied into indexed REAL columns for range filters (dates
+# use the lease date columns)
+RANGE_FIELDS = ['monthly_rent', 'security_deposit', 'square_footage', 'lease_term_months']
+
+# Storage tier of each record and where cold records live in the archive
+TIER_COLUMNS = [
+    "tier TEXT NOT NULL DEFAULT 'hot'",
+    "segment TEXT",
+    "segment_offset INTEGER",
+    "segment_length INTEGER",
+]
+
+RECORD_COLUMNS = "tier, record, segment, segment_offset, segment_length"
+
+# Field-level deltas of every edit: the record row always holds the latest
+# version, and older versions are rebuilt by undoing newer deltas. A NULL
+# old_value means the field did not exist before the change.
+CHANGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_changes (
+    extraction_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    changed_at TEXT NOT NULL,
+    author TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT '',
+    from_model INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (extraction_id, version, field)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS extraction_changes_delete AFTER DELETE ON extractions BEGIN
+    DELETE FROM extraction_changes WHERE extraction_id = old.id;
+END;
+"""
+
+CHANGE_COLUMNS = "version, field, old_value, new_value, changed_at, author, source, from_model"
+
+# MinHash signatures of the lease text and their LSH band buckets, for
+# near-duplicate matching (see similarity_index); removed with their record
+SIMILARITY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS similarity_signatures (
+    id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS similarity_bands (
+    band INTEGER NOT NULL,
+    bucket BLOB NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_similarity_bands_id ON similarity_bands (id);
+CREATE TRIGGER IF NOT EXISTS similarity_delete AFTER DELETE ON extractions BEGIN
+    DELETE FROM similarity_signatures WHERE id = old.id;
+    DELETE FROM similarity_bands WHERE id = old.id;
+END;
+"""
+
+# Field values weigh more than citations when ranking matches
+SEARCH_WEIGHTS = (2.0, 1.0)
+
+SUMMARY_COLUMNS = "id, timestamp, filename, property_address, tenant_name, lease_number, lease_start_date, lease_end_date"
+
+# Columns the history can be paged by (rowid breaks ties)
+SORT_KEYS = ['timestamp', 'filename', 'tenant_name', 'property_address', 'lease_start_date', 'lease_end_date']
+
+DEFAULT_PAGE_SIZE = 20
+
+# Number of loaded records kept in memory between Streamlit reruns
+RECORD_CACHE_SIZE = 256
+
+# Crockford base32 alphabet used by ULIDs
+ULID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+_initialized_dbs = set()
+
+_last_retention = {}
+
+_id_lock = threading.Lock()
+_last_id = {"ms": 0, "random": 0}
+
+# (database, extraction ID) -> (revision, record)
+_record_cache = OrderedDict()
+_record_cache_lock = threading.Lock()
+
 def ensure_history_dir():
-    """Create history directory if it doesn't exist"""
+    """Create history directory and database if they don't exist"""
     os.makedirs(HISTORY_DIR, exist_ok=True)
     
-    # Create index file if it doesn't exist
+    db_path = os.path.abspath(DB_FILE)
+    if db_path in _initialized_dbs and os.path.exists(db_path):
+        return
+    
+    # One process at a time creates, upgrades or migrates the database
+    with file_lock(DB_FILE), closing(sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)) as conn:
+        # WAL lets Streamlit sessions read while another one saves
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            upgrade_schema(conn)
+        migrate_json_history(conn)
+    
+    _initialized_dbs.add(db_path)
+
+def get_connection() -> sqlite3.Connection:
+    """Open a connection to the history database"""
+    ensure_history_dir()
+    conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+@contextmanager
+def write_transaction():
+    """
+    Run a block as one write transaction, committed atomically or rolled back
+    
+    BEGIN IMMEDIATE takes the write lock up front, so a read-modify-write
+    cannot interleave with another process's write; concurrent writers wait
+    up to BUSY_TIMEOUT seconds instead of failing.
+    """
+    with closing(get_connection()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def upgrade_schema(conn: sqlite3.Connection) -> None:
+    """Bring an older database up to SCHEMA_VERSION, backfilling records saved before each change"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    if version < 1:
+        # Full-text search
+        conn.executescript(SEARCH_SCHEMA)
+        with conn:
+            conn.execute("DELETE FROM extractions_fts")
+            for row in conn.execute("SELECT rowid, record FROM extractions").fetchall():
+                _write_search_text(conn, row[0], json.loads(row[1]))
+            conn.execute("PRAGMA user_version = 1")
+    
+    if version < 2:
+        # Storage tiers and numeric range columns (replacing JSON expression indexes,
+        # which cannot read compressed records)
+        with conn:
+            for column in TIER_COLUMNS:
+                conn.execute(f"ALTER TABLE extractions ADD COLUMN {column}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_tier ON extractions (tier, timestamp)")
+            for field in RANGE_FIELDS:
+                conn.execute(f"DROP INDEX IF EXISTS idx_extractions_{field}")
+                conn.execute(f"ALTER TABLE extractions ADD COLUMN {field} REAL")
+                conn.execute(f"CREATE INDEX idx_extractions_{field} ON extractions ({field})")
+            
+            for row in conn.execute("SELECT rowid, record FROM extractions").fetchall():
+                data = json.loads(row[1]).get('data', {})
+                conn.execute(
+                    f"UPDATE extractions SET {', '.join(f'{field} = ?' for field in RANGE_FIELDS)} WHERE rowid = ?",
+                    (*(_number(data.get(field)) for field in RANGE_FIELDS), row[0])
+                )
+            conn.execute("PRAGMA user_version = 2")
+    
+    if version < 3:
+        # Field-level change history
+        conn.executescript(CHANGES_SCHEMA)
+        conn.execute("PRAGMA user_version = 3")
+    
+    if version < 4:
+        # Delta exports read only the records changed since a watermark
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_extractions_changed_at ON extractions ({CHANGED_AT})")
+        conn.execute("PRAGMA user_version = 4")
+    
+    if version < 5:
+        # Similarity index, formerly a JSON side file rewritten on every save
+        from .similarity_index import migrate_json_index
+        conn.executescript(SIMILARITY_SCHEMA)
+        with conn:
+            migrate_json_index(conn)
+            conn.execute("PRAGMA user_version = 5")
+    
+    if version < 6:
+        # Write counter, so cached records notice a record saved again under its ID
+        conn.execute("ALTER TABLE extractions ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        conn.execute("PRAGMA user_version = 6")
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _search_text(extraction: Dict) -> tuple:
+    """Split a record into (field values, source citations) text for full-text search"""
+    values = [extraction.get('filename', '')]
+    sources = []
+    for field, value in extraction.get('data', {}).items():
+        if field.endswith('_source'):
+            sources.append(str(value or ''))
+        elif isinstance(value, bool):
+            # "pet allowed" matches leases that allow pets
+            if value:
+                values.append(field.replace('_', ' '))
+        elif isinstance(value, (str, int, float)) and value != '':
+            values.append(str(value))
+    return "; ".join(values), "; ".join(sources)
+
+def _write_search_text(conn: sqlite3.Connection, rowid: int, extraction: Dict) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO extractions_fts (rowid, field_values, source_text) VALUES (?, ?, ?)",
+        (rowid, *_search_text(extraction))
+    )
+
+def _summary_values(extraction: Dict) -> tuple:
+    """Indexed column values of an extraction record"""
+    data = extraction.get('data', {})
+    return (
+        extraction['id'],
+        extraction['timestamp'],
+        extraction.get('filename', ''),
+        *(str(data.get(field) or '') for field in SUMMARY_FIELDS),
+        *(_number(data.get(field)) for field in RANGE_FIELDS),
+        extraction.get('version', 1),
+        extraction.get('updated_at'),
+        json.dumps(extraction, separators=(',', ':'))
+    )
+
+def _write_extraction(conn: sqlite3.Connection, extraction: Dict) -> None:
+    # Upsert keeps the rowid stable, so the search row is replaced in place;
+    # a written record is always hot again, and every write bumps its revision
+    conn.execute(
+        """INSERT INTO extractions
+           (id, timestamp, filename, property_address, tenant_name, lease_number,
+            lease_start_date, lease_end_date, monthly_rent, security_deposit, square_footage,
+            lease_term_months, version, updated_at, record)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (id) DO UPDATE SET
+               timestamp = excluded.timestamp, filename = excluded.filename,
+               property_address = excluded.property_address, tenant_name = excluded.tenant_name,
+               lease_number = excluded.lease_number, lease_start_date = excluded.lease_start_date,
+               lease_end_date = excluded.lease_end_date, monthly_rent = excluded.monthly_rent,
+               security_deposit = excluded.security_deposit, square_footage = excluded.square_footage,
+               lease_term_months = excluded.lease_term_months, version = excluded.version,
+               updated_at = excluded.updated_at, record = excluded.record,
+               tier = 'hot', segment = NULL, segment_offset = NULL, segment_length = NULL,
+               revision = revision + 1""",
+        _summary_values(extraction)
+    )
+    rowid = conn.execute("SELECT rowid FROM extractions WHERE id = ?", (extraction['id'],)).fetchone()[0]
+    _write_search_text(conn, rowid, extraction)
+
+def migrate_json_history(conn: sqlite3.Connection) -> int:
+    """
+    Import records from the legacy index.json + per-record JSON files
+    
+    The index is renamed to index.json.migrated afterwards so the import runs
+    once; the record files are left in place as a backup.
+    
+    Returns:
+        Number of records migrated
+    """
     if not os.path.exists(INDEX_FILE):
-        with open(INDEX_FILE, 'w') as f:
-            json.dump({"extractions": []}, f)
+        return 0
+    
+    with open(INDEX_FILE, 'r') as f:
+        index = json.load(f)
+    
+    migrated = 0
+    with conn:
+        # Oldest first so insertion order matches the original newest-first index
+        for entry in reversed(index.get("extractions", [])):
+            extraction_file = os.path.join(HISTORY_DIR, f"{entry['id']}.json")
+            if not os.path.exists(extraction_file):
+                continue
+            with open(extraction_file, 'r') as f:
+                _write_extraction(conn, json.load(f))
+            migrated += 1
+    
+    os.replace(INDEX_FILE, INDEX_FILE + ".migrated")
+    
+    return migrated
+
+def _read_record(row) -> Dict:
+    """Decode a stored record from whichever tier holds it"""
+    if row['tier'] == 'cold':
+        with open(os.path.join(ARCHIVE_DIR, row['segment']), 'rb') as f:
+            f.seek(row['segment_offset'])
+            return json.loads(gzip.decompress(f.read(row['segment_length'])))
+    if row['tier'] == 'warm':
+        return json.loads(gzip.decompress(row['record']))
+    return json.loads(row['record'])
+
+def _append_to_archive(blobs: List[bytes]) -> List[Tuple[str, int, int]]:
+    """
+    Append gzip-compressed records to the current archive segment
+    
+    Segments are only ever appended to; a new one is started once the
+    current one reaches ARCHIVE_SEGMENT_BYTES.
+    
+    Returns:
+        (segment file name, offset, length) of each record
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    locations = []
+    
+    with file_lock(os.path.join(ARCHIVE_DIR, "segments")):
+        segments = sorted(name for name in os.listdir(ARCHIVE_DIR) if name.endswith('.jsonl.gz'))
+        segment = segments[-1] if segments else "segment-000001.jsonl.gz"
+        if os.path.exists(os.path.join(ARCHIVE_DIR, segment)) and \
+                os.path.getsize(os.path.join(ARCHIVE_DIR, segment)) >= ARCHIVE_SEGMENT_BYTES:
+            segment = f"segment-{len(segments) + 1:06d}.jsonl.gz"
+        
+        with open(os.path.join(ARCHIVE_DIR, segment), 'ab') as f:
+            for blob in blobs:
+                locations.append((segment, f.tell(), len(blob)))
+                f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+    
+    return locations
+
+def load_retention_policy() -> Dict:
+    """Load the retention policy (history/retention.json over the defaults)"""
+    policy = dict(DEFAULT_RETENTION_POLICY)
+    if os.path.exists(RETENTION_FILE):
+        with open(RETENTION_FILE, 'r') as f:
+            policy.update(json.load(f))
+    return policy
+
+def save_retention_policy(policy: Dict) -> None:
+    """Persist retention policy settings"""
+    ensure_history_dir()
+    atomic_write_json(RETENTION_FILE, {**DEFAULT_RETENTION_POLICY, **policy}, indent=2)
+
+def apply_retention(policy: Optional[Dict] = None) -> Dict[str, int]:
+    """
+    Move records between storage tiers according to the retention policy
+    
+    Warm records are gzip-compressed in the database; cold records are
+    appended to archive segments and keep only their summary, search and
+    range columns in the database. Both still load through load_extraction.
+    
+    Args:
+        policy: Policy settings (defaults to load_retention_policy())
+    
+    Returns:
+        Counts of records 'warmed', 'archived' and 'deleted'
+    """
+    policy = {**DEFAULT_RETENTION_POLICY, **(policy or load_retention_policy())}
+    now = datetime.now()
+    
+    def cutoff(days):
+        return (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    
+    counts = {"warmed": 0, "archived": 0, "deleted": 0}
+    
+    with write_transaction() as conn:
+        deleted_ids = []
+        if policy["delete_after_days"] is not None:
+            deleted_ids = [row[0] for row in conn.execute("SELECT id FROM extractions WHERE timestamp < ?",
+                                                          (cutoff(policy["delete_after_days"]),))]
+            conn.execute("DELETE FROM extractions WHERE timestamp < ?", (cutoff(policy["delete_after_days"]),))
+            counts["deleted"] = len(deleted_ids)
+        
+        # Cold: by age, by count and by stored size
+        cold_ids = set()
+        if policy["cold_after_days"] is not None:
+            cold_ids.update(row[0] for row in conn.execute(
+                "SELECT id FROM extractions WHERE tier != 'cold' AND timestamp < ?",
+                (cutoff(policy["cold_after_days"]),)))
+        if policy["max_db_records"] is not None:
+            cold_ids.update(row[0] for row in conn.execute(
+                "SELECT id FROM extractions WHERE tier != 'cold' ORDER BY timestamp DESC, rowid DESC LIMIT -1 OFFSET ?",
+                (policy["max_db_records"],)))
+        if policy["max_db_mb"] is not None:
+            stored_bytes = conn.execute("SELECT COALESCE(SUM(length(record)), 0) FROM extractions").fetchone()[0]
+            limit_bytes = policy["max_db_mb"] * 1024 * 1024
+            for row in conn.execute("SELECT id, length(record) FROM extractions WHERE tier != 'cold' "
+                                    "ORDER BY timestamp, rowid"):
+                if stored_bytes <= limit_bytes:
+                    break
+                cold_ids.add(row[0])
+                stored_bytes -= row[1]
+        
+        if cold_ids:
+            rows = [conn.execute(f"SELECT id, {RECORD_COLUMNS} FROM extractions WHERE id = ?", (extraction_id,)).fetchone()
+                    for extraction_id in sorted(cold_ids)]
+            blobs = [row['record'] if row['tier'] == 'warm' else gzip.compress(row['record'].encode('utf-8'))
+                     for row in rows]
+            for row, (segment, offset, length) in zip(rows, _append_to_archive(blobs)):
+                conn.execute(
+                    "UPDATE extractions SET tier = 'cold', record = X'', segment = ?, segment_offset = ?, "
+                    "segment_length = ? WHERE id = ?",
+                    (segment, offset, length, row['id'])
+                )
+            counts["archived"] = len(rows)
+        
+        # Warm: by age and by count
+        warm_ids = set()
+        if policy["warm_after_days"] is not None:
+            warm_ids.update(row[0] for row in conn.execute(
+                "SELECT id FROM extractions WHERE tier = 'hot' AND timestamp < ?",
+                (cutoff(policy["warm_after_days"]),)))
+        if policy["max_hot_records"] is not None:
+            warm_ids.update(row[0] for row in conn.execute(
+                "SELECT id FROM extractions WHERE tier = 'hot' AND rowid NOT IN ("
+                "SELECT rowid FROM extractions ORDER BY timestamp DESC, rowid DESC LIMIT ?)",
+                (policy["max_hot_records"],)))
+        
+        for extraction_id in warm_ids:
+            record = conn.execute("SELECT record FROM extractions WHERE id = ?", (extraction_id,)).fetchone()[0]
+            conn.execute("UPDATE extractions SET tier = 'warm', record = ? WHERE id = ?",
+                         (gzip.compress(record.encode('utf-8')), extraction_id))
+        counts["warmed"] = len(warm_ids)
+    
+    _last_retention[os.path.abspath(DB_FILE)] = time.monotonic()
+    _refresh_snapshot(deleted_ids=deleted_ids)
+    
+    return counts
+
+def get_storage_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Count records and stored bytes per storage tier
+    
+    Returns:
+        Tier ('hot', 'warm', 'cold') -> {'records', 'bytes'}
+    """
+    stats = {tier: {"records": 0, "bytes": 0} for tier in ('hot', 'warm', 'cold')}
+    with closing(get_connection()) as conn:
+        for row in conn.execute("SELECT tier, COUNT(*), SUM(length(record)), SUM(segment_length) "
+                                "FROM extractions GROUP BY tier"):
+            stats[row[0]] = {"records": row[1], "bytes": (row[3] if row[0] == 'cold' else row[2]) or 0}
+    return stats
+
+def _refresh_snapshot(saved: Optional[List[Dict]] = None, deleted_ids: Optional[List[str]] = None) -> None:
+    """Pass committed changes on to the analytics snapshot; drop it if that fails so it is rebuilt"""
+    if not saved and not deleted_ids:
+        return
+    
+    from .portfolio_snapshot import append_to_snapshot, invalidate_snapshot, remove_from_snapshot
+    try:
+        append_to_snapshot(saved or [])
+        remove_from_snapshot(deleted_ids or [])
+    except Exception:
+        invalidate_snapshot()
 
 def generate_extraction_id() -> str:
-    """Generate unique ID for extraction"""
-    return datetime.now().strftime('%Y%m%d_%H%M%S')
+    """
+    Generate unique ID for extraction
+    
+    IDs are ULIDs: a millisecond timestamp followed by 80 random bits, in
+    Crockford base32. Within one millisecond the random part is incremented,
+    so IDs generated by this process never collide and sort in creation order.
+    """
+    with _id_lock:
+        ms = int(time.time() * 1000)
+        if ms <= _last_id["ms"]:
+            ms = _last_id["ms"]
+            random_bits = _last_id["random"] + 1
+            if random_bits >= 1 << 80:
+                ms += 1
+                random_bits = int.from_bytes(os.urandom(10), 'big')
+        else:
+            random_bits = int.from_bytes(os.urandom(10), 'big')
+        _last_id.update(ms=ms, random=random_bits)
+    
+    value = (ms << 80) | random_bits
+    return "".join(ULID_ALPHABET[(value >> shift) & 31] for shift in range(125, -1, -5))
 
 def save_extraction(filename: str, data: Dict) -> str:
     """
@@ -31,60 +566,62 @@ def save_extraction(filename: str, data: Dict) -> str:
     Args:
         filename: Original PDF filename
         data: Extracted data dictionary
-        
+    
     Returns:
         Extraction ID
     """
-    ensure_history_dir()
-    
-    # Generate unique ID
-    extraction_id = generate_extraction_id()
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return save_extractions([(filename, data)])[0]
+
+def save_extractions(extractions: List[Tuple[str, Dict]],
+                     extraction_ids: Optional[List[str]] = None,
+                     texts: Optional[List[str]] = None) -> List[str]:
+    """
+    Save a batch of extractions to history in one transaction
     
-    # Create extraction record
-    extraction = {
-        "id": extraction_id,
-        "timestamp": timestamp,
-        "filename": filename,
-        "data": data
-    }
+    Args:
+        extractions: List of (original PDF filename, extracted data) pairs
+        extraction_ids: IDs to save the records under, e.g. assigned and
+            checkpointed by the caller beforehand so a retried save replaces
+            its records instead of duplicating them (generated when omitted)
+        texts: Lease text of each extraction, indexed for near-duplicate
+            matching in the same transaction (not indexed when omitted)
     
-    # Save individual extraction file
-    extraction_file = os.path.join(HISTORY_DIR, f"{extraction_id}.json")
-    with open(extraction_file, 'w') as f:
-        json.dump(extraction, f, indent=2)
+    Returns:
+        Extraction IDs, in the same order
+    """
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if extraction_ids is None:
+        extraction_ids = [generate_extraction_id() for _ in extractions]
     
-    # Update index
-    with open(INDEX_FILE, 'r') as f:
-        index = json.load(f)
+    signatures = {}
+    if texts is not None:
+        from .similarity_index import compute_signature, write_signatures
+        # Hashed before the write lock is taken
+        signatures = {extraction_id: compute_signature(text) for extraction_id, text in zip(extraction_ids, texts)}
     
-    # Add to index (summary only)
-    index_entry = {
-        "id": extraction_id,
-        "timestamp": timestamp,
-        "filename": filename,
-        "property_address": data.get('property_address', ''),
-        "tenant_name": data.get('tenant_name', ''),
-        "lease_start_date": data.get('lease_start_date', '')
-    }
+    saved = []
     
-    index["extractions"].insert(0, index_entry)  # Add to beginning (newest first)
+    with write_transaction() as conn:
+        for (filename, data), extraction_id in zip(extractions, extraction_ids):
+            extraction = {
+                "id": extraction_id,
+                "timestamp": timestamp,
+                "filename": filename,
+                "data": data
+            }
+            _write_extraction(conn, extraction)
+            saved.append(extraction)
+        if signatures:
+            write_signatures(conn, signatures)
     
-    # Keep only last 100 extractions
-    if len(index["extractions"]) > 100:
-        # Delete old extraction files
-        for old_entry in index["extractions"][100:]:
-            old_file = os.path.join(HISTORY_DIR, f"{old_entry['id']}.json")
-            if os.path.exists(old_file):
-                os.remove(old_file)
-        
-        index["extractions"] = index["extractions"][:100]
+    _refresh_snapshot(saved=saved)
     
-    # Save updated index
-    with open(INDEX_FILE, 'w') as f:
-        json.dump(index, f, indent=2)
+    # Re-tier older records now and then, outside the save transaction
+    last_run = _last_retention.get(os.path.abspath(DB_FILE))
+    if last_run is None or time.monotonic() - last_run >= RETENTION_INTERVAL:
+        apply_retention()
     
-    return extraction_id
+    return list(extraction_ids)
 
 def load_extraction(extraction_id: str) -> Optional[Dict]:
     """
@@ -92,17 +629,243 @@ def load_extraction(extraction_id: str) -> Optional[Dict]:
     
     Args:
         extraction_id: Extraction ID
-        
+    
     Returns:
         Extraction data or None if not found
     """
-    extraction_file = os.path.join(HISTORY_DIR, f"{extraction_id}.json")
+    cache_key = (os.path.abspath(DB_FILE), extraction_id)
+    
+    with closing(get_connection()) as conn:
+        # Only the revision is read when the cached copy is still current; it
+        # changes on every write, including a save that replaces a record
+        row = conn.execute("SELECT revision FROM extractions WHERE id = ?", (extraction_id,)).fetchone()
+        if row is None:
+            with _record_cache_lock:
+                _record_cache.pop(cache_key, None)
+            return None
+        
+        stamp = row['revision']
+        with _record_cache_lock:
+            cached = _record_cache.get(cache_key)
+            if cached is not None and cached[0] == stamp:
+                _record_cache.move_to_end(cache_key)
+                record = cached[1]
+            else:
+                record = None
+        
+        if record is None:
+            record = _read_record(conn.execute(f"SELECT {RECORD_COLUMNS} FROM extractions WHERE id = ?",
+                                               (extraction_id,)).fetchone())
+            with _record_cache_lock:
+                _record_cache[cache_key] = (stamp, record)
+                _record_cache.move_to_end(cache_key)
+                while len(_record_cache) > RECORD_CACHE_SIZE:
+                    _record_cache.popitem(last=False)
+    
+    # Copy so callers can edit the record without touching the cache
+    return {**record, 'data': dict(record.get('data', {}))}
+
+def iter_extractions(batch_size: int = 500) -> Iterator[Dict]:
+    """
+    Stream every saved extraction in save order, whatever tier it is stored in
+    
+    Args:
+        batch_size: Number of records read from the database at a time
+    
+    Yields:
+        Full extraction records
+    """
+    last_rowid = 0
+    with closing(get_connection()) as conn:
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid, {RECORD_COLUMNS} FROM extractions WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _read_record(row)
+            last_rowid = rows[-1]['rowid']
+
+def iter_changed_extractions(since: str = "", batch_size: int = 500) -> Iterator[Tuple[str, Dict]]:
+    """
+    Stream the extractions created or edited at or after a timestamp, oldest change first
+    
+    Only the matching rows are read (through an index on the change time), so
+    the cost follows the number of changed records, not the size of history.
+    
+    Args:
+        since: ISO timestamp ("YYYY-MM-DDTHH:MM:SS..."); empty for every record
+        batch_size: Number of records read from the database at a time
+    
+    Yields:
+        Tuples of (change timestamp, full extraction record)
+    """
+    cursor = (since, 0)
+    with closing(get_connection()) as conn:
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid, {CHANGED_AT} AS changed_at, {RECORD_COLUMNS} FROM extractions "
+                f"WHERE {CHANGED_AT} >= ? AND ({CHANGED_AT} > ? OR rowid > ?) ORDER BY {CHANGED_AT}, rowid LIMIT ?",
+                (cursor[0], *cursor, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row['changed_at'], _read_record(row)
+            cursor = (rows[-1]['changed_at'], rows[-1]['rowid'])
+
+def update_extractions(updates: Dict[str, Dict], source: str = "", author: str = "",
+                       from_model: bool = False) -> List[str]:
+    """
+    Apply field changes to many saved extractions as one bulk update
+    
+    Only fields whose value actually differs are written. Each changed record
+    gets its version bumped and an update timestamp, and every changed field
+    is logged as a delta (old and new value) for the audit trail, all in one
+    transaction. The consistency issues stored with each changed record are
+    recomputed from its new values.
+    
+    Args:
+        updates: Extraction ID -> {field: new value}
+        source: Where the changes came from (e.g. the imported file name)
+        author: Who made the changes
+        from_model: Whether the new values were produced by the model (e.g. a
+            re-extraction) rather than entered by a person
+    
+    Returns:
+        IDs of the extractions that changed
+    """
+    from .consistency_checker import store_consistency_issues
+    
+    timestamp = datetime.now().isoformat()
+    changed_ids = []
+    saved = []
+    
+    with write_transaction() as conn:
+        for extraction_id, fields in updates.items():
+            row = conn.execute(f"SELECT {RECORD_COLUMNS} FROM extractions WHERE id = ?", (extraction_id,)).fetchone()
+            if row is None:
+                continue
+    
+            extraction = _read_record(row)
+            data = extraction['data']
+            changed = {field: value for field, value in fields.items() if data.get(field) != value}
+            if not changed:
+                continue
+    
+            version = extraction.get('version', 1) + 1
+            conn.executemany(
+                f"INSERT INTO extraction_changes ({CHANGE_COLUMNS}, extraction_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(version, field, json.dumps(data[field]) if field in data else None, json.dumps(value),
+                  timestamp, author, source, int(from_model), extraction_id)
+                 for field, value in changed.items()]
+            )
+            
+            data.update(changed)
+            extraction['version'] = version
+            extraction['updated_at'] = timestamp
+            extraction['update_source'] = source
+    
+            saved.append(extraction)
+            changed_ids.append(extraction_id)
+        
+        # Edits can resolve (or introduce) contradictions; re-check all changed records in one pass
+        if saved:
+            store_consistency_issues(saved)
+        for extraction in saved:
+            _write_extraction(conn, extraction)
+    
+    _refresh_snapshot(saved=saved)
+    
+    return changed_ids
+
+def _change_entry(row) -> Dict:
+    return {
+        'version': row['version'],
+        'field': row['field'],
+        'old_value': None if row['old_value'] is None else json.loads(row['old_value']),
+        'new_value': json.loads(row['new_value']),
+        'changed_at': row['changed_at'],
+        'author': row['author'],
+        'source': row['source'],
+        'from_model': bool(row['from_model'])
+    }
+
+def get_field_history(extraction_id: str, field: Optional[str] = None) -> List[Dict]:
+    """
+    Get the audit trail of an extraction's field changes, oldest first
+    
+    Fields without entries still hold the value originally extracted by the
+    model.
+    
+    Args:
+        extraction_id: Extraction ID
+        field: Only return changes to this field
+    
+    Returns:
+        List of changes with 'version', 'field', 'old_value', 'new_value',
+        'changed_at', 'author', 'source' and 'from_model'
+    """
+    sql = f"SELECT {CHANGE_COLUMNS} FROM extraction_changes WHERE extraction_id = ?"
+    params = [extraction_id]
+    if field is not None:
+        sql += " AND field = ?"
+        params.append(field)
+    sql += " ORDER BY version, field"
+    
+    with closing(get_connection()) as conn:
+        return [_change_entry(row) for row in conn.execute(sql, params)]
+
+def load_extraction_version(extraction_id: str, version: int) -> Optional[Dict]:
+    """
+    Rebuild an extraction as it was at an earlier version
     
-    if not os.path.exists(extraction_file):
+    Starts from the latest record and undoes the deltas of every newer
+    version, so the cost depends on the number of changed fields, not on the
+    record size or how many times it was saved. Version 1 is the original
+    extraction.
+    
+    Args:
+        extraction_id: Extraction ID
+        version: Version number to rebuild
+    
+    Returns:
+        Extraction data at that version, or None if either does not exist
+    """
+    extraction = load_extraction(extraction_id)
+    if extraction is None or not 1 <= version <= extraction.get('version', 1):
         return None
     
-    with open(extraction_file, 'r') as f:
-        return json.load(f)
+    with closing(get_connection()) as conn:
+        rows = conn.execute(
+            f"SELECT {CHANGE_COLUMNS} FROM extraction_changes WHERE extraction_id = ? AND version > ? "
+            "ORDER BY version DESC",
+            (extraction_id, version)
+        ).fetchall()
+        last_change = conn.execute(
+            "SELECT changed_at, source FROM extraction_changes WHERE extraction_id = ? AND version <= ? "
+            "ORDER BY version DESC LIMIT 1",
+            (extraction_id, version)
+        ).fetchone()
+    
+    data = extraction['data']
+    for row in rows:
+        if row['old_value'] is None:
+            data.pop(row['field'], None)
+        else:
+            data[row['field']] = json.loads(row['old_value'])
+    
+    extraction['version'] = version
+    if last_change is None:
+        extraction.pop('updated_at', None)
+        extraction.pop('update_source', None)
+    else:
+        extraction['updated_at'] = last_change['changed_at']
+        extraction['update_source'] = last_change['source']
+    
+    return extraction
 
 def list_extractions(search_term: str = "") -> List[Dict]:
     """
@@ -110,31 +873,125 @@ def list_extractions(search_term: str = "") -> List[Dict]:
     
     Args:
         search_term: Optional search term to filter results
-        
+    
     Returns:
         List of extraction summaries
     """
-    ensure_history_dir()
+    query = f"SELECT {SUMMARY_COLUMNS} FROM extractions"
+    params = []
     
-    if not os.path.exists(INDEX_FILE):
-        return []
+    # Filter by search term if provided
+    if search_term:
+        pattern = "%" + search_term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query += (" WHERE filename LIKE ? ESCAPE '\\' OR property_address LIKE ? ESCAPE '\\'"
+                  " OR tenant_name LIKE ? ESCAPE '\\'")
+        params = [pattern] * 3
     
-    with open(INDEX_FILE, 'r') as f:
-        index = json.load(f)
+    query += " ORDER BY timestamp DESC, rowid DESC"
     
-    extractions = index.get("extractions", [])
+    with closing(get_connection()) as conn:
+        return [dict(row) for row in conn.execute(query, params)]
+
+def list_extractions_page(cursor: Optional[list] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                          sort_key: str = "timestamp", descending: bool = True) -> Tuple[List[Dict], Optional[list]]:
+    """
+    List one page of extraction summaries using keyset pagination
     
-    # Filter by search term if provided
-    if search_term:
-        search_lower = search_term.lower()
-        extractions = [
-            e for e in extractions
-            if search_lower in e.get('filename', '').lower()
-            or search_lower in e.get('property_address', '').lower()
-            or search_lower in e.get('tenant_name', '').lower()
-        ]
+    Each page is a single indexed range scan, so fetching a page costs the
+    same whether history holds a hundred records or a hundred thousand.
+    
+    Args:
+        cursor: Cursor returned with the previous page (None for the first page)
+        page_size: Number of summaries per page
+        sort_key: Column to sort by (one of SORT_KEYS)
+        descending: Sort newest/highest first
+    
+    Returns:
+        Tuple of (summaries, cursor for the next page or None on the last page)
+    """
+    if sort_key not in SORT_KEYS:
+        raise ValueError(f"Cannot sort history by: {sort_key}")
+    
+    direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+    query = f"SELECT {SUMMARY_COLUMNS}, rowid FROM extractions"
+    params = []
+    if cursor:
+        query += f" WHERE ({sort_key}, rowid) {comparison} (?, ?)"
+        params.extend(cursor)
+    query += f" ORDER BY {sort_key} {direction}, rowid {direction} LIMIT ?"
+    params.append(page_size + 1)
+    
+    with closing(get_connection()) as conn:
+        rows = [dict(row) for row in conn.execute(query, params)]
+    
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = [rows[-1][sort_key], rows[-1]['rowid']]
+    for row in rows:
+        del row['rowid']
     
-    return extractions
+    return rows, next_cursor
+
+def _fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching every word (stemmed, so "terminate" finds "termination")"""
+    words = re.findall(r'\w+', text)
+    return " ".join(f'"{word}"' for word in words)
+
+def search_extractions(query: str = "", ranges: Optional[Dict[str, tuple]] = None,
+                       limit: int = 50) -> List[Dict]:
+    """
+    Full-text and range search over every extracted field and citation
+    
+    Args:
+        query: Free text; every word must appear in a field value or a _source
+            citation (e.g. "early termination")
+        ranges: Field -> (minimum, maximum) filters, either bound may be None,
+            e.g. {'monthly_rent': (2000, None), 'lease_end_date': ('2025-01-01', '2025-12-31')}
+        limit: Maximum number of results
+    
+    Returns:
+        Extraction summaries, best match first, with 'rank' and a 'snippet'
+        of the matching text
+    """
+    conditions = []
+    params = []
+    
+    for field, (minimum, maximum) in (ranges or {}).items():
+        if field not in RANGE_FIELDS + ['lease_start_date', 'lease_end_date', 'timestamp']:
+            raise ValueError(f"Cannot filter on field: {field}")
+        expression = f"extractions.{field}"
+        if minimum is not None:
+            conditions.append(f"{expression} >= ?")
+            params.append(minimum)
+        if maximum is not None:
+            conditions.append(f"{expression} <= ?")
+            params.append(maximum)
+        if field.endswith('_date'):
+            # Leases without a date do not fall into any date range
+            conditions.append(f"{expression} != ''")
+    
+    columns = ", ".join(f"extractions.{column.strip()}" for column in SUMMARY_COLUMNS.split(","))
+    fts_query = _fts_query(query)
+    if fts_query:
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        sql = (f"SELECT {columns}, bm25(extractions_fts, {weights}) AS rank, "
+               f"snippet(extractions_fts, -1, '[', ']', '…', 12) AS snippet "
+               f"FROM extractions_fts JOIN extractions ON extractions.rowid = extractions_fts.rowid "
+               f"WHERE extractions_fts MATCH ?")
+        params.insert(0, fts_query)
+        order = "rank, extractions.timestamp DESC"
+    else:
+        sql = f"SELECT {columns}, 0.0 AS rank, '' AS snippet FROM extractions WHERE 1"
+        order = "extractions.timestamp DESC, extractions.rowid DESC"
+    
+    for condition in conditions:
+        sql += f" AND {condition}"
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    
+    with closing(get_connection()) as conn:
+        return [dict(row) for row in conn.execute(sql, params)]
 
 def delete_extraction(extraction_id: str) -> bool:
     """
@@ -142,29 +999,14 @@ def delete_extraction(extraction_id: str) -> bool:
     
     Args:
         extraction_id: Extraction ID
-        
+    
     Returns:
         True if deleted successfully
     """
-    ensure_history_dir()
-    
-    # Delete extraction file
-    extraction_file = os.path.join(HISTORY_DIR, f"{extraction_id}.json")
-    if os.path.exists(extraction_file):
-        os.remove(extraction_file)
+    with write_transaction() as conn:
+        conn.execute("DELETE FROM extractions WHERE id = ?", (extraction_id,))
     
-    # Update index
-    if os.path.exists(INDEX_FILE):
-        with open(INDEX_FILE, 'r') as f:
-            index = json.load(f)
-        
-        index["extractions"] = [
-            e for e in index["extractions"]
-            if e["id"] != extraction_id
-        ]
-        
-        with open(INDEX_FILE, 'w') as f:
-            json.dump(index, f, indent=2)
+    _refresh_snapshot(deleted_ids=[extraction_id])
     
     return True
 
@@ -175,17 +1017,18 @@ def clear_all_history() -> bool:
     Returns:
         True if cleared successfully
     """
-    ensure_history_dir()
+    with write_transaction() as conn:
+        conn.execute("DELETE FROM extractions")
     
-    # Delete all extraction files
+    # Delete archive segments, the analytics snapshot and legacy extraction
+    # and similarity index files
+    shutil.rmtree(ARCHIVE_DIR, ignore_errors=True)
+    from .portfolio_snapshot import invalidate_snapshot
+    invalidate_snapshot()
     for filename in os.listdir(HISTORY_DIR):
-        if filename.endswith('.json') and filename != 'index.json':
+        if filename.endswith('.json') and filename != os.path.basename(RETENTION_FILE):
             os.remove(os.path.join(HISTORY_DIR, filename))
     
-    # Reset index
-    with open(INDEX_FILE, 'w') as f:
-        json.dump({"extractions": []}, f)
-    
     return True
 
 def get_extraction_count() -> int:
@@ -195,12 +1038,5 @@ def get_extraction_count() -> int:
     Returns:
         Number of extractions
     """
-    ensure_history_dir()
-    
-    if not os.path.exists(INDEX_FILE):
-        return 0
-    
-    with open(INDEX_FILE, 'r') as f:
-        index = json.load(f)
-    
-    return len(index.get("extractions", []))
+    with closing(get_connection()) as conn:
+        return conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
@@ -0,0 +1,203 @@
+"""
+Incremental Export Module
+Tracks an export watermark per target and exports only new or changed leases
+"""
+
+import io
+import os
+import csv
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .export_generator import export_filename, write_yardi_excel
+from .flat_export import FLAT_EXPORT_PROFILE, write_yardi_csv, write_yardi_parquet
+from .yardi_profiles import DEFAULT_PROFILE, get_profile, load_profile, map_batch
+from .file_locks import atomic_write_json, file_lock
+from .history_manager import iter_changed_extractions
+
+WATERMARK_FILE = os.path.join("exports", "watermarks.json")
+
+DELTA_FORMATS = ("csv", "xlsx", "parquet")
+
+def load_watermarks() -> Dict:
+    """Load the export watermarks of all targets"""
+    if not os.path.exists(WATERMARK_FILE):
+        return {}
+
+    with open(WATERMARK_FILE, 'r') as f:
+        return json.load(f)
+
+def get_watermark(target: str) -> Dict:
+    """
+    Get the export watermark of one target
+
+    Returns:
+        Dictionary with 'exported_at', 'high_water_timestamp' (change time of
+        the newest exported lease) and 'boundary_ids' (leases exported with
+        exactly that change time); empty for a new target
+    """
+    return load_watermarks().get(target, {"exported_at": None, "high_water_timestamp": "", "boundary_ids": []})
+
+def save_watermark(target: str, watermark: Dict) -> None:
+    """Persist one target's watermark"""
+    # Locked read-modify-write, so concurrent exports to other targets are not lost
+    with file_lock(WATERMARK_FILE):
+        watermarks = load_watermarks()
+        watermarks[target] = watermark
+        atomic_write_json(WATERMARK_FILE, watermarks)
+
+def reset_watermark(target: str) -> None:
+    """Forget a target's watermark so the next export is a full export"""
+    with file_lock(WATERMARK_FILE):
+        watermarks = load_watermarks()
+        if watermarks.pop(target, None) is not None:
+            atomic_write_json(WATERMARK_FILE, watermarks)
+
+def select_changed_records(target: str) -> Tuple[List[Dict], Dict]:
+    """
+    Select leases created or edited since the target's last successful export
+
+    Only history records changed at or after the high-water timestamp are
+    read, so the cost of a sync follows the volume of changes. Timestamps
+    have a resolution of one second, so the IDs already exported at the
+    high-water timestamp itself are kept and skipped.
+
+    Args:
+        target: Name of the sync target (e.g. "nightly_yardi")
+
+    Returns:
+        Tuple of (changed records, updated watermark to save once the delta is written)
+    """
+    watermark = get_watermark(target)
+    previous_high_water = watermark.get("high_water_timestamp", "")
+    exported_at_boundary = set(watermark.get("boundary_ids", []))
+    high_water = previous_high_water
+    boundary_ids = set(exported_at_boundary)
+
+    changed = []
+    for changed_at, extraction in iter_changed_extractions(previous_high_water):
+        if changed_at == previous_high_water and extraction['id'] in exported_at_boundary:
+            continue
+        changed.append(extraction)
+        if changed_at > high_water:
+            high_water = changed_at
+            boundary_ids = set()
+        boundary_ids.add(extraction['id'])
+
+    updated = {
+        "exported_at": datetime.now().isoformat(),
+        "high_water_timestamp": high_water,
+        "boundary_ids": sorted(boundary_ids)
+    }
+    return changed, updated
+
+def _key_positions(profile: str) -> Tuple[int, int]:
+    """Column positions of SourceFile and LeaseNumber, which identify a row (as in the re-importer)"""
+    fields = [column['field'] for column in load_profile(profile)['columns']]
+    if '@filename' not in fields or 'lease_number' not in fields:
+        raise ValueError(f"Profile {profile} has no SourceFile/LeaseNumber columns to match rows on")
+    return fields.index('@filename'), fields.index('lease_number')
+
+def _row_key(row, positions: Tuple[int, int]) -> Tuple[str, ...]:
+    return tuple('' if row[idx] is None else str(row[idx]).strip() for idx in positions)
+
+def _append_rows(changed: List[Dict], append_to: str, profile: Optional[str]) -> None:
+    """
+    Merge delta rows into an existing CSV or xlsx target, creating it if missing
+
+    Rows already in the target for the same SourceFile and LeaseNumber are
+    replaced in place; other delta rows are appended.
+    """
+    extension = os.path.splitext(append_to)[1].lower()
+    if extension not in (".csv", ".xlsx"):
+        raise ValueError(f"Can only append to .csv or .xlsx targets, got: {append_to}")
+
+    profile = profile or (FLAT_EXPORT_PROFILE if extension == ".csv" else DEFAULT_PROFILE)
+    if not os.path.exists(append_to) or os.path.getsize(append_to) == 0:
+        if extension == ".csv":
+            write_yardi_csv(changed, append_to, profile=profile)
+        else:
+            write_yardi_excel(changed, append_to, profile)
+        return
+
+    positions = _key_positions(profile)
+
+    if extension == ".csv":
+        # Format the new rows exactly as the CSV writer does, then stream the
+        # target through a temp file, swapping in replacements as they come
+        buffer = io.StringIO()
+        write_yardi_csv(changed, buffer, include_header=False, profile=profile)
+        replacements = {_row_key(row, positions): row for row in csv.reader(io.StringIO(buffer.getvalue()))}
+
+        tmp_path = append_to + ".tmp"
+        with open(append_to, 'r', newline='', encoding='utf-8') as source, \
+                open(tmp_path, 'w', newline='', encoding='utf-8') as target:
+            writer = csv.writer(target)
+            for row_number, row in enumerate(csv.reader(source)):
+                if row_number > 0 and len(row) > max(positions):
+                    row = replacements.pop(_row_key(row, positions), row)
+                writer.writerow(row)
+            writer.writerows(replacements.values())
+        os.replace(tmp_path, append_to)
+    else:
+        from openpyxl import load_workbook
+
+        replacements = {_row_key(values, positions): values for values in map_batch(get_profile(profile), changed)}
+        wb = load_workbook(append_to)
+        ws = wb.active
+        for row in ws.iter_rows(min_row=2):
+            values = replacements.pop(_row_key([cell.value for cell in row], positions), None)
+            if values is not None:
+                for cell, value in zip(row, values):
+                    cell.value = value
+        for values in replacements.values():
+            ws.append(list(values))
+        wb.save(append_to)
+
+def export_yardi_delta(target: str, output_dir: str = "exports",
+                       fmt: str = "csv", append_to: Optional[str] = None,
+                       profile: Optional[str] = None) -> Optional[str]:
+    """
+    Export only history leases that are new or changed since the target's last export
+
+    The watermark is advanced only after the delta has been written, so a
+    failed export is retried in full on the next run. When appending, rows
+    for edited leases replace the rows exported for them earlier (matched by
+    SourceFile and LeaseNumber).
+
+    Args:
+        target: Name of the sync target whose watermark is used
+        output_dir: Directory for the delta file
+        fmt: Delta file format ("csv", "xlsx" or "parquet")
+        append_to: Existing .csv or .xlsx file to append delta rows to instead
+            of writing a separate delta file
+        profile: Yardi mapping profile (defaults to the ETL layout for flat
+            files and the standard layout for xlsx)
+
+    Returns:
+        Path of the written delta (or appended) file, or None if nothing changed
+    """
+    changed, updated_watermark = select_changed_records(target)
+    if not changed:
+        return None
+
+    if append_to:
+        _append_rows(changed, append_to, profile)
+        filepath = append_to
+    else:
+        if fmt not in DELTA_FORMATS:
+            raise ValueError(f"Unknown delta format: {fmt}")
+
+        os.makedirs(output_dir, exist_ok=True)
+        filepath = os.path.join(output_dir, export_filename(f"yardi_delta_{target}", fmt))
+        if fmt == "csv":
+            write_yardi_csv(changed, filepath, profile=profile or FLAT_EXPORT_PROFILE)
+        elif fmt == "parquet":
+            write_yardi_parquet(changed, filepath, profile=profile or FLAT_EXPORT_PROFILE)
+        else:
+            write_yardi_excel(changed, filepath, profile or DEFAULT_PROFILE)
+
+    save_watermark(target, updated_watermark)
+
+    return filepath
@@ -0,0 +1,95 @@
+"""
+Extraction Metrics Module
+Stores per-call token, cost and latency metrics and aggregates them for analysis
+"""
+
+import os
+import json
+from typing import Dict
+import pandas as pd
+
+METRICS_DIR = "metrics"
+METRICS_FILE = os.path.join(METRICS_DIR, "extraction_metrics.jsonl")
+
+# Document size buckets (characters of lease text) used by the size view
+SIZE_BUCKETS = [0, 5000, 10000, 20000, 50000, float('inf')]
+SIZE_LABELS = ['<5k', '5k-10k', '10k-20k', '20k-50k', '50k+']
+
+def record_extraction_metrics(metrics: Dict) -> None:
+    """
+    Append one extraction call's metrics to the local metrics store
+
+    Args:
+        metrics: Metrics dictionary produced by the AI extractor
+    """
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(METRICS_FILE, 'a') as f:
+        f.write(json.dumps(metrics) + "\n")
+
+def load_extraction_metrics() -> pd.DataFrame:
+    """
+    Load all recorded extraction metrics
+
+    Returns:
+        DataFrame with one row per extraction call (empty if nothing recorded)
+    """
+    if not os.path.exists(METRICS_FILE) or os.path.getsize(METRICS_FILE) == 0:
+        return pd.DataFrame()
+
+    metrics = pd.read_json(METRICS_FILE, lines=True, dtype={'batch_id': str})
+    # Rows written before failed calls were recorded are all successful calls
+    metrics['status'] = metrics['status'].fillna('ok') if 'status' in metrics else 'ok'
+    metrics['size_bucket'] = pd.cut(metrics['document_chars'], bins=SIZE_BUCKETS, labels=SIZE_LABELS, right=False)
+    return metrics
+
+def summarize_metrics(group_by: str = 'batch_id', metrics: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Aggregate extraction metrics by batch, model or document size
+
+    Args:
+        group_by: Column to group by ('batch_id', 'model' or 'size_bucket')
+        metrics: Metrics to aggregate (defaults to the whole metrics store)
+
+    Returns:
+        DataFrame with call and error counts, token totals, cost and latency percentiles per group
+    """
+    if metrics is None:
+        metrics = load_extraction_metrics()
+    if metrics.empty:
+        return pd.DataFrame()
+
+    grouped = metrics.groupby(group_by, observed=True)
+    summary = grouped.agg(
+        calls=('model', 'size'),
+        errors=('status', lambda s: int((s == 'error').sum())),
+        prompt_tokens=('prompt_tokens', 'sum'),
+        completion_tokens=('completion_tokens', 'sum'),
+        cached_tokens=('cached_tokens', 'sum'),
+        total_cost=('estimated_cost', 'sum'),
+        mean_cost=('estimated_cost', 'mean'),
+        mean_latency=('total_latency', 'mean'),
+        p95_latency=('total_latency', lambda s: s.quantile(0.95)),
+        mean_time_to_first_token=('time_to_first_token', 'mean'),
+    )
+    return summary.sort_values('total_cost', ascending=False)
+
+def find_outliers(column: str = 'estimated_cost', quantile: float = 0.95,
+                  metrics: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Find the extraction calls above a quantile of cost or latency
+
+    Args:
+        column: Metric to rank by (e.g. 'estimated_cost', 'total_latency')
+        quantile: Calls above this quantile are returned
+        metrics: Metrics to search (defaults to the whole metrics store)
+
+    Returns:
+        Outlier calls sorted from worst to best
+    """
+    if metrics is None:
+        metrics = load_extraction_metrics()
+    if metrics.empty:
+        return metrics
+
+    threshold = metrics[column].quantile(quantile)
+    return metrics[metrics[column] > threshold].sort_values(column, ascending=False)
@@ -5,31 +5,31 @@ Handles text extraction from PDF files with OCR fallback for scanned documents
 
 import pdfplumber
 import os
-from typing import Optional
+from typing import List, Optional
 
-def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
+def extract_pages_from_pdf(pdf_path: str) -> Optional[List[str]]:
     """
-    Extract text from a PDF file
+    Extract text from a PDF file page by page
     
     Args:
         pdf_path: Path to the PDF file
         
     Returns:
-        Extracted text as string, or None if extraction fails
+        List with the text of every page ('' for blank or image-only pages, so
+        pages[n - 1] is page n), or None if extraction fails
     """
     try:
-        text = ""
+        pages = []
         
         # Try extracting text using pdfplumber
         with pdfplumber.open(pdf_path) as pdf:
             for page in pdf.pages:
                 page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
+                pages.append(page_text or '')
         
         # Check if we got meaningful text
-        if text.strip():
-            return text.strip()
+        if any(page.strip() for page in pages):
+            return pages
         
         # If no text extracted, the PDF might be scanned
         # In a production environment, you would use OCR here
@@ -40,6 +40,22 @@ def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
         print(f"Error extracting text from PDF: {str(e)}")
         return None
 
+def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
+    """
+    Extract text from a PDF file
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        Extracted text as string, or None if extraction fails
+    """
+    pages = extract_pages_from_pdf(pdf_path)
+    if not pages:
+        return None
+    
+    return "\n\n".join(page for page in pages if page).strip()
+
 def extract_text_with_ocr(pdf_path: str) -> Optional[str]:
     """
     Extract text from scanned PDF using OCR
@@ -0,0 +1,364 @@
+"""
+Portfolio Snapshot Module
+Keeps a columnar (Parquet) copy of every lease's typed fields for fast portfolio analytics
+"""
+
+import os
+import time
+import shutil
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+from .data_normalizer import (
+    CURRENCY_FIELDS, PERCENTAGE_FIELDS, NUMERIC_FIELDS, DATE_FIELDS, BOOLEAN_FIELDS,
+    _empty_mask, parse_currency_column, parse_percentage_column, parse_numeric_column,
+    parse_date_column, parse_boolean_column
+)
+from .file_locks import file_lock
+
+SNAPSHOT_DIR = os.path.join("history", "snapshot")
+BASE_FILE = os.path.join(SNAPSHOT_DIR, "base.parquet")
+
+# Text fields kept alongside the typed numeric, date and boolean fields
+STRING_FIELDS = [
+    'tenant_name', 'property_address', 'unit_number', 'property_type',
+    'lease_number', 'lease_type', 'late_fee_type', 'renewal_options'
+]
+
+# Every save or edit appends one small part file; parts are merged into the
+# base file once there are this many
+MAX_PARTS = 64
+
+# (snapshot directory) -> (file listing with mtimes, combined frame)
+_snapshot_cache = {}
+_snapshot_cache_lock = threading.Lock()
+
+def snapshot_schema():
+    """Arrow schema of the snapshot files"""
+    import pyarrow as pa
+
+    return pa.schema(
+        [('id', pa.string()), ('timestamp', pa.timestamp('s')), ('filename', pa.string()),
+         ('version', pa.int64()), ('deleted', pa.bool_())] +
+        [(field, pa.float64()) for field in CURRENCY_FIELDS + PERCENTAGE_FIELDS + NUMERIC_FIELDS] +
+        [(field, pa.timestamp('s')) for field in DATE_FIELDS] +
+        [(field, pa.bool_()) for field in BOOLEAN_FIELDS] +
+        [(field, pa.string()) for field in STRING_FIELDS] +
+        [('confidence_score', pa.float64())]
+    )
+
+def build_snapshot_frame(extractions: Iterable[Dict]) -> pd.DataFrame:
+    """
+    Convert history records into typed snapshot columns
+
+    Unlike normalize_lease_batch, missing or unparseable values stay NaN/NaT
+    instead of falling back to defaults, so they do not skew averages.
+
+    Args:
+        extractions: History records (with 'id', 'timestamp', 'filename', 'version'
+            and 'data'); unsaved documents only need 'data'
+
+    Returns:
+        DataFrame with one row per record
+    """
+    typed_fields = CURRENCY_FIELDS + PERCENTAGE_FIELDS + NUMERIC_FIELDS + DATE_FIELDS + BOOLEAN_FIELDS
+    records = [
+        {
+            'id': extraction.get('id', ''),
+            'timestamp': extraction.get('timestamp'),
+            'filename': extraction.get('filename', ''),
+            'version': extraction.get('version', 1),
+            **{field: extraction['data'].get(field) for field in typed_fields + STRING_FIELDS + ['confidence_score']}
+        }
+        for extraction in extractions
+    ]
+    frame = pd.DataFrame.from_records(records, columns=['id', 'timestamp', 'filename', 'version'] +
+                                      typed_fields + STRING_FIELDS + ['confidence_score'])
+
+    def raw(field):
+        column = frame[field].astype(object)
+        return column.where(~_empty_mask(column))
+
+    for fields, parser in ((CURRENCY_FIELDS, parse_currency_column),
+                           (PERCENTAGE_FIELDS, parse_percentage_column),
+                           (NUMERIC_FIELDS, parse_numeric_column)):
+        for field in fields:
+            frame[field] = parser(raw(field)).astype(float)
+
+    for field in DATE_FIELDS:
+        frame[field] = pd.to_datetime(parse_date_column(raw(field)), format='%Y-%m-%d', errors='coerce')
+
+    for field in BOOLEAN_FIELDS:
+        frame[field] = parse_boolean_column(raw(field)).astype('boolean')
+
+    for field in STRING_FIELDS + ['filename']:
+        frame[field] = frame[field].where(frame[field].notna(), '').astype(str)
+
+    frame['confidence_score'] = pd.to_numeric(raw('confidence_score'), errors='coerce')
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    frame['version'] = frame['version'].fillna(1).astype('int64')
+    frame['deleted'] = False
+    return frame
+
+def _write_part(frame: pd.DataFrame) -> None:
+    """Write rows as a new part file (temp file + rename, so readers never see a partial part)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("The portfolio snapshot requires pyarrow (pip install pyarrow)")
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    # Names sort by write time; the version column orders concurrent writers
+    path = os.path.join(SNAPSHOT_DIR, f"part-{time.time_ns():020d}-{os.getpid()}.parquet")
+    table = pa.Table.from_pandas(frame, schema=snapshot_schema(), preserve_index=False)
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+def append_to_snapshot(extractions: List[Dict]) -> None:
+    """
+    Add new or edited records to the snapshot
+
+    Args:
+        extractions: Full history records as saved
+    """
+    if not extractions:
+        return
+    if not os.path.exists(SNAPSHOT_DIR):
+        # Never built: the next read rebuilds it from history, including these
+        return
+    _write_part(build_snapshot_frame(extractions))
+    _compact_if_needed()
+
+def remove_from_snapshot(extraction_ids: List[str]) -> None:
+    """
+    Mark deleted records so they drop out of the snapshot
+
+    Args:
+        extraction_ids: IDs of deleted extractions
+    """
+    if not extraction_ids or not os.path.exists(SNAPSHOT_DIR):
+        return
+    frame = build_snapshot_frame([])
+    frame = frame.reindex(range(len(extraction_ids)))
+    frame['id'] = list(extraction_ids)
+    frame['version'] = 0
+    frame['deleted'] = True
+    _write_part(frame)
+    _compact_if_needed()
+
+def invalidate_snapshot() -> None:
+    """Drop the snapshot so it is rebuilt from history on the next read"""
+    with file_lock(SNAPSHOT_DIR):
+        shutil.rmtree(SNAPSHOT_DIR, ignore_errors=True)
+
+def _list_files() -> List[str]:
+    names = sorted(name for name in os.listdir(SNAPSHOT_DIR) if name.startswith('part-') and name.endswith('.parquet'))
+    if os.path.exists(BASE_FILE):
+        names.insert(0, os.path.basename(BASE_FILE))
+    return names
+
+def _combine(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Keep the newest version of each lease and drop deleted ones"""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return build_snapshot_frame([]).drop(columns='deleted')
+
+    combined = pd.concat(frames, ignore_index=True)
+    deleted = combined.loc[combined['deleted'], 'id']
+    combined = combined[~combined['id'].isin(deleted)]
+    # Stable sort keeps file order among equal versions
+    combined = combined.sort_values('version', kind='stable').drop_duplicates('id', keep='last')
+    return combined.drop(columns='deleted').sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+def _read_files(names: List[str]) -> List[pd.DataFrame]:
+    import pyarrow.parquet as pq
+
+    return [pq.read_table(os.path.join(SNAPSHOT_DIR, name)).to_pandas() for name in names]
+
+def _compact_if_needed() -> None:
+    """Merge the base file and all parts into a new base file once there are too many parts"""
+    if len(_list_files()) <= MAX_PARTS:
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with file_lock(SNAPSHOT_DIR):
+        names = _list_files()
+        if len(names) <= MAX_PARTS:
+            return
+        combined = _combine(_read_files(names))
+        combined['deleted'] = False
+        pq.write_table(pa.Table.from_pandas(combined, schema=snapshot_schema(), preserve_index=False),
+                       BASE_FILE + ".tmp")
+        os.replace(BASE_FILE + ".tmp", BASE_FILE)
+        # Only parts that were merged are removed; newer ones stay
+        for name in names:
+            if name != os.path.basename(BASE_FILE):
+                os.remove(os.path.join(SNAPSHOT_DIR, name))
+
+def rebuild_snapshot() -> int:
+    """
+    Rebuild the snapshot from every record in history
+
+    Returns:
+        Number of leases in the snapshot
+    """
+    from .history_manager import iter_extractions
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("The portfolio snapshot requires pyarrow (pip install pyarrow)")
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with file_lock(SNAPSHOT_DIR):
+        names = _list_files()
+        frame = build_snapshot_frame(iter_extractions())
+        pq.write_table(pa.Table.from_pandas(frame, schema=snapshot_schema(), preserve_index=False),
+                       BASE_FILE + ".tmp")
+        os.replace(BASE_FILE + ".tmp", BASE_FILE)
+        for name in names:
+            if name != os.path.basename(BASE_FILE):
+                os.remove(os.path.join(SNAPSHOT_DIR, name))
+
+    return len(frame)
+
+def load_snapshot() -> pd.DataFrame:
+    """
+    Load the typed snapshot of all leases in history
+
+    The combined frame is cached until a part or the base file changes, so
+    repeated dashboard reruns do not re-read Parquet.
+
+    Returns:
+        DataFrame with one row per lease (do not modify in place)
+    """
+    import pyarrow.parquet as pq
+
+    # Also rebuild snapshots written before a column was added
+    if not os.path.exists(BASE_FILE) or pq.read_schema(BASE_FILE).names != snapshot_schema().names:
+        rebuild_snapshot()
+
+    for attempt in range(3):
+        try:
+            names = _list_files()
+            listing = tuple((name, os.path.getmtime(os.path.join(SNAPSHOT_DIR, name))) for name in names)
+            with _snapshot_cache_lock:
+                cached = _snapshot_cache.get(os.path.abspath(SNAPSHOT_DIR))
+            if cached is not None and cached[0] == listing:
+                return cached[1]
+
+            frame = _combine(_read_files(names))
+            with _snapshot_cache_lock:
+                _snapshot_cache[os.path.abspath(SNAPSHOT_DIR)] = (listing, frame)
+            return frame
+        except FileNotFoundError:
+            # A compaction removed parts while they were being listed
+            if attempt == 2:
+                raise
+
+def _as_of(as_of: Optional[date]) -> pd.Timestamp:
+    return pd.Timestamp(as_of or date.today())
+
+def active_leases(frame: pd.DataFrame, as_of: Optional[date] = None) -> pd.Series:
+    """Mask of leases in effect on a date (open-ended when a date is missing)"""
+    as_of = _as_of(as_of)
+    starts = frame['lease_start_date'].to_numpy(dtype='datetime64[s]')
+    ends = frame['lease_end_date'].to_numpy(dtype='datetime64[s]')
+    day = np.datetime64(as_of, 's')
+    started = np.isnat(starts) | (starts <= day)
+    not_ended = np.isnat(ends) | (ends >= day)
+    return pd.Series(started & not_ended, index=frame.index)
+
+def portfolio_summary(as_of: Optional[date] = None, frame: Optional[pd.DataFrame] = None) -> Dict:
+    """
+    Headline portfolio figures
+
+    Args:
+        as_of: Date the rent roll is taken on (defaults to today)
+        frame: Snapshot to use (defaults to load_snapshot())
+
+    Returns:
+        Dictionary with 'leases', 'active_leases', 'monthly_rent_roll',
+        'annual_rent_roll', 'average_rent', 'average_deposit',
+        'total_square_footage' and 'rent_per_square_foot'
+    """
+    if frame is None:
+        frame = load_snapshot()
+    active = frame[active_leases(frame, as_of)]
+    rent = active['monthly_rent'].to_numpy()
+    square_feet = np.nansum(active['square_footage'].to_numpy())
+    rent_roll = float(np.nansum(rent))
+
+    return {
+        "leases": len(frame),
+        "active_leases": len(active),
+        "monthly_rent_roll": rent_roll,
+        "annual_rent_roll": rent_roll * 12,
+        "average_rent": float(np.nanmean(rent)) if np.isfinite(rent).any() else 0.0,
+        "average_deposit": float(frame['security_deposit'].mean()) if frame['security_deposit'].notna().any() else 0.0,
+        "total_square_footage": float(square_feet),
+        "rent_per_square_foot": float(rent_roll * 12 / square_feet) if square_feet else 0.0,
+    }
+
+def rent_roll(as_of: Optional[date] = None, group_by: str = 'property_address',
+              frame: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Rent roll of the leases in effect on a date, grouped by a column
+
+    Args:
+        as_of: Date the rent roll is taken on (defaults to today)
+        group_by: Snapshot column to group by (e.g. 'property_address', 'property_type')
+        frame: Snapshot to use (defaults to load_snapshot())
+
+    Returns:
+        DataFrame with leases, monthly and annual rent, average deposit and square footage per group
+    """
+    if frame is None:
+        frame = load_snapshot()
+    active = frame[active_leases(frame, as_of)]
+
+    grouped = active.groupby(group_by, sort=False)
+    summary = grouped.agg(
+        leases=('id', 'size'),
+        monthly_rent=('monthly_rent', 'sum'),
+        average_deposit=('security_deposit', 'mean'),
+        square_footage=('square_footage', 'sum'),
+    )
+    summary['annual_rent'] = summary['monthly_rent'] * 12
+    return summary.sort_values('monthly_rent', ascending=False)
+
+def expirations_by_quarter(start: Optional[date] = None, quarters: int = 8,
+                           frame: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Count leases and rent expiring in each calendar quarter
+
+    Args:
+        start: First day to count from (defaults to today)
+        quarters: Number of quarters, starting with the one containing start
+        frame: Snapshot to use (defaults to load_snapshot())
+
+    Returns:
+        DataFrame indexed by quarter (e.g. "2025Q3") with 'leases' and 'monthly_rent',
+        including quarters with no expirations
+    """
+    if frame is None:
+        frame = load_snapshot()
+    start = _as_of(start)
+    periods = pd.period_range(start.to_period('Q'), periods=quarters, freq='Q')
+
+    ends = frame['lease_end_date']
+    expiring = frame[(ends >= start) & (ends <= periods[-1].end_time)]
+    quarter = expiring['lease_end_date'].dt.to_period('Q')
+
+    summary = expiring.groupby(quarter).agg(leases=('id', 'size'), monthly_rent=('monthly_rent', 'sum'))
+    summary = summary.reindex(periods, fill_value=0)
+    summary.index = summary.index.astype(str)
+    summary.index.name = 'quarter'
+    return summary
@@ -0,0 +1,249 @@
+"""
+Rent Projection Module
+Projects rent rolls, expirations and renewal exposure month by month across a portfolio
+"""
+
+from datetime import date
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+from .portfolio_snapshot import build_snapshot_frame
+
+# Leases are projected in chunks of this many rows to bound the size of the
+# (leases x months) arrays
+PROJECTION_CHUNK_SIZE = 8192
+
+# Month index used for a missing start (already running) or end (open-ended) date
+OPEN_START = np.iinfo(np.int64).min // 2
+OPEN_END = np.iinfo(np.int64).max // 2
+
+# Renewal term assumed when the clause grants an option without stating its length
+DEFAULT_RENEWAL_TERM_MONTHS = 12
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+    'a': 1, 'an': 1, 'single': 1,
+}
+
+_NUMBER = r'(\d+|' + '|'.join(NUMBER_WORDS) + r')(?:\s*\(\d+\))?'
+# Only options to renew or extend count; "option to purchase" is not a renewal
+OPTION_COUNT_PATTERN = (r'(?i)\b' + _NUMBER + r'\s+(?:additional\s+|successive\s+|consecutive\s+)?'
+                        r'(?:(?:renewal|extension)\s+options?\b|options?\s+to\s+(?:renew|extend))')
+OPTION_TERM_PATTERN = r'(?i)\b' + _NUMBER + r'[\s-]+(years?|months?)\b'
+NO_OPTION_PATTERN = r'(?i)^\s*(?:none|no|n/a|not found in document|no renewal options?)?\s*\.?\s*$'
+
+def _number_column(raw: pd.Series) -> pd.Series:
+    """Convert extracted digits or number words to floats"""
+    words = raw.str.lower().map(NUMBER_WORDS)
+    return pd.to_numeric(raw, errors='coerce').fillna(words)
+
+def parse_renewal_options(raw: pd.Series) -> pd.DataFrame:
+    """
+    Read the number and length of renewal options from renewal clauses
+
+    Handles phrasings such as "Two (2) options to renew for five (5) years
+    each" or "one 12-month renewal option". Only clauses that mention renewal
+    or extension count, so an option to purchase is not a renewal. A clause
+    without a count is one option; without a length, DEFAULT_RENEWAL_TERM_MONTHS.
+
+    Args:
+        raw: Column of renewal_options text
+
+    Returns:
+        DataFrame with integer 'renewal_count' and 'renewal_term_months' columns
+    """
+    text = raw.where(raw.notna(), '').astype(str)
+    has_options = ~text.str.match(NO_OPTION_PATTERN) & text.str.contains(r'(?i)renew|extend|extension')
+
+    count = _number_column(text.str.extract(OPTION_COUNT_PATTERN)[0]).fillna(1)
+    term = text.str.extract(OPTION_TERM_PATTERN)
+    term_months = _number_column(term[0]) * np.where(term[1].str.lower().str.startswith('year'), 12, 1)
+    term_months = term_months.fillna(DEFAULT_RENEWAL_TERM_MONTHS)
+
+    return pd.DataFrame({
+        'renewal_count': np.where(has_options, count, 0).astype(np.int64),
+        'renewal_term_months': np.where(has_options, term_months, 0).astype(np.int64),
+    }, index=raw.index)
+
+def _month_index(dates: pd.Series, missing: int) -> np.ndarray:
+    """Months since year 0 (year * 12 + month - 1), with a sentinel for missing dates"""
+    index = (dates.dt.year * 12 + dates.dt.month - 1).fillna(0).to_numpy(dtype=np.int64)
+    # The sentinel is applied after the int conversion; it does not survive a float round trip
+    return np.where(dates.isna().to_numpy(), missing, index)
+
+def _lease_frame(leases: Union[pd.DataFrame, List[Dict]]) -> pd.DataFrame:
+    """Snapshot frame for a frame, documents with 'data' or bare lease data dictionaries"""
+    if isinstance(leases, pd.DataFrame):
+        return leases
+    return build_snapshot_frame(lease if 'data' in lease else {'data': lease} for lease in leases)
+
+def build_lease_arrays(leases: Union[pd.DataFrame, List[Dict]]) -> Dict[str, np.ndarray]:
+    """
+    Build the NumPy arrays the projection runs on
+
+    A missing end date is derived from the start date and lease_term_months
+    when both are known; otherwise the lease is treated as open-ended.
+
+    Args:
+        leases: Portfolio snapshot frame (see load_snapshot), a list of
+            documents/history records with 'data', or a list of dictionaries
+            containing extracted lease data
+
+    Returns:
+        Dictionary of equal-length arrays: 'start' and 'end' (month indexes,
+        inclusive), 'rent', 'renewal_count' and 'renewal_term'
+    """
+    frame = _lease_frame(leases)
+
+    start = _month_index(frame['lease_start_date'], OPEN_START)
+    end = _month_index(frame['lease_end_date'], OPEN_END)
+    term = frame['lease_term_months'].fillna(0).to_numpy(dtype=np.int64)
+    derived = (end == OPEN_END) & (start != OPEN_START) & (term > 0)
+    end = np.where(derived, start + term - 1, end)
+
+    renewals = parse_renewal_options(frame['renewal_options'] if 'renewal_options' in frame
+                                     else pd.Series('', index=frame.index))
+    return {
+        'start': start,
+        'end': end,
+        'rent': frame['monthly_rent'].fillna(0).to_numpy(dtype=np.float64),
+        'renewal_count': renewals['renewal_count'].to_numpy(),
+        'renewal_term': renewals['renewal_term_months'].to_numpy(),
+    }
+
+def _first_month(start: Optional[date]) -> int:
+    start = start or date.today()
+    return start.year * 12 + start.month - 1
+
+def project_rent_roll(leases: Union[pd.DataFrame, List[Dict]], start: Optional[date] = None,
+                      years: int = 5, annual_escalation: float = 0.0,
+                      renewal_increase: float = 0.0) -> pd.DataFrame:
+    """
+    Project rent and expirations month by month
+
+    All leases are projected at once as (leases x months) arrays, so 50k
+    leases over 10 years take about a second rather than a Python loop per
+    lease and month.
+
+    Args:
+        leases: Portfolio snapshot frame, documents with 'data' or extracted lease data dictionaries
+        start: Any day in the first projected month (defaults to today)
+        years: Number of years to project
+        annual_escalation: Assumed yearly rent increase on each lease
+            anniversary (e.g. 0.03 for 3%)
+        renewal_increase: Assumed rent increase when a renewal option is exercised
+
+    Returns:
+        DataFrame indexed by month ("YYYY-MM") with 'active_leases',
+        'contractual_rent' (under current terms), 'expiring_leases',
+        'expiring_rent' (monthly rent of leases ending that month),
+        'expiring_with_options', 'renewal_rent' (extra rent if every renewal
+        option is exercised) and 'potential_rent'
+    """
+    arrays = build_lease_arrays(leases)
+    first = _first_month(start)
+    months = first + np.arange(years * 12, dtype=np.int64)
+    growth = 1.0 + annual_escalation
+
+    active_leases = np.zeros(len(months), dtype=np.int64)
+    contractual = np.zeros(len(months))
+    renewal = np.zeros(len(months))
+
+    for offset in range(0, len(arrays['rent']), PROJECTION_CHUNK_SIZE):
+        chunk = {name: values[offset:offset + PROJECTION_CHUNK_SIZE, None] for name, values in arrays.items()}
+        lease_start = np.where(chunk['start'] == OPEN_START, first, chunk['start'])
+
+        active = (chunk['start'] <= months) & (months <= chunk['end'])
+        rent = np.broadcast_to(chunk['rent'], active.shape)
+        if annual_escalation:
+            anniversaries = np.maximum((months - lease_start) // 12, 0)
+            rent = rent * np.power(growth, anniversaries)
+        active_leases += active.sum(axis=0)
+        contractual += np.where(active, rent, 0.0).sum(axis=0)
+
+        # Option periods follow the end date back to back
+        option_months = chunk['renewal_count'] * chunk['renewal_term']
+        has_end = chunk['end'] != OPEN_END
+        in_option = has_end & (months > chunk['end']) & (months <= chunk['end'] + option_months)
+        if in_option.any():
+            term = np.maximum(chunk['renewal_term'], 1)
+            option_number = (months - chunk['end'] - 1) // term + 1
+            lease_end = np.where(has_end, chunk['end'], lease_start)
+            final_rent = chunk['rent'] * np.power(growth, np.maximum((lease_end - lease_start) // 12, 0))
+            option_rent = final_rent * np.power(1.0 + renewal_increase, option_number)
+            renewal += np.where(in_option, option_rent, 0.0).sum(axis=0)
+
+    # Expirations are counted straight from the end months
+    ends = arrays['end']
+    expiring = (ends >= months[0]) & (ends <= months[-1])
+    slots = ends[expiring] - first
+    expiring_rent = arrays['rent'][expiring]
+    with_options = arrays['renewal_count'][expiring] > 0
+
+    schedule = pd.DataFrame({
+        'active_leases': active_leases,
+        'contractual_rent': contractual,
+        'expiring_leases': np.bincount(slots, minlength=len(months)),
+        'expiring_rent': np.bincount(slots, weights=expiring_rent, minlength=len(months)),
+        'expiring_with_options': np.bincount(slots, weights=with_options, minlength=len(months)).astype(np.int64),
+        'renewal_rent': renewal,
+    }, index=pd.Index([f"{month // 12:04d}-{month % 12 + 1:02d}" for month in months], name='month'))
+    schedule['potential_rent'] = schedule['contractual_rent'] + schedule['renewal_rent']
+    return schedule
+
+def summarize_projection(schedule: pd.DataFrame) -> pd.DataFrame:
+    """
+    Roll a monthly projection up to calendar years
+
+    Args:
+        schedule: Result of project_rent_roll
+
+    Returns:
+        DataFrame indexed by year with rent totals, expirations and the
+        number of leases active at year end
+    """
+    years = schedule.index.str[:4]
+    yearly = schedule.groupby(years).agg(
+        contractual_rent=('contractual_rent', 'sum'),
+        renewal_rent=('renewal_rent', 'sum'),
+        potential_rent=('potential_rent', 'sum'),
+        expiring_leases=('expiring_leases', 'sum'),
+        expiring_rent=('expiring_rent', 'sum'),
+        expiring_with_options=('expiring_with_options', 'sum'),
+        active_leases_at_year_end=('active_leases', 'last'),
+    )
+    yearly.index.name = 'year'
+    return yearly
+
+def expiration_schedule(leases: Union[pd.DataFrame, List[Dict]], start: Optional[date] = None,
+                        years: int = 5) -> pd.DataFrame:
+    """
+    List the leases that expire within the projection window, soonest first
+
+    Args:
+        leases: Portfolio snapshot frame, documents with 'data' or extracted lease data dictionaries
+        start: Any day in the first month of the window (defaults to today)
+        years: Length of the window in years
+
+    Returns:
+        DataFrame with filename, tenant, property, end date, monthly rent and
+        the parsed renewal options of each expiring lease
+    """
+    frame = _lease_frame(leases)
+    arrays = build_lease_arrays(frame)
+    first = _first_month(start)
+    expiring = (arrays['end'] >= first) & (arrays['end'] < first + years * 12)
+
+    columns = ['filename', 'tenant_name', 'property_address', 'unit_number', 'lease_end_date', 'monthly_rent']
+    expirations = frame.loc[expiring, columns].copy()
+    expirations['renewal_count'] = arrays['renewal_count'][expiring]
+    expirations['renewal_term_months'] = arrays['renewal_term'][expiring]
+    # Derived end dates (start + term) are only known to the month
+    end_months = arrays['end'][expiring]
+    derived = pd.Series([f"{month // 12:04d}-{month % 12 + 1:02d}" for month in end_months], index=expirations.index)
+    expirations['lease_end_date'] = expirations['lease_end_date'].dt.strftime('%Y-%m-%d').fillna(derived)
+    expirations['end_month'] = end_months
+    return expirations.sort_values(['end_month', 'lease_end_date'], kind='stable') \
+        .drop(columns='end_month').reset_index(drop=True)
@@ -0,0 +1,291 @@
+"""
+Report Renderer Module
+Renders lightweight HTML and Markdown lease reference reports with source citations
+"""
+
+import html
+from datetime import datetime
+from string import Template
+from typing import Callable, Dict, List, TextIO, Union
+
+NOT_FOUND_SOURCE = "Not found in document"
+
+REPORT_FORMATS = ("html", "md")
+
+def _money(value) -> str:
+    try:
+        return f"${float(value or 0):,.2f}"
+    except (TypeError, ValueError):
+        return str(value)
+
+def _whole(value) -> str:
+    try:
+        return str(int(float(value or 0)))
+    except (TypeError, ValueError):
+        return str(value)
+
+def _text(value) -> str:
+    return '' if value is None else str(value)
+
+def _late_fee(data: Dict) -> str:
+    if data.get('late_fee_type') == 'percentage':
+        return f"{data.get('late_fee_percentage', 0)}% of payment"
+    if data.get('late_fee_type') == 'flat_amount':
+        return _money(data.get('late_fee_flat_amount', 0))
+    return "Not specified"
+
+# (section title, [(label, field whose _source is cited, value formatter)]);
+# a formatter receives the field value, or the whole record when the field
+# name starts with "=" (computed values)
+REPORT_SECTIONS = [
+    ("Tenant Information", [
+        ("Tenant Name", 'tenant_name', _text),
+        ("Tenant Email", 'tenant_email', _text),
+        ("Tenant Phone", 'tenant_phone', _text),
+    ]),
+    ("Property Information", [
+        ("Property Address", 'property_address', _text),
+        ("Unit Number", 'unit_number', _text),
+        ("Property Type", 'property_type', _text),
+        ("Square Footage", 'square_footage', _whole),
+    ]),
+    ("Lease Terms", [
+        ("Lease Number", 'lease_number', _text),
+        ("Lease Start Date", 'lease_start_date', _text),
+        ("Lease End Date", 'lease_end_date', _text),
+        ("Lease Term (Months)", 'lease_term_months', _whole),
+        ("Lease Type", 'lease_type', _text),
+    ]),
+    ("Financial Terms", [
+        ("Monthly Rent", 'monthly_rent', _money),
+        ("Security Deposit", 'security_deposit', _money),
+        ("Pet Deposit", 'pet_deposit', _money),
+        ("Payment Due Date", 'payment_due_date', lambda value: f"Day {_whole(value or 1)} of month"),
+        ("Late Fee Type", 'late_fee_type', lambda value: value or 'Not specified'),
+        ("Late Fee", '=late_fee', _late_fee),
+        ("Late Fee Grace Period", 'late_fee_grace_period', lambda value: f"{_whole(value)} days"),
+    ]),
+    ("Additional Terms", [
+        ("Parking Spaces", 'parking_spaces', _whole),
+        ("Pet Allowed", 'pet_allowed', lambda value: "Yes" if value else "No"),
+        ("Pet Type", 'pet_type', _text),
+        ("Utilities Included", 'utilities_included', _text),
+        ("Renewal Options", 'renewal_options', _text),
+        ("Early Termination", 'early_termination_clause', _text),
+        ("Maintenance Responsibilities", 'maintenance_responsibilities', _text),
+    ]),
+]
+
+# Field whose citation backs each computed value, keyed by the late fee type
+COMPUTED_SOURCES = {
+    'late_fee': {'percentage': 'late_fee_percentage', 'flat_amount': 'late_fee_flat_amount'},
+}
+
+# Templates are compiled once at import and only substituted per lease
+HTML_PAGE = Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+body { font-family: -apple-system, Segoe UI, Arial, sans-serif; margin: 2rem; color: #222; }
+h1 { color: #203864; }
+h2 { background: #203864; color: #fff; padding: .4rem .6rem; margin-top: 2.5rem; }
+h3 { color: #4472C4; margin-bottom: .3rem; }
+table { border-collapse: collapse; width: 100%; margin-bottom: 1rem; }
+th, td { border: 1px solid #ccc; padding: .3rem .5rem; text-align: left; vertical-align: top; }
+th { background: #D9E1F2; }
+td.label { width: 22%; font-weight: bold; background: #F3F6FB; }
+td.source { color: #555; font-style: italic; font-size: .9em; }
+.meta { color: #666; font-size: .9em; }
+.confidence-high { color: #28A745; } .confidence-medium { color: #B8860B; } .confidence-low { color: #DC3545; }
+</style>
+</head>
+<body>
+<h1>$title</h1>
+<p class="meta">Generated $generated &middot; $count leases</p>
+<table>
+<tr><th>#</th><th>Lease</th><th>Tenant Name</th><th>Property Address</th><th>Unit</th><th>Start Date</th><th>End Date</th><th>Monthly Rent</th><th>Confidence</th></tr>
+$index_rows
+</table>
+$leases
+</body>
+</html>
+""")
+
+HTML_INDEX_ROW = Template(
+    '<tr><td>$number</td><td><a href="#lease-$number">$filename</a></td><td>$tenant_name</td>'
+    '<td>$property_address</td><td>$unit_number</td><td>$lease_start_date</td><td>$lease_end_date</td>'
+    '<td>$monthly_rent</td><td class="confidence-$confidence_class">$confidence</td></tr>'
+)
+
+HTML_LEASE = Template("""<section id="lease-$number">
+<h2>Lease $number &mdash; $filename</h2>
+<p class="meta">Extracted: $extracted_at &middot; Confidence: <span class="confidence-$confidence_class">$confidence</span></p>
+$sections
+</section>""")
+
+HTML_SECTION = Template("""<h3>$title</h3>
+<table>
+<tr><th>Field</th><th>Value</th><th>Source</th></tr>
+$rows
+</table>""")
+
+HTML_FIELD = Template('<tr><td class="label">$label</td><td>$value</td><td class="source">$source</td></tr>')
+
+MD_PAGE = Template("""# $title
+
+_Generated $generated · $count leases_
+
+| # | Lease | Tenant Name | Property Address | Unit | Start Date | End Date | Monthly Rent | Confidence |
+|---|---|---|---|---|---|---|---|---|
+$index_rows
+
+$leases
+""")
+
+MD_INDEX_ROW = Template(
+    "| $number | [$filename](#lease-$number) | $tenant_name | $property_address | $unit_number "
+    "| $lease_start_date | $lease_end_date | $monthly_rent | $confidence |"
+)
+
+MD_LEASE = Template("""<a id="lease-$number"></a>
+
+## Lease $number — $filename
+
+_Extracted: $extracted_at · Confidence: ${confidence}_
+
+$sections
+""")
+
+MD_SECTION = Template("""### $title
+
+| Field | Value | Source |
+|---|---|---|
+$rows
+""")
+
+MD_FIELD = Template("| $label | $value | $source |")
+
+def _escape_markdown(value: str) -> str:
+    """Keep a value on one table row, stop pipes from splitting cells and keep tags literal"""
+    return " ".join(value.split()).replace("|", "\\|").replace("<", "&lt;")
+
+def _confidence(data: Dict) -> Dict[str, str]:
+    try:
+        confidence = float(data.get('confidence_score', 0.5))
+    except (TypeError, ValueError):
+        confidence = 0.5
+    level = "High" if confidence >= 0.8 else "Medium" if confidence >= 0.5 else "Low"
+    return {"confidence": f"{level} ({confidence:.0%})", "confidence_class": level.lower()}
+
+def _render(extracted_data: List[Dict], escape: Callable[[str], str], page: Template,
+            index_row: Template, lease: Template, section: Template, field_row: Template,
+            title: str) -> str:
+    """Render a report with one set of templates and an escaping function"""
+    index_rows = []
+    leases = []
+
+    for number, doc in enumerate(extracted_data, 1):
+        data = doc['data']
+        confidence = _confidence(data)
+        filename = escape(_text(doc.get('filename', '')))
+
+        index_rows.append(index_row.substitute(
+            number=number,
+            filename=filename,
+            tenant_name=escape(_text(data.get('tenant_name', ''))),
+            property_address=escape(_text(data.get('property_address', ''))),
+            unit_number=escape(_text(data.get('unit_number', ''))),
+            lease_start_date=escape(_text(data.get('lease_start_date', ''))),
+            lease_end_date=escape(_text(data.get('lease_end_date', ''))),
+            monthly_rent=escape(_money(data.get('monthly_rent', 0))),
+            **confidence
+        ))
+
+        source_locations = data.get('source_locations') or {}
+        sections = []
+        for section_title, fields in REPORT_SECTIONS:
+            rows = []
+            for label, field, formatter in fields:
+                if field.startswith('='):
+                    value = formatter(data)
+                    source_field = COMPUTED_SOURCES.get(field[1:], {}).get(data.get('late_fee_type'), '')
+                else:
+                    value = formatter(data.get(field))
+                    source_field = field
+                source = data.get(f"{source_field}_source", '')
+                if not source or source == NOT_FOUND_SOURCE:
+                    source = "—"
+                elif source_field in source_locations:
+                    source = f"{_text(source)} (p. {source_locations[source_field]['page']})"
+                rows.append(field_row.substitute(label=label, value=escape(value), source=escape(_text(source))))
+            sections.append(section.substitute(title=section_title, rows="\n".join(rows)))
+
+        leases.append(lease.substitute(
+            number=number,
+            filename=filename,
+            extracted_at=escape(_text(doc.get('extracted_at', 'N/A'))),
+            sections="\n".join(sections),
+            **confidence
+        ))
+
+    return page.substitute(
+        title=escape(title),
+        generated=datetime.now().strftime('%Y-%m-%d %H:%M'),
+        count=len(extracted_data),
+        index_rows="\n".join(index_rows),
+        leases="\n".join(leases)
+    )
+
+def render_reference_html(extracted_data: List[Dict], title: str = "Lease Abstraction Report") -> str:
+    """
+    Render a single-file HTML reference report
+
+    The report opens with a portfolio index linking to one section per
+    lease; every field is shown next to its source citation and, when the
+    citation was located in the PDF, its page.
+
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        title: Report title
+
+    Returns:
+        HTML document
+    """
+    return _render(extracted_data, lambda value: html.escape(value, quote=True), HTML_PAGE,
+                   HTML_INDEX_ROW, HTML_LEASE, HTML_SECTION, HTML_FIELD, title)
+
+def render_reference_markdown(extracted_data: List[Dict], title: str = "Lease Abstraction Report") -> str:
+    """
+    Render a single-file Markdown reference report
+
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        title: Report title
+
+    Returns:
+        Markdown document
+    """
+    return _render(extracted_data, _escape_markdown, MD_PAGE, MD_INDEX_ROW,
+                   MD_LEASE, MD_SECTION, MD_FIELD, title)
+
+def write_reference_report(extracted_data: List[Dict], target: Union[str, TextIO], fmt: str = "html") -> None:
+    """
+    Write an HTML or Markdown reference report to a file path or text file object
+
+    Args:
+        extracted_data: List of dictionaries containing extracted lease data
+        target: File path or writable text file object
+        fmt: "html" or "md"
+    """
+    renderers = {"html": render_reference_html, "md": render_reference_markdown}
+    if fmt not in renderers:
+        raise ValueError(f"Unknown report format: {fmt}")
+
+    content = renderers[fmt](extracted_data)
+    if isinstance(target, str):
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(content)
+    else:
+        target.write(content)
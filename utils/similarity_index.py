@@ -0,0 +1,210 @@
+"""
+Lease Similarity Index Module
+MinHash/LSH signatures over normalized lease text for near-duplicate detection
+"""
+
+import os
+import re
+import json
+import sqlite3
+import zlib
+from contextlib import closing
+from typing import Dict, Iterable, Optional
+import numpy as np
+
+from .history_manager import HISTORY_DIR, get_connection, write_transaction
+
+# Legacy JSON index, migrated into the history database on first use
+SIMILARITY_INDEX_FILE = os.path.join(HISTORY_DIR, "similarity_index.json")
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 5
+
+# Minimum similarity to a prior lease before only the changed fields are re-extracted
+REUSE_SIMILARITY_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Fixed seed so signatures stay comparable across processes and restarts
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, np.iinfo(np.uint32).max, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, np.iinfo(np.uint32).max, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+def normalize_lease_text(text: str) -> str:
+    """
+    Normalize lease text so renewals of the same template compare as similar
+
+    Lowercases, masks digits and strips punctuation so that differing dates,
+    amounts and unit numbers do not break otherwise identical shingles.
+    """
+    text = text.lower()
+    text = re.sub(r'\d', '0', text)
+    text = re.sub(r'[^a-z0\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def compute_signature(text: str) -> np.ndarray:
+    """
+    Compute the MinHash signature of a lease document
+
+    Args:
+        text: Raw lease text
+
+    Returns:
+        Array of NUM_PERMUTATIONS uint64 minimum hash values
+    """
+    words = normalize_lease_text(text).split()
+    if len(words) < SHINGLE_SIZE:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    # One row per permutation; the minimum over shingles is the signature entry
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=1)
+
+def estimate_similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Estimate Jaccard similarity from two MinHash signatures"""
+    return float(np.mean(signature_a == signature_b))
+
+def _band_keys(signature: np.ndarray):
+    """Yield one (band, bucket) LSH key per band"""
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        yield (band, rows.astype('<u8').tobytes())
+
+def write_signatures(conn: sqlite3.Connection, signatures: Dict[str, np.ndarray]) -> None:
+    """
+    Store signatures and their LSH buckets in the history database
+
+    Runs on the caller's connection, so the index is written in the same
+    transaction as the records it describes; rows for deleted records are
+    removed by a trigger on the extractions table.
+
+    Args:
+        conn: Open history database connection
+        signatures: History extraction ID -> MinHash signature
+    """
+    conn.executemany("DELETE FROM similarity_bands WHERE id = ?", [(extraction_id,) for extraction_id in signatures])
+    conn.executemany(
+        "INSERT OR REPLACE INTO similarity_signatures (id, signature) VALUES (?, ?)",
+        [(extraction_id, signature.astype('<u8').tobytes()) for extraction_id, signature in signatures.items()]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO similarity_bands (band, bucket, id) VALUES (?, ?, ?)",
+        [(band, bucket, extraction_id)
+         for extraction_id, signature in signatures.items() for band, bucket in _band_keys(signature)]
+    )
+
+def migrate_json_index(conn: sqlite3.Connection) -> int:
+    """
+    Import the signatures of the legacy similarity_index.json side file
+
+    Signatures of records no longer in history are dropped; the file is
+    renamed to similarity_index.json.migrated afterwards.
+
+    Returns:
+        Number of signatures migrated
+    """
+    if not os.path.exists(SIMILARITY_INDEX_FILE):
+        return 0
+
+    with open(SIMILARITY_INDEX_FILE, 'r') as f:
+        stored = json.load(f).get("signatures", {})
+
+    existing = {row[0] for row in conn.execute("SELECT id FROM extractions")}
+    write_signatures(conn, {
+        extraction_id: np.array(values, dtype=np.uint64)
+        for extraction_id, values in stored.items() if extraction_id in existing
+    })
+    os.replace(SIMILARITY_INDEX_FILE, SIMILARITY_INDEX_FILE + ".migrated")
+    return len(existing.intersection(stored))
+
+def add_to_index(extraction_id: str, text: str) -> None:
+    """
+    Add a saved extraction's lease text to the similarity index
+
+    Args:
+        extraction_id: History extraction ID the text belongs to
+        text: Raw lease text
+    """
+    add_many_to_index({extraction_id: text})
+
+def add_many_to_index(texts: Dict[str, str]) -> None:
+    """
+    Add several already saved extractions to the similarity index in one transaction
+
+    New records are indexed as they are saved (save_extractions with texts);
+    this is for indexing records saved without their text.
+
+    Args:
+        texts: History extraction ID -> raw lease text (IDs not in history are ignored)
+    """
+    # Hash before taking the write lock so other sessions only wait for the inserts
+    signatures = {extraction_id: compute_signature(text) for extraction_id, text in texts.items()}
+    if not signatures:
+        return
+
+    with write_transaction() as conn:
+        existing = {row[0] for row in conn.execute(
+            f"SELECT id FROM extractions WHERE id IN ({', '.join('?' for _ in signatures)})", list(signatures))}
+        write_signatures(conn, {extraction_id: signature for extraction_id, signature in signatures.items()
+                                if extraction_id in existing})
+
+def remove_from_index(extraction_id: str) -> None:
+    """Remove an extraction from the similarity index if present"""
+    remove_many_from_index([extraction_id])
+
+def remove_many_from_index(extraction_ids: Iterable[str]) -> None:
+    """
+    Remove several extractions from the similarity index in one transaction
+
+    Deleting a record from history already removes it from the index.
+
+    Args:
+        extraction_ids: History extraction IDs (IDs not in the index are ignored)
+    """
+    extraction_ids = [(extraction_id,) for extraction_id in extraction_ids]
+    if not extraction_ids:
+        return
+
+    with write_transaction() as conn:
+        conn.executemany("DELETE FROM similarity_signatures WHERE id = ?", extraction_ids)
+        conn.executemany("DELETE FROM similarity_bands WHERE id = ?", extraction_ids)
+
+def find_closest_document(text: str, min_similarity: float = 0.5) -> Optional[Dict]:
+    """
+    Find the most similar previously indexed lease
+
+    Args:
+        text: Raw lease text of the new upload
+        min_similarity: Minimum estimated Jaccard similarity to report a match
+
+    Returns:
+        Dictionary with 'id' and 'similarity' of the closest prior document,
+        or None if nothing similar enough is indexed
+    """
+    signature = compute_signature(text)
+    probe = list(_band_keys(signature))
+
+    # Only the candidates sharing an LSH bucket are read, through the bucket index
+    with closing(get_connection()) as conn:
+        candidates = conn.execute(
+            f"WITH probe (band, bucket) AS (VALUES {', '.join('(?, ?)' for _ in probe)}) "
+            "SELECT DISTINCT similarity_signatures.id, similarity_signatures.signature FROM probe "
+            "JOIN similarity_bands ON similarity_bands.band = probe.band AND similarity_bands.bucket = probe.bucket "
+            "JOIN similarity_signatures ON similarity_signatures.id = similarity_bands.id",
+            [value for key in probe for value in key]
+        ).fetchall()
+
+    best = None
+    for extraction_id, stored in candidates:
+        similarity = estimate_similarity(signature, np.frombuffer(stored, dtype='<u8'))
+        if similarity >= min_similarity and (best is None or similarity > best["similarity"]):
+            best = {"id": extraction_id, "similarity": similarity}
+
+    return best
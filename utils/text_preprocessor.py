@@ -0,0 +1,228 @@
+"""
+Text Preprocessing Module
+Strips repeated page headers/footers and layout noise from extracted lease text
+while keeping an offset map back to the original text
+"""
+
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+PAGE_SEPARATOR = "\n\n"
+
+SOURCE_SUFFIX = "_source"
+NOT_FOUND_SOURCE = "Not found in document"
+
+# A line is treated as a running header/footer when it appears on at least
+# this share of pages (and on at least two pages)
+REPEATED_LINE_PAGE_RATIO = 0.5
+
+# Longer lines are real content even if they repeat
+MAX_BOILERPLATE_LINE_LENGTH = 120
+
+# Running headers/footers sit within this many non-blank lines of the top or
+# bottom of a page; only there may they differ by digits (page numbers, dates)
+EDGE_LINES = 2
+
+PAGE_NUMBER_PATTERN = re.compile(
+    r'^\s*(?:page\s*#(?:\s*(?:of|/)\s*#)?|-\s*#\s*-|#\s*(?:of|/)\s*#|#)\s*$'
+)
+INITIALS_PATTERN = re.compile(r'initials?\b')
+
+def _line_key(line: str, mask_digits: bool = True) -> str:
+    """Normalize a line; with mask_digits, headers that differ only in page numbers compare equal"""
+    key = line.strip().lower()
+    if mask_digits:
+        key = re.sub(r'\d+', '#', key)
+    return re.sub(r'\s+', ' ', key)
+
+def _is_initials_line(key: str) -> bool:
+    """Detect "Tenant Initials ____ Landlord Initials ____" style lines"""
+    if not INITIALS_PATTERN.search(key):
+        return False
+    words = re.sub(r'[\W_#]+', ' ', key).split()
+    return len(words) <= 8
+
+def _split_lines(page: str, page_start: int) -> List[Tuple[str, int, bool]]:
+    """
+    Split a page into (line, offset of the line in the original text, whether
+    the line is within EDGE_LINES of the top or bottom of the page) tuples
+    """
+    lines = page.split("\n")
+    content = [idx for idx, line in enumerate(lines) if line.strip()]
+    edges = set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+
+    split = []
+    offset = page_start
+    for idx, line in enumerate(lines):
+        split.append((line, offset, idx in edges))
+        offset += len(line) + 1
+    return split
+
+def preprocess_lease_text(pages: List[str]) -> Tuple[str, List[int]]:
+    """
+    Remove boilerplate from per-page lease text to save prompt tokens
+
+    Drops lines repeated across pages (running headers/footers), "Page X of Y"
+    style page numbers and initials lines, collapses runs of whitespace and
+    rejoins words hyphenated across line breaks.
+
+    Args:
+        pages: Text of each page, in order
+
+    Returns:
+        Tuple of (cleaned text, offset map). offset_map[i] is the position in
+        the original text, PAGE_SEPARATOR.join(pages), of cleaned character i.
+    """
+    page_lines = []
+    page_start = 0
+    for page in pages:
+        page_lines.append(_split_lines(page, page_start))
+        page_start += len(page) + len(PAGE_SEPARATOR)
+
+    # Count on how many pages each normalized line occurs; digits are only
+    # masked at the page edges, so body lines such as "Rent: $1,500.00" and
+    # "Rent: $2,750.00" stay distinct. Blank (image-only) pages do not count.
+    page_counts = {}
+    for lines in page_lines:
+        for key in {_line_key(line, mask_digits=edge) for line, _, edge in lines}:
+            page_counts[key] = page_counts.get(key, 0) + 1
+    min_pages = max(2, REPEATED_LINE_PAGE_RATIO * sum(1 for page in pages if page.strip()))
+
+    def is_boilerplate(line: str, edge: bool) -> bool:
+        key = _line_key(line)
+        if not key:
+            return False
+        if PAGE_NUMBER_PATTERN.match(key) or _is_initials_line(key):
+            return True
+        key = _line_key(line, mask_digits=edge)
+        return len(key) <= MAX_BOILERPLATE_LINE_LENGTH and page_counts.get(key, 0) >= min_pages
+
+    # Flatten kept lines across pages; None marks a paragraph/page break
+    kept = []
+    for lines in page_lines:
+        for line, offset, edge in lines:
+            if not line.strip():
+                kept.append(None)
+            elif not is_boilerplate(line, edge):
+                kept.append((line, offset))
+        kept.append(None)
+
+    chars = []
+    offsets = []
+    pending_break = None
+
+    def emit(text: str, original_offset: int):
+        chars.append(text)
+        offsets.append(original_offset)
+
+    for idx, item in enumerate(kept):
+        if item is None:
+            if pending_break is not None and pending_break[0] == "\n":
+                pending_break = (PAGE_SEPARATOR, pending_break[1])
+            continue
+
+        line, line_offset = item
+        words = list(re.finditer(r'\S+', line))
+
+        if chars and pending_break is not None:
+            separator, separator_offset = pending_break
+            for ch in separator:
+                emit(ch, separator_offset)
+
+        for word_idx, match in enumerate(words):
+            if word_idx:
+                emit(" ", line_offset + words[word_idx - 1].end())
+            word_offset = line_offset + match.start()
+            for char_idx, ch in enumerate(match.group()):
+                emit(ch, word_offset + char_idx)
+
+        # Rejoin "abstrac-\ntion" when the next kept line continues the word,
+        # even across a page break whose header/footer was removed
+        next_item = next((candidate for candidate in kept[idx + 1:] if candidate is not None), None)
+        last_word = words[-1].group()
+        if (next_item is not None and re.search(r'[A-Za-z]-$', last_word)
+                and re.match(r'\s*[a-z]', next_item[0])):
+            chars.pop()
+            offsets.pop()
+            pending_break = ("", line_offset + words[-1].end())
+        else:
+            pending_break = ("\n", line_offset + len(line))
+
+    return "".join(chars), offsets
+
+def map_span_to_original(offset_map: List[int], start: int, end: int) -> Tuple[int, int]:
+    """
+    Map a [start, end) span of cleaned text back to the original text
+
+    Args:
+        offset_map: Offset map returned by preprocess_lease_text
+        start: Start position in the cleaned text
+        end: End position (exclusive) in the cleaned text
+
+    Returns:
+        (start, end) span in the original text
+    """
+    if end <= start:
+        return offset_map[start], offset_map[start]
+    return offset_map[start], offset_map[end - 1] + 1
+
+def locate_citation(source: str, cleaned_text: str, offset_map: List[int]) -> Optional[Tuple[int, int]]:
+    """
+    Find a cited source passage in the cleaned text and return its original span
+
+    Whitespace in the citation is matched loosely, since the model may quote
+    line breaks as spaces.
+
+    Args:
+        source: Source snippet returned by the model
+        cleaned_text: Text returned by preprocess_lease_text
+        offset_map: Offset map returned by preprocess_lease_text
+
+    Returns:
+        (start, end) span in the original text, or None if the passage is not found
+    """
+    words = source.split()
+    if not words:
+        return None
+
+    pattern = r'\s+'.join(re.escape(word) for word in words)
+    match = re.search(pattern, cleaned_text, re.IGNORECASE)
+    if not match:
+        return None
+
+    return map_span_to_original(offset_map, match.start(), match.end())
+
+def locate_sources(lease_data: Dict, pages: List[str], cleaned_text: str,
+                   offset_map: List[int]) -> Dict[str, Dict[str, int]]:
+    """
+    Locate the cited source passage of every extracted field in the original pages
+
+    Args:
+        lease_data: Extracted lease data with <field>_source citations
+        pages: Text of each page, as passed to preprocess_lease_text
+        cleaned_text: Text returned by preprocess_lease_text
+        offset_map: Offset map returned by preprocess_lease_text
+
+    Returns:
+        Dictionary mapping each field whose citation was found to its 'page'
+        (1-based) and the 'start'/'end' span in PAGE_SEPARATOR.join(pages)
+    """
+    page_starts = []
+    page_start = 0
+    for page in pages:
+        page_starts.append(page_start)
+        page_start += len(page) + len(PAGE_SEPARATOR)
+
+    locations = {}
+    for key, source in lease_data.items():
+        if not key.endswith(SOURCE_SUFFIX) or not isinstance(source, str) or source == NOT_FOUND_SOURCE:
+            continue
+        span = locate_citation(source, cleaned_text, offset_map)
+        if span:
+            locations[key[:-len(SOURCE_SUFFIX)]] = {
+                'page': bisect_right(page_starts, span[0]),
+                'start': span[0],
+                'end': span[1],
+            }
+    return locations
@@ -0,0 +1,205 @@
+"""
+Yardi Re-Import Module
+Reads edited Yardi workbooks (xlsx or CSV) back into history records
+"""
+
+import io
+import os
+import csv
+from datetime import date, datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from .history_manager import list_extractions, update_extractions
+from .yardi_profiles import DEFAULT_PROFILE, load_profile
+from .flat_export import FLAT_EXPORT_PROFILE
+
+def _parse_yes_no(value) -> bool:
+    return str(value).strip().lower() in ('yes', 'y', 'true', '1')
+
+def _parse_flag(value) -> bool:
+    return str(value).strip().lower() in ('1', '1.0', 'true', 'yes', 'y')
+
+# Inverse of the export transforms; columns with a lossy transform
+# (e.g. annualize, upper) are derived values and are not imported
+INVERSE_TRANSFORMS = {
+    'yes_no': _parse_yes_no,
+    'flag': _parse_flag,
+}
+
+def _parse_string(value) -> str:
+    return '' if value is None else str(value).strip()
+
+def _parse_integer(value) -> Optional[int]:
+    if value is None or str(value).strip() == '':
+        return None
+    try:
+        return int(float(str(value).replace(',', '')))
+    except ValueError:
+        return None
+
+def _parse_decimal(value) -> Optional[float]:
+    if value is None or str(value).strip() == '':
+        return None
+    try:
+        return round(float(str(value).replace(',', '').replace('$', '')), 2)
+    except ValueError:
+        return None
+
+def _parse_date(value) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = _parse_string(value)
+    if not text:
+        return ''
+    for fmt in ('%Y-%m-%d', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+CELL_PARSERS = {
+    'string': _parse_string,
+    'integer': _parse_integer,
+    'decimal': _parse_decimal,
+    'date': _parse_date,
+}
+
+def build_import_columns(profile: str) -> Dict[str, Tuple[str, Callable]]:
+    """
+    Invert a mapping profile into header -> (field, cell parser)
+
+    Profile defaults are not part of the inverse: they only fill empty values
+    on export, and must never overwrite stored values on import.
+
+    Args:
+        profile: Name of the Yardi mapping profile the file was exported with
+
+    Returns:
+        Dictionary of importable columns keyed by header
+    """
+    columns = {}
+    for column in load_profile(profile)['columns']:
+        transform = column.get('transform')
+        if transform and transform not in INVERSE_TRANSFORMS:
+            continue
+        parser = INVERSE_TRANSFORMS[transform] if transform else CELL_PARSERS[column.get('type', 'string')]
+        columns[column['header']] = (column['field'], parser)
+    return columns
+
+def iter_sheet_rows(source, fmt: str) -> Iterator[tuple]:
+    """
+    Stream the rows of an xlsx sheet or CSV file, header row first
+
+    Args:
+        source: File path or binary file object
+        fmt: "xlsx" or "csv"
+    """
+    if fmt == "csv":
+        if isinstance(source, str):
+            with open(source, 'r', newline='', encoding='utf-8-sig') as f:
+                yield from csv.reader(f)
+        else:
+            yield from csv.reader(io.TextIOWrapper(source, encoding='utf-8-sig', newline=''))
+    elif fmt == "xlsx":
+        from openpyxl import load_workbook
+
+        # Read-only mode parses the sheet lazily instead of loading it whole
+        wb = load_workbook(source, read_only=True, data_only=True)
+        try:
+            yield from wb.active.iter_rows(values_only=True)
+        finally:
+            wb.close()
+    else:
+        raise ValueError(f"Can only import .xlsx or .csv files, got: {fmt}")
+
+def _history_lookup() -> Dict[Tuple[str, str], str]:
+    """Map (source file, lease number) to the newest matching extraction ID"""
+    lookup = {}
+    for entry in reversed(list_extractions()):
+        lookup[(entry['filename'], entry['lease_number'].strip())] = entry['id']
+    return lookup
+
+def import_yardi_workbook(source, profile: Optional[str] = None, fmt: Optional[str] = None,
+                          apply: bool = True) -> Dict:
+    """
+    Import analyst edits from an exported Yardi workbook back into history
+
+    Rows are streamed and matched to history records by SourceFile and
+    LeaseNumber; all changes are then applied as one bulk versioned update.
+    Blank cells leave the stored value alone, as do cells that cannot be
+    parsed for their column, which are reported instead.
+
+    Args:
+        source: File path or binary file object (e.g. an uploaded file)
+        profile: Mapping profile the file was exported with (defaults to the
+            standard layout for xlsx and the ETL layout for CSV)
+        fmt: "xlsx" or "csv" (inferred from the file name if omitted)
+        apply: Whether to write the changes (False only reports the matches)
+
+    Returns:
+        Summary with 'rows', 'matched', 'updated' (IDs), 'unmatched'
+        (row number, source file, lease number), 'unparseable' (row number,
+        header, cell value) and 'skipped_columns'
+    """
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    if fmt is None:
+        fmt = os.path.splitext(name)[1].lower().lstrip('.')
+    if profile is None:
+        profile = FLAT_EXPORT_PROFILE if fmt == "csv" else DEFAULT_PROFILE
+
+    import_columns = build_import_columns(profile)
+    key_fields = {field: header for header, (field, _) in import_columns.items()}
+    if '@filename' not in key_fields or 'lease_number' not in key_fields:
+        raise ValueError(f"Profile {profile} has no SourceFile/LeaseNumber columns to match rows on")
+
+    rows = iter_sheet_rows(source, fmt)
+    headers = [_parse_string(header) for header in next(rows, ())]
+    positions = [(idx, header, *import_columns[header]) for idx, header in enumerate(headers) if header in import_columns]
+    skipped = [header for header in headers if header and header not in import_columns]
+    filename_idx = headers.index(key_fields['@filename']) if key_fields['@filename'] in headers else None
+    lease_number_idx = headers.index(key_fields['lease_number']) if key_fields['lease_number'] in headers else None
+    if filename_idx is None or lease_number_idx is None:
+        raise ValueError("Workbook is missing the SourceFile or LeaseNumber column")
+
+    lookup = _history_lookup()
+    updates = {}
+    unmatched = []
+    unparseable = []
+    row_count = 0
+
+    for row_number, row in enumerate(rows, 2):
+        if not any(value not in (None, '') for value in row):
+            continue
+        row_count += 1
+
+        filename = _parse_string(row[filename_idx])
+        lease_number = _parse_string(row[lease_number_idx])
+        extraction_id = lookup.get((filename, lease_number))
+        if extraction_id is None:
+            unmatched.append((row_number, filename, lease_number))
+            continue
+
+        fields = {}
+        for idx, header, field, parse in positions:
+            if field.startswith('@') or idx >= len(row) or _parse_string(row[idx]) == '':
+                continue
+            value = parse(row[idx])
+            if value is None:
+                unparseable.append((row_number, header, row[idx]))
+                continue
+            fields[field] = value
+        updates[extraction_id] = fields
+
+    updated = update_extractions(updates, source=os.path.basename(name)) if apply and updates else []
+
+    return {
+        "rows": row_count,
+        "matched": len(updates),
+        "updated": updated,
+        "unmatched": unmatched,
+        "unparseable": unparseable,
+        "skipped_columns": skipped
+    }
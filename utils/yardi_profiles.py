@@ -0,0 +1,148 @@
+"""
+Yardi Mapping Profiles Module
+Loads declarative Yardi column layouts and compiles them into batch column mappers
+"""
+
+import os
+import json
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List
+
+# Profile files (one JSON file per Yardi import layout)
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles")
+
+DEFAULT_PROFILE = "standard"
+
+COLUMN_TYPES = ("string", "integer", "decimal", "date")
+
+# Rows are mapped in chunks so streaming writers never hold a whole portfolio
+MAPPING_CHUNK_SIZE = 5000
+
+def _yes_no(value):
+    return 'Yes' if value else 'No'
+
+def _flag(value):
+    return 1 if value else 0
+
+def _annualize(value):
+    try:
+        return float(value) * 12
+    except (TypeError, ValueError):
+        return 0
+
+def _upper(value):
+    return str(value).upper() if value is not None else value
+
+# Value transforms a profile column may name in its "transform" key
+TRANSFORMS = {
+    'yes_no': _yes_no,
+    'flag': _flag,
+    'annualize': _annualize,
+    'upper': _upper,
+}
+
+CompiledProfile = namedtuple('CompiledProfile', ['name', 'headers', 'types', 'widths', 'columns'])
+
+def list_profiles() -> List[str]:
+    """List the names of the available mapping profiles"""
+    return sorted(
+        os.path.splitext(name)[0]
+        for name in os.listdir(PROFILES_DIR)
+        if name.endswith('.json')
+    )
+
+def load_profile(name: str) -> Dict:
+    """
+    Load a mapping profile definition
+
+    Args:
+        name: Profile name (file name in PROFILES_DIR without .json)
+
+    Returns:
+        Profile dictionary with 'name', 'description' and 'columns'
+    """
+    path = os.path.join(PROFILES_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        raise ValueError(f"Unknown Yardi mapping profile: {name} (available: {', '.join(list_profiles())})")
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def compile_profile(profile: Dict) -> CompiledProfile:
+    """
+    Compile a profile definition into column accessors
+
+    Each column becomes a function from a list of documents to the list of
+    that column's values, so a whole batch is mapped one column at a time.
+    A field starting with "@" reads the document itself (e.g. "@filename")
+    instead of its extracted data.
+
+    Args:
+        profile: Profile dictionary as returned by load_profile
+
+    Returns:
+        CompiledProfile with headers, column types, widths and column accessors
+    """
+    headers, types, widths, columns = [], [], [], []
+
+    for column in profile['columns']:
+        field = column['field']
+        default = column.get('default')
+        column_type = column.get('type', 'string')
+        if column_type not in COLUMN_TYPES:
+            raise ValueError(f"Column {column['header']} has unknown type: {column_type}")
+        transform = column.get('transform')
+        if transform and transform not in TRANSFORMS:
+            raise ValueError(f"Column {column['header']} has unknown transform: {transform}")
+
+        if field.startswith('@'):
+            def accessor(docs, key=field[1:], default=default):
+                return [doc.get(key, default) for doc in docs]
+        else:
+            def accessor(docs, key=field, default=default):
+                return [doc['data'].get(key, default) for doc in docs]
+
+        if transform:
+            def column_values(docs, accessor=accessor, fn=TRANSFORMS[transform]):
+                return [fn(value) for value in accessor(docs)]
+        else:
+            column_values = accessor
+
+        headers.append(column['header'])
+        types.append(column_type)
+        widths.append(column.get('width'))
+        columns.append(column_values)
+
+    return CompiledProfile(profile['name'], headers, types, widths, columns)
+
+@lru_cache(maxsize=None)
+def get_profile(name: str = DEFAULT_PROFILE) -> CompiledProfile:
+    """Load and compile a profile once per process"""
+    return compile_profile(load_profile(name))
+
+def map_batch(profile: CompiledProfile, extracted_data: List[Dict]) -> List[tuple]:
+    """
+    Map a batch of documents to Yardi rows, evaluating one column at a time
+
+    Args:
+        profile: Compiled mapping profile
+        extracted_data: List of dictionaries containing extracted lease data
+
+    Returns:
+        List of row tuples in profile column order
+    """
+    if not extracted_data:
+        return []
+    return list(zip(*(column(extracted_data) for column in profile.columns)))
+
+def iter_mapped_rows(profile: CompiledProfile, extracted_data: Iterable[Dict],
+                     chunk_size: int = MAPPING_CHUNK_SIZE) -> Iterator[tuple]:
+    """Yield mapped rows chunk by chunk from any iterable of documents"""
+    chunk = []
+    for doc in extracted_data:
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield from map_batch(profile, chunk)
+            chunk = []
+    yield from map_batch(profile, chunk)